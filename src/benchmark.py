@@ -0,0 +1,107 @@
+import argparse
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from benchmarking.harness import compare_results, run_benchmarks, write_corpus
+from benchmarking.synthetic import synthesize_corpus
+from feature_extraction.registry import EXTRACTORS
+from pipeline.options import EXECUTORS, ExtractionOptions
+
+STAGES = ("extractors", "decode", "process", "pipeline")
+
+
+def print_results(results: dict) -> None:
+    print(f"{'stage':<30} {'clips/sec':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'+RSS MiB':>9}")
+    for stage, metrics in results["stages"].items():
+        latencies = [f"{metrics[key]:>9.2f}" if key in metrics else f"{'-':>9}" for key in ("latency_p50_ms", "latency_p90_ms", "latency_p99_ms")]
+        print(f"{stage:<30} {metrics['clips_per_sec']:>10.1f} {' '.join(latencies)} {metrics['peak_rss_delta_mb']:>9.0f}")
+
+
+def compare(baseline_path: Path, results: dict, tolerance: float) -> int:
+    baseline = json.loads(baseline_path.read_text())
+    regressions = compare_results(baseline, results, tolerance)
+    if not regressions:
+        print(f"No regressions beyond {tolerance:.0%} against {baseline_path}")
+        return 0
+
+    print(f"Regressions beyond {tolerance:.0%} against {baseline_path}:")
+    for regression in regressions:
+        print(f" - {regression}")
+    return 1
+
+
+def run(args: argparse.Namespace) -> int:
+    options = ExtractionOptions(
+        features=args.features if args.features else None,
+        executor=args.executor,
+        workers=args.workers,
+        batch_clips=args.batch_clips,
+        extractor_options={"pitch": {"backend": args.pitch_backend}, "hnr": {"backend": args.hnr_backend}},
+    )
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.corpus:
+            corpus_dir = Path(args.corpus)
+        else:
+            clips = synthesize_corpus(args.durations, args.sample_rates, args.clips, seed=args.seed)
+            corpus_dir = write_corpus(clips, Path(synthetic_dir))
+
+        results = run_benchmarks(corpus_dir, options, args.stages, repeat=args.repeat, max_clips=args.max_clips)
+
+    results["settings"]["corpus"] = args.corpus or {
+        "durations": args.durations,
+        "sample_rates": args.sample_rates,
+        "clips_per_setting": args.clips,
+        "seed": args.seed,
+    }
+
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        logging.info(f"Saved benchmark results to {args.output}")
+
+    if args.baseline:
+        return compare(Path(args.baseline), results, args.tolerance)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extractors, decoding and the extraction pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks and print (and optionally save) the results")
+    run_parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to benchmark")
+    run_parser.add_argument("--corpus", type=str, default=None, help="Language directory with validated.tsv and clips/ to use instead of synthetic clips")
+    run_parser.add_argument("--max-clips", type=int, default=None, help="Use at most this many clips of the corpus")
+    run_parser.add_argument("--durations", nargs="+", type=float, default=[2.0, 5.0, 10.0], help="Synthetic clip durations in seconds")
+    run_parser.add_argument("--sample-rates", nargs="+", type=int, default=[32000, 48000], help="Synthetic clip sample rates")
+    run_parser.add_argument("--clips", type=int, default=4, help="Synthetic clips per duration and sample rate")
+    run_parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic clips")
+    run_parser.add_argument("--repeat", type=int, default=1, help="Number of timed passes over the clips for the per-clip stages")
+    run_parser.add_argument("--features", nargs="*", help="Features to benchmark (default: all)")
+    run_parser.add_argument("--executor", choices=EXECUTORS, default="thread", help="Execution backend of the pipeline stage")
+    run_parser.add_argument("--workers", type=int, default=None, help="Number of workers of the pipeline stage")
+    run_parser.add_argument("--batch-clips", type=int, default=0, help="Batch size of the pipeline stage (0 disables batching)")
+    run_parser.add_argument("--pitch-backend", choices=EXTRACTORS["pitch"].backends, default="piptrack", help="Pitch tracker used by the pitch feature")
+    run_parser.add_argument("--hnr-backend", choices=EXTRACTORS["hnr"].backends, default="autocorrelation", help="Harmonics-to-noise ratio estimator used by the hnr feature")
+    run_parser.add_argument("--output", type=str, default=None, help="Save the results as JSON to this file")
+    run_parser.add_argument("--baseline", type=str, default=None, help="Compare the results against a saved JSON baseline and exit with 1 on regressions")
+    run_parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change tolerated before a metric counts as a regression")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two saved results")
+    compare_parser.add_argument("baseline", type=str, help="Baseline results JSON")
+    compare_parser.add_argument("current", type=str, help="Current results JSON")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change tolerated before a metric counts as a regression")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "compare":
+        sys.exit(compare(Path(args.baseline), json.loads(Path(args.current).read_text()), args.tolerance))
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import time
+import numpy as np
+from benchmarking.synthetic import synthesize_corpus
+from feature_extraction.analysis import AudioAnalysis
+from feature_extraction.pitch_backends import PITCH_BACKENDS
+
+
+def benchmark_pitch_backends(clips: list[tuple[np.ndarray, int, np.ndarray]], backends: list[str], repeat: int = 3) -> dict[str, dict]:
+    """Time every backend on the same clips and compare its mean voiced f0 to the known one."""
+    analyses = [AudioAnalysis.from_untrimmed(audio, sr) for audio, sr, _ in clips]
+    true_means = np.array([np.mean(true_f0[true_f0 > 0]) for _, _, true_f0 in clips])
+
+    results = {}
+    for backend in backends:
+        estimate_f0 = PITCH_BACKENDS[backend]
+        timings = []
+        estimated_means = np.zeros(len(clips))
+
+        for _ in range(repeat):
+            for i, analysis in enumerate(analyses):
+                # Drop cached spectrograms so every backend pays for its own STFT.
+                analysis = AudioAnalysis(analysis.audio, analysis.sr)
+                start = time.perf_counter()
+                f0 = estimate_f0(analysis)
+                timings.append(time.perf_counter() - start)
+                voiced = f0[f0 > 0]
+                estimated_means[i] = np.mean(voiced) if voiced.size else np.nan
+
+        relative_error = np.abs(estimated_means - true_means) / true_means
+        results[backend] = {
+            "clips_per_sec": len(timings) / sum(timings),
+            "median_latency_ms": 1000 * float(np.median(timings)),
+            "median_mean_f0_error_pct": 100 * float(np.nanmedian(relative_error)),
+            "max_mean_f0_error_pct": 100 * float(np.nanmax(relative_error)),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pitch backends on synthetic speech-like clips with a known f0.")
+    parser.add_argument("--backends", nargs="+", choices=PITCH_BACKENDS, default=list(PITCH_BACKENDS), help="Backends to compare")
+    parser.add_argument("--durations", nargs="+", type=float, default=[2.0, 4.0, 6.0], help="Clip durations in seconds")
+    parser.add_argument("--sample-rates", nargs="+", type=int, default=[16000, 48000], help="Clip sample rates")
+    parser.add_argument("--clips", type=int, default=4, help="Clips per duration and sample rate")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed passes over the clips")
+
+    args = parser.parse_args()
+
+    clips = synthesize_corpus(args.durations, args.sample_rates, args.clips)
+    results = benchmark_pitch_backends(clips, args.backends, args.repeat)
+
+    print(f"{'backend':<10} {'clips/sec':>10} {'median ms':>10} {'median err %':>13} {'max err %':>10}")
+    for backend, result in results.items():
+        print(
+            f"{backend:<10} {result['clips_per_sec']:>10.1f} {result['median_latency_ms']:>10.2f} "
+            f"{result['median_mean_f0_error_pct']:>13.2f} {result['max_mean_f0_error_pct']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
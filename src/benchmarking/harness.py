@@ -0,0 +1,229 @@
+import logging
+import platform
+import resource
+import tempfile
+import time
+import librosa
+import numpy as np
+import pandas as pd
+import soundfile as sf
+from pathlib import Path
+from collections.abc import Callable
+from itertools import islice
+from feature_extraction.analysis import AudioAnalysis
+from feature_extraction.registry import get_extractors
+from pipeline.engine import ClipProcessor
+from pipeline.metadata import ClipTask, iter_metadata
+from pipeline.options import ExtractionOptions
+from pipeline.profiling import current_rss_bytes, peak_rss_bytes
+from pipeline.runner import extract_clips
+
+PERCENTILES = (50, 90, 99)
+# Metrics where a higher value is a regression; everything else compared is higher-is-better.
+LOWER_IS_BETTER = ("latency_p50_ms", "latency_p90_ms", "latency_p99_ms", "peak_rss_delta_mb")
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    return peak_rss_bytes(who) / 2**20
+
+
+class StageMemory:
+    """
+    Memory a stage adds to the process: its peak RSS minus the RSS it started with.
+
+    On Linux the kernel's high-water mark is reset when the stage starts, so the peak is
+    the stage's own and not that of a heavier stage run before it. Elsewhere only the
+    growth of the lifetime peak can be measured, which is 0 for a stage that stays below it.
+    """
+
+    def __enter__(self) -> "StageMemory":
+        self.start_rss = current_rss_bytes()
+        self.start_peak = peak_rss_bytes()
+        self.reset = self.start_rss is not None and _reset_peak_rss()
+        self.delta_mb = 0.0
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        peak = _read_peak_rss() if self.reset else None
+        if peak is not None:
+            self.delta_mb = max(0, peak - self.start_rss) / 2**20
+        else:
+            self.delta_mb = max(0, peak_rss_bytes() - self.start_peak) / 2**20
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _read_peak_rss() -> int | None:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Throughput and latency percentiles of a stage timed clip by clip."""
+    latencies_ms = 1000 * np.asarray(latencies)
+    summary = {
+        "clips": len(latencies),
+        "clips_per_sec": len(latencies) / max(float(np.sum(latencies)), 1e-12),
+    }
+    for percentile in PERCENTILES:
+        summary[f"latency_p{percentile}_ms"] = float(np.percentile(latencies_ms, percentile))
+    summary["latency_max_ms"] = float(np.max(latencies_ms))
+    return summary
+
+
+def write_corpus(clips: list[tuple[np.ndarray, int, np.ndarray]], directory: Path) -> Path:
+    """Write synthetic clips as an mp3 dataset laid out like an extracted language (validated.tsv and clips/)."""
+    clips_dir = directory / "clips"
+    clips_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for i, (audio, sr, _) in enumerate(clips):
+        path = f"synthetic_{i:05d}.mp3"
+        sf.write(clips_dir / path, audio, sr, format="MP3")
+        rows.append({"path": path, "gender": "male" if i % 2 else "female", "age": "twenties"})
+
+    pd.DataFrame(rows).to_csv(directory / "validated.tsv", sep="\t", index=False)
+    return directory
+
+
+def load_corpus(directory: Path, max_clips: int | None = None) -> list[ClipTask]:
+    return list(islice(iter_metadata(directory / "validated.tsv"), max_clips))
+
+
+def time_per_clip(fn: Callable, items: list, repeat: int) -> dict:
+    """Call `fn` on every item `repeat` times and summarize the timings, after one untimed warm-up call that pays for lazy imports and caches."""
+    with StageMemory() as memory:
+        fn(items[0])
+        timings = []
+        for _ in range(repeat):
+            for item in items:
+                start = time.perf_counter()
+                fn(item)
+                timings.append(time.perf_counter() - start)
+    return {**summarize(timings), "peak_rss_delta_mb": memory.delta_mb}
+
+
+def benchmark_extractors(analyses: list[AudioAnalysis], features: list[str] | None, extractor_options: dict, repeat: int) -> dict[str, dict]:
+    """Time every extractor on its own; each call gets a fresh analysis, so it also pays for the intermediates it needs."""
+    results = {}
+    for name, extractor in get_extractors(features, extractor_options).items():
+        def extract(analysis: AudioAnalysis, extractor=extractor) -> dict:
+            return extractor.extract_from_analysis(AudioAnalysis(analysis.audio, analysis.sr))
+
+        results[f"extractor:{name}"] = time_per_clip(extract, analyses, repeat)
+    return results
+
+
+def benchmark_decode(clips_dir: Path, clips: list[ClipTask], repeat: int) -> dict:
+    """Time decoding an mp3 and trimming its silence."""
+    def decode(clip: ClipTask) -> AudioAnalysis:
+        audio, sr = librosa.load(clips_dir / clip[0], sr=None)
+        return AudioAnalysis.from_untrimmed(audio, sr)
+
+    return time_per_clip(decode, clips, repeat)
+
+
+def benchmark_process_clip(clips_dir: Path, clips: list[ClipTask], options: ExtractionOptions, repeat: int) -> dict:
+    """Time the whole per-clip path (decode, trim and every selected extractor) in a single thread."""
+    processor = ClipProcessor(options.processor_config("benchmark", clips_dir))
+    return time_per_clip(processor, clips, repeat)
+
+
+def benchmark_pipeline(corpus_dir: Path, clips: list[ClipTask], options: ExtractionOptions) -> dict:
+    """Time a complete extraction run, including the executor, the writer and the output file."""
+    with tempfile.TemporaryDirectory() as destination, StageMemory() as memory:
+        start = time.perf_counter()
+        processed = extract_clips("benchmark", clips, corpus_dir / "clips", Path(destination), options, total=len(clips))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "clips": processed,
+        "seconds": elapsed,
+        "clips_per_sec": processed / max(elapsed, 1e-12),
+        "peak_rss_delta_mb": memory.delta_mb,
+        "worker_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_benchmarks(
+    corpus_dir: Path,
+    options: ExtractionOptions,
+    stages: list[str],
+    repeat: int = 1,
+    max_clips: int | None = None,
+) -> dict:
+    """Run the selected stages on a corpus directory and return the results with a description of the environment."""
+    clips = load_corpus(corpus_dir, max_clips)
+    clips_dir = corpus_dir / "clips"
+    logging.info(f"Benchmarking {len(clips)} clips from {corpus_dir}")
+
+    results: dict[str, dict] = {}
+    if "extractors" in stages:
+        analyses = []
+        for path, _, _ in clips:
+            audio, sr = librosa.load(clips_dir / path, sr=None)
+            analyses.append(AudioAnalysis.from_untrimmed(audio, sr))
+        results.update(benchmark_extractors(analyses, options.features, options.extractor_options, repeat))
+    if "decode" in stages:
+        results["decode_trim"] = benchmark_decode(clips_dir, clips, repeat)
+    if "process" in stages:
+        results["process_clip"] = benchmark_process_clip(clips_dir, clips, options, repeat)
+    if "pipeline" in stages:
+        results["pipeline"] = benchmark_pipeline(corpus_dir, clips, options)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "librosa": librosa.__version__,
+        },
+        "settings": {
+            "clips": len(clips),
+            "repeat": repeat,
+            "features": options.features,
+            "executor": options.executor,
+            "workers": options.workers,
+            "batch_clips": options.batch_clips,
+        },
+        "stages": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.1) -> list[str]:
+    """
+    Compare two benchmark results stage by stage and describe every regression beyond `tolerance`.
+
+    Throughput must not drop and latency percentiles or the memory added by a stage must not
+    grow by more than the relative tolerance; stages or metrics missing from either side are ignored.
+    """
+    regressions = []
+    for stage, current_metrics in current["stages"].items():
+        baseline_metrics = baseline["stages"].get(stage)
+        if baseline_metrics is None:
+            continue
+
+        for metric in ("clips_per_sec", *LOWER_IS_BETTER):
+            if metric not in baseline_metrics or metric not in current_metrics:
+                continue
+            old, new = baseline_metrics[metric], current_metrics[metric]
+            if old <= 0:
+                continue
+
+            change = (new - old) / old
+            if metric in LOWER_IS_BETTER and change > tolerance or metric not in LOWER_IS_BETTER and change < -tolerance:
+                regressions.append(f"{stage} {metric}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
@@ -0,0 +1,48 @@
+import numpy as np
+
+SILENCE_SECONDS = 0.2
+NOISE_LEVEL = 0.003
+
+
+def synthesize_clip(duration: float, sr: int, f0: float, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generate a deterministic speech-like clip: a harmonic stack with a gliding f0,
+    a syllable-rate amplitude envelope and background noise, padded with near-silence.
+
+    Returns the float32 waveform and the true f0 of every sample (0 in the padding).
+    """
+    rng = np.random.default_rng(seed)
+    n_voiced = int(duration * sr)
+    t = np.arange(n_voiced) / sr
+
+    contour = f0 * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.5, 2.0) * t + rng.uniform(0, 2 * np.pi)))
+    phase = 2 * np.pi * np.cumsum(contour) / sr
+
+    n_harmonics = int(min(4000.0, 0.45 * sr) // (f0 * 1.1))
+    voiced = sum(np.sin(k * phase) / k for k in range(1, n_harmonics + 1))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t) ** 2
+    voiced = 0.2 * voiced * envelope
+
+    n_silence = int(SILENCE_SECONDS * sr)
+    audio = np.concatenate([np.zeros(n_silence), voiced, np.zeros(n_silence)])
+    audio = audio + NOISE_LEVEL * rng.standard_normal(len(audio))
+    true_f0 = np.concatenate([np.zeros(n_silence), contour, np.zeros(n_silence)])
+
+    return audio.astype(np.float32), true_f0
+
+
+def synthesize_corpus(
+    durations: list[float],
+    sample_rates: list[int],
+    clips_per_setting: int = 4,
+    seed: int = 0,
+) -> list[tuple[np.ndarray, int, np.ndarray]]:
+    """Generate `clips_per_setting` clips for every (duration, sample rate) pair, with f0 spread over the speech range."""
+    clips = []
+    for duration in durations:
+        for sr in sample_rates:
+            for i in range(clips_per_setting):
+                f0 = 90.0 + 160.0 * i / max(clips_per_setting - 1, 1)
+                audio, true_f0 = synthesize_clip(duration, sr, f0, seed=seed + len(clips))
+                clips.append((audio, sr, true_f0))
+    return clips
@@ -1,37 +1,27 @@
 import argparse
 import logging
-import requests
 from pathlib import Path
-from tqdm import tqdm
 import tarfile
 
+from downloader.api import COMMONVOICE_API_URL, DEFAULT_CACHE_TTL_HOURS, CommonVoiceClient, ResponseCache
+from downloader.limits import BandwidthLimiter
+from downloader.orchestrator import DatasetDownload, DownloadLimits, DownloadOrchestrator
+from downloader.segmented import DEFAULT_CONNECTIONS, create_session
+from pipeline.clip_manifest import ClipManifest, clip_manifest_path, content_hash
+from pipeline.options import ExtractionOptions, add_extraction_arguments
 from utils.logging_setup import setup_logging
 from utils.file_manager import ensure_directory_exists, delete_directory_if_exists
 
-setup_logging()
-
-COMMONVOICE_API_URL = "https://commonvoice.mozilla.org/api/v1"
 BYTES_PER_GB = 2**30
+BYTES_PER_MB = 2**20
 
 
-def list_available_languages() -> dict[str, str]:
-    url = f"{COMMONVOICE_API_URL}/languages/en/translations"
-    response = requests.get(url)
-    response_text = response.text
-
-    languages_section = response_text.split("## Languages")[1].split("# [/]")[0].strip()
-    languages = [
-        line.split(" = ") for line in languages_section.split("\n") if " = " in line
-    ]
+def list_available_languages(client: CommonVoiceClient | None = None) -> dict[str, str]:
+    return (client or CommonVoiceClient()).list_languages()
 
-    return {symbol.strip(): name.strip() for symbol, name in languages}
 
-
-def get_language_datasets(language: str) -> list:
-    url = f"{COMMONVOICE_API_URL}/datasets/languages/{language}"
-    response = requests.get(url)
-    logging.info(f"Retrieved dataset information for language: {language}")
-    return response.json()
+def get_language_datasets(language: str, client: CommonVoiceClient | None = None) -> list:
+    return (client or CommonVoiceClient()).language_datasets(language)
 
 
 def select_largest_dataset(datasets: list, max_bytes: int, language: str) -> dict | None:
@@ -63,44 +53,52 @@ def select_largest_dataset(datasets: list, max_bytes: int, language: str) -> dic
     return largest_dataset
 
 
-def download_file_from_url(url: str, save_path: Path) -> None:
-    file_name = url.split("/")[-1].split("?")[0]
-    logging.info(f"Starting download of file: {file_name}")
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get("content-length", 0))
-    block_size = 1024
-
-    with open(save_path, "wb") as file, tqdm(
-        desc=file_name,
-        total=total_size,
-        unit="iB",
-        unit_scale=True,
-        unit_divisor=1024,
-    ) as bar:
-        for data in response.iter_content(chunk_size=block_size):
-            file.write(data)
-            bar.update(len(data))
+def extract_files_from_tar(file_path: Path, extract_path: Path) -> int:
+    """
+    Unpack `validated.tsv` and the clips of an archive into `extract_path`, delete the archive and return the number of bytes written.
 
-    logging.info(f"Download completed for file: {file_name}")
-
-
-def extract_files_from_tar(file_path: Path, extract_path: Path) -> None:
+    Clips are compared with the language's clip manifest, so only new or changed clips are
+    written and clips missing from the archive are removed: unpacking a new release over
+    the previous one writes the difference between the two.
+    """
     logging.info(f"Extracting contents from tar file: {file_path}")
+    clips_dir = extract_path / "clips"
+    manifest = ClipManifest.load(clip_manifest_path(extract_path))
+    if len(manifest) == 0 and clips_dir.exists():
+        manifest.refresh(clips_dir)
+
+    names = set()
+    written = 0
+    written_bytes = 0
     with tarfile.open(file_path) as tar:
-        for member in tar.getmembers():
+        for member in tar:
             if member.isfile():
                 if member.name.endswith("validated.tsv"):
                     member.name = "validated.tsv"
                     tar.extract(member, path=extract_path, set_attrs=False)
+                    written_bytes += member.size
                 elif "clips/" in member.name:
-                    member.name = str(Path("clips") / Path(member.name).name)
-                    tar.extract(member, path=extract_path, set_attrs=False)
-    logging.info(f"Extraction completed for tar file: {file_path}")
+                    name = Path(member.name).name
+                    data = tar.extractfile(member).read()
+                    digest = content_hash(data)
+                    names.add(name)
+                    if not manifest.is_current(name, len(data), digest, clips_dir):
+                        manifest.write_clip(name, data, clips_dir, digest)
+                        written += 1
+                        written_bytes += len(data)
+
+    removed = manifest.remove_missing(names, clips_dir)
+    manifest.save()
+    logging.info(
+        f"Extraction completed for tar file: {file_path} "
+        f"({written} new or changed clips, {len(names) - written} unchanged, {removed} removed)"
+    )
     file_path.unlink()
+    return written_bytes
 
 
-def download_and_extract_language_data(language: str, max_bytes: int, zips_dir: Path, destination: Path) -> Path | None:
-    datasets = get_language_datasets(language)
+def select_dataset(language: str, max_bytes: int, client: CommonVoiceClient | None = None) -> DatasetDownload | None:
+    datasets = get_language_datasets(language, client)
     selected_dataset = select_largest_dataset(datasets, max_bytes, language)
 
     if not selected_dataset:
@@ -108,36 +106,112 @@ def download_and_extract_language_data(language: str, max_bytes: int, zips_dir:
         return None
 
     download_path = selected_dataset["download_path"].replace("{locale}", language)
-    download_url = f"{COMMONVOICE_API_URL}/bucket/dataset/{download_path.replace('/', '%2F')}"
+    return DatasetDownload(language, download_path, selected_dataset["size"])
 
-    response = requests.get(download_url)
-    download_info = response.json()
-    file_url = download_info["url"]
 
-    file_name = zips_dir / f"{language}.tar.gz"
-    download_file_from_url(file_url, file_name)
+def resolve_dataset_url(language: str, max_bytes: int, client: CommonVoiceClient | None = None) -> str | None:
+    client = client or CommonVoiceClient()
+    dataset = select_dataset(language, max_bytes, client)
+    if dataset is None:
+        return None
+    return client.download_url(dataset.download_path)
+
+
+def download_and_extract_features(
+    language: str,
+    max_bytes: int,
+    destination: Path,
+    features_destination: Path,
+    options: ExtractionOptions,
+    client: CommonVoiceClient | None = None,
+    limiter: BandwidthLimiter | None = None,
+) -> Path | None:
+    """
+    Download, untar and extract features for a language in one pipelined pass.
+
+    The archive is unpacked as it streams in and every clip is queued for feature
+    extraction as soon as it is on disk, so extraction overlaps the download instead of
+    waiting for it. Clips can only start once validated.tsv has been read from the archive.
+    """
+    # Imported here so that plain downloads do not load the extraction pipeline.
+    from downloader.streaming import stream_clips
+    from pipeline.runner import extract_clips
+
+    file_url = resolve_dataset_url(language, max_bytes, client)
+    if file_url is None:
+        return None
 
     extract_path = destination / language
     delete_directory_if_exists(extract_path)
     ensure_directory_exists(extract_path)
 
-    extract_files_from_tar(file_name, extract_path)
-
+    # The spectrum is accumulated per gender and age inside the workers, and filtered clips should not be extracted at all.
+    defer_metadata = not options.spectrum and not options.metadata_filter.selects_by_metadata
+    if not defer_metadata:
+        logging.info("Clips are held back until validated.tsv has been read, which real archives store after the clips")
+    clips, download_thread = stream_clips(
+        file_url, extract_path, create_session(pool_size=1), options.metadata_filter, limiter, defer_metadata
+    )
+    extract_clips(
+        language,
+        clips,
+        extract_path / "clips",
+        features_destination,
+        options,
+        attach_metadata=clips.attach_metadata if defer_metadata else None,
+    )
+    download_thread.join()
+
+    if clips.error is not None:
+        raise clips.error
     return extract_path
 
 
-def download_datasets(languages: list[str], size_limit_gb: float, destination: str, zips_dir: str) -> None:
+def download_datasets(
+    languages: list[str],
+    size_limit_gb: float,
+    destination: str,
+    zips_dir: str,
+    connections: int = DEFAULT_CONNECTIONS,
+    features_destination: str | None = None,
+    options: ExtractionOptions | None = None,
+    client: CommonVoiceClient | None = None,
+    limits: DownloadLimits = DownloadLimits(),
+) -> None:
+    """
+    Download the datasets of every language, concurrently within `limits` unless pipelined.
+
+    Pipelined downloads run one language at a time, since feature extraction already keeps
+    every core busy, but still share the bandwidth limit.
+    """
     max_bytes = int(size_limit_gb * BYTES_PER_GB)
-    zips_path = Path(zips_dir)
-    ensure_directory_exists(zips_path)
-
-    for language in languages:
-        logging.info(f"Downloading dataset for language: {language}")
-        try:
-            download_and_extract_language_data(language, max_bytes, zips_path, Path(destination))
-        except Exception as e:
-            logging.error(f"Error downloading dataset for language {language}: {e}")
-            continue
+    client = client or CommonVoiceClient()
+
+    if features_destination is not None:
+        ensure_directory_exists(Path(features_destination))
+        limiter = BandwidthLimiter(limits.max_bandwidth) if limits.max_bandwidth else None
+        for language in languages:
+            logging.info(f"Downloading dataset for language: {language}")
+            try:
+                download_and_extract_features(
+                    language, max_bytes, Path(destination), Path(features_destination), options or ExtractionOptions(), client, limiter
+                )
+            except Exception as e:
+                logging.error(f"Error downloading dataset for language {language}: {e}")
+                continue
+    else:
+        downloads = []
+        for language in languages:
+            try:
+                dataset = select_dataset(language, max_bytes, client)
+            except Exception as e:
+                logging.error(f"Error retrieving datasets for language {language}: {e}")
+                continue
+            if dataset is not None:
+                downloads.append(dataset)
+
+        orchestrator = DownloadOrchestrator(client, Path(zips_dir), Path(destination), extract_files_from_tar, connections, limits)
+        orchestrator.run(downloads)
 
     logging.info("All downloads and extractions completed.")
 
@@ -148,12 +222,28 @@ def main():
     parser.add_argument("--size", type=float, help="Maximum dataset size to download in GB")
     parser.add_argument("--destination", type=str, default="data/raw", help="Destination path for downloaded and extracted data")
     parser.add_argument("--zips-dir", type=str, default="data/zips", help="Directory to store zip files during download")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help="Number of concurrent HTTP range requests per download")
     parser.add_argument("--list-languages", action="store_true", help="List available languages from Common Voice API")
+    parser.add_argument("--pipelined", action="store_true", help="Extract features while the archive is downloading instead of after it; the archive is streamed and never stored")
+    parser.add_argument("--features-destination", type=str, default="data/features", help="Path to save extracted features in pipelined mode")
+    parser.add_argument("--parallel-languages", type=int, default=DownloadLimits.parallel_downloads, help="Number of languages downloaded at the same time")
+    parser.add_argument("--untar-workers", type=int, default=DownloadLimits.untar_workers, help="Number of archives unpacked at the same time, while other languages are downloading")
+    parser.add_argument("--max-bandwidth", type=float, help="Combined download bandwidth limit in MB/s")
+    parser.add_argument("--max-disk", type=float, help="Disk space the downloads may fill in GB, archives included (default: the free space)")
+    parser.add_argument("--api-url", type=str, default=COMMONVOICE_API_URL, help="Base URL of the Common Voice API, e.g. a local mock API for testing")
+    parser.add_argument("--api-cache", type=str, default="data/cache/api", help="Directory caching the language and dataset lists of the API")
+    parser.add_argument("--api-cache-ttl", type=float, default=DEFAULT_CACHE_TTL_HOURS, help="Hours before cached API responses are requested again; 0 disables the cache")
+    parser.add_argument("--refresh-api-cache", action="store_true", help="Request the language and dataset lists again, replacing the cached responses")
+    add_extraction_arguments(parser)
 
     args = parser.parse_args()
+    setup_logging()
+
+    cache = ResponseCache(Path(args.api_cache), args.api_cache_ttl * 3600, refresh=args.refresh_api_cache)
+    client = CommonVoiceClient(args.api_url, cache)
 
     if args.list_languages:
-        available_languages = list_available_languages()
+        available_languages = list_available_languages(client)
         print("Available languages:")
         for symbol, name in available_languages.items():
             print(f"{symbol}: {name}")
@@ -163,8 +253,30 @@ def main():
         parser.error("The --languages argument is required unless --list-languages is specified.")
     if not args.size:
         parser.error("The --size argument is required unless --list-languages is specified.")
-
-    download_datasets(args.languages, args.size, args.destination, args.zips_dir)
+    if args.pipelined and args.incremental:
+        parser.error("--incremental is not supported with --pipelined, which unpacks every release from scratch.")
+    try:
+        options = ExtractionOptions.from_args(args)
+        limits = DownloadLimits(
+            parallel_downloads=args.parallel_languages,
+            untar_workers=args.untar_workers,
+            max_bandwidth=args.max_bandwidth * BYTES_PER_MB if args.max_bandwidth is not None else None,
+            max_disk=int(args.max_disk * BYTES_PER_GB) if args.max_disk is not None else None,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    download_datasets(
+        args.languages,
+        args.size,
+        args.destination,
+        args.zips_dir,
+        args.connections,
+        features_destination=args.features_destination if args.pipelined else None,
+        options=options,
+        client=client,
+        limits=limits,
+    )
 
 
 if __name__ == "__main__":
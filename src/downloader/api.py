@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import requests
+from pathlib import Path
+from typing import Any
+from downloader.segmented import REQUEST_TIMEOUT, create_session
+
+COMMONVOICE_API_URL = "https://commonvoice.mozilla.org/api/v1"
+DEFAULT_CACHE_TTL_HOURS = 24.0
+
+
+class ResponseCache:
+    """
+    API responses stored as one JSON file per request URL under `cache_dir`.
+
+    An entry is returned only while it is younger than `ttl_seconds`; a TTL of 0 disables
+    the cache, and `refresh` ignores existing entries while still storing new ones. Entries
+    are written to a temporary file and renamed, so concurrent readers never see a partial
+    entry.
+    """
+
+    def __init__(self, cache_dir: Path, ttl_seconds: float, refresh: bool = False):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.refresh = refresh
+
+    def get(self, key: str) -> Any | None:
+        if self.ttl_seconds <= 0 or self.refresh:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or time.time() - entry["fetched_at"] > self.ttl_seconds:
+            return None
+        return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"key": key, "fetched_at": time.time(), "value": value}))
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+class CommonVoiceClient:
+    """
+    Client of the Common Voice API sharing one pooled session.
+
+    The language list and the dataset lists go through the response cache, so reruns and
+    `--list-languages` do not hit the network while the cache is fresh. Download URLs of
+    archives are signed and expire, so they are always requested anew. `base_url` can point
+    to any server exposing the same endpoints, e.g. a local mock API.
+    """
+
+    def __init__(
+        self,
+        base_url: str = COMMONVOICE_API_URL,
+        cache: ResponseCache | None = None,
+        session: requests.Session | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.session = session or create_session(pool_size=4)
+
+    def list_languages(self) -> dict[str, str]:
+        response_text = self._get(f"{self.base_url}/languages/en/translations", as_json=False)
+
+        languages_section = response_text.split("## Languages")[1].split("# [/]")[0].strip()
+        languages = [
+            line.split(" = ") for line in languages_section.split("\n") if " = " in line
+        ]
+
+        return {symbol.strip(): name.strip() for symbol, name in languages}
+
+    def language_datasets(self, language: str) -> list:
+        datasets = self._get(f"{self.base_url}/datasets/languages/{language}")
+        logging.info(f"Retrieved dataset information for language: {language}")
+        return datasets
+
+    def download_url(self, download_path: str) -> str:
+        url = f"{self.base_url}/bucket/dataset/{download_path.replace('/', '%2F')}"
+        return self._get(url, cached=False)["url"]
+
+    def _get(self, url: str, as_json: bool = True, cached: bool = True) -> Any:
+        key = f"{'json' if as_json else 'text'}:{url}"
+        if cached and self.cache is not None:
+            value = self.cache.get(key)
+            if value is not None:
+                logging.debug(f"Using cached response for {url}")
+                return value
+
+        response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        value = response.json() if as_json else response.text
+
+        if cached and self.cache is not None:
+            self.cache.put(key, value)
+        return value
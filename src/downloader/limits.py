@@ -0,0 +1,85 @@
+import logging
+import shutil
+import threading
+import time
+from pathlib import Path
+
+# At least one read buffer of a download, so a single read never waits longer than it has to.
+MIN_BURST_BYTES = 2**20
+
+
+class BandwidthLimiter:
+    """
+    Token bucket capping the combined rate of every download sharing it.
+
+    Readers call `consume` with the size of each chunk they received; the bucket goes into
+    debt and the caller sleeps until the debt has been paid off at `bytes_per_second`, so
+    concurrent readers are throttled in the order they arrive.
+    """
+
+    def __init__(self, bytes_per_second: float, burst_bytes: int | None = None):
+        if bytes_per_second <= 0:
+            raise ValueError(f"Bandwidth limit must be positive, got {bytes_per_second}")
+        self.bytes_per_second = bytes_per_second
+        self.burst_bytes = burst_bytes or max(MIN_BURST_BYTES, int(bytes_per_second // 4))
+        self._tokens = float(self.burst_bytes)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst_bytes, self._tokens + (now - self._updated) * self.bytes_per_second)
+            self._updated = now
+            self._tokens -= n_bytes
+            wait = -self._tokens / self.bytes_per_second
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DiskBudget:
+    """
+    Disk space that concurrent downloads claim before writing anything.
+
+    The budget is `max_bytes`, capped by the free space of `paths` when it is created.
+    `reserve` blocks until the claim fits next to the other claims. A claim that does not
+    fit while no other claim can still shrink would wait forever, so it raises ValueError
+    instead. `release` gives back part or all of a claim; bytes kept on disk for good, like
+    unpacked clips, are simply never released.
+    """
+
+    def __init__(self, paths: list[Path], max_bytes: int | None = None):
+        free_bytes = min(shutil.disk_usage(_existing_parent(path)).free for path in paths)
+        self.max_bytes = free_bytes if max_bytes is None else min(max_bytes, free_bytes)
+        self.reserved = 0
+        self._open_claims = 0
+        self._condition = threading.Condition()
+
+    def reserve(self, n_bytes: int, name: str) -> None:
+        with self._condition:
+            if self.reserved + n_bytes > self.max_bytes and self._open_claims > 0:
+                logging.info(f"Waiting for disk space for {name}: {n_bytes / 2**30:.2f} GB needed, {(self.max_bytes - self.reserved) / 2**30:.2f} GB available")
+            while self.reserved + n_bytes > self.max_bytes:
+                if self._open_claims == 0:
+                    raise ValueError(
+                        f"{name} needs {n_bytes / 2**30:.2f} GB of disk, only {(self.max_bytes - self.reserved) / 2**30:.2f} GB "
+                        f"of the {self.max_bytes / 2**30:.2f} GB budget are left"
+                    )
+                self._condition.wait()
+            self.reserved += n_bytes
+            self._open_claims += 1
+
+    def release(self, n_bytes: int, final: bool = False) -> None:
+        """Give back `n_bytes` of a claim; `final` closes the claim, which cannot shrink any further."""
+        with self._condition:
+            self.reserved -= n_bytes
+            if final:
+                self._open_claims -= 1
+            self._condition.notify_all()
+
+
+def _existing_parent(path: Path) -> Path:
+    path = path.absolute()
+    while not path.exists():
+        path = path.parent
+    return path
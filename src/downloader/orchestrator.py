@@ -0,0 +1,133 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from collections.abc import Callable
+from downloader.api import CommonVoiceClient
+from downloader.limits import BandwidthLimiter, DiskBudget
+from downloader.segmented import DEFAULT_CONNECTIONS, SegmentedDownloader, create_session
+from utils.file_manager import ensure_directory_exists
+
+
+@dataclass(frozen=True)
+class DownloadLimits:
+    parallel_downloads: int = 2
+    untar_workers: int = 1
+    # Combined bandwidth of every download in bytes per second, None for no limit.
+    max_bandwidth: float | None = None
+    # Disk space the run may fill in bytes, None for the free space of the destination.
+    max_disk: int | None = None
+
+    def __post_init__(self):
+        if self.parallel_downloads < 1 or self.untar_workers < 1:
+            raise ValueError("parallel_downloads and untar_workers must be at least 1")
+        if self.max_bandwidth is not None and self.max_bandwidth <= 0:
+            raise ValueError(f"max_bandwidth must be positive, got {self.max_bandwidth}")
+        if self.max_disk is not None and self.max_disk <= 0:
+            raise ValueError(f"max_disk must be positive, got {self.max_disk}")
+
+
+@dataclass(frozen=True)
+class DatasetDownload:
+    language: str
+    # `download_path` of the dataset in the API, with the locale already filled in.
+    download_path: str
+    size: int
+
+
+class DownloadOrchestrator:
+    """
+    Download and untar the datasets of several languages concurrently.
+
+    Up to `parallel_downloads` archives are downloaded at once, all drawing from one
+    bandwidth limiter. Each finished archive is handed to a separate pool of untar workers,
+    so the next language starts downloading while the previous one is still being
+    unpacked. Before its download starts, a language claims twice the archive size in the
+    disk budget, for the archive and its unpacked clips; once the archive is unpacked and
+    deleted, the claim shrinks to the bytes the unpacking wrote. `extract_archive` unpacks
+    an archive into a directory and returns that number of bytes.
+    """
+
+    def __init__(
+        self,
+        client: CommonVoiceClient,
+        zips_dir: Path,
+        destination: Path,
+        extract_archive: Callable[[Path, Path], int],
+        connections: int = DEFAULT_CONNECTIONS,
+        limits: DownloadLimits = DownloadLimits(),
+    ):
+        self.client = client
+        self.zips_dir = zips_dir
+        self.destination = destination
+        self.extract_archive = extract_archive
+        self.connections = connections
+        self.limits = limits
+        self.session = create_session(pool_size=connections * limits.parallel_downloads)
+        self.limiter = BandwidthLimiter(limits.max_bandwidth) if limits.max_bandwidth else None
+        self.disk = DiskBudget([zips_dir, destination], limits.max_disk)
+
+    def run(self, downloads: list[DatasetDownload]) -> dict[str, Path | None]:
+        """Download and unpack every dataset, returning the directory of each language or None if it failed."""
+        ensure_directory_exists(self.zips_dir)
+        ensure_directory_exists(self.destination)
+        logging.info(
+            f"Downloading {len(downloads)} datasets, {self.limits.parallel_downloads} at a time, "
+            f"with a disk budget of {self.disk.max_bytes / 2**30:.2f} GB"
+            + (f" and {self.limits.max_bandwidth / 2**20:.1f} MB/s of bandwidth" if self.limiter is not None else "")
+        )
+
+        results: dict[str, Path | None] = {}
+        with (
+            ThreadPoolExecutor(self.limits.untar_workers, thread_name_prefix="untar") as untar_pool,
+            ThreadPoolExecutor(self.limits.parallel_downloads, thread_name_prefix="download") as download_pool,
+        ):
+            pending_downloads = {download_pool.submit(self._download, download): download for download in downloads}
+            pending_untars = {}
+            for future in as_completed(pending_downloads):
+                download = pending_downloads[future]
+                try:
+                    archive = future.result()
+                except Exception as e:
+                    logging.error(f"Error downloading dataset for language {download.language}: {e}")
+                    results[download.language] = None
+                    continue
+                pending_untars[untar_pool.submit(self._untar, download, archive)] = download
+
+            for future in as_completed(pending_untars):
+                download = pending_untars[future]
+                try:
+                    results[download.language] = future.result()
+                except Exception as e:
+                    logging.error(f"Error extracting dataset for language {download.language}: {e}")
+                    results[download.language] = None
+
+        return results
+
+    def _download(self, download: DatasetDownload) -> Path:
+        self.disk.reserve(2 * download.size, download.language)
+        try:
+            start = time.perf_counter()
+            url = self.client.download_url(download.download_path)
+            archive = self.zips_dir / f"{download.language}.tar.gz"
+            SegmentedDownloader(self.session, self.connections, limiter=self.limiter).download(url, archive)
+        except BaseException:
+            self.disk.release(2 * download.size, final=True)
+            raise
+        logging.info(f"Downloaded {download.language} ({download.size / 2**30:.2f} GB) in {time.perf_counter() - start:.1f}s")
+        return archive
+
+    def _untar(self, download: DatasetDownload, archive: Path) -> Path:
+        extract_path = self.destination / download.language
+        try:
+            start = time.perf_counter()
+            ensure_directory_exists(extract_path)
+            unpacked = self.extract_archive(archive, extract_path)
+        except BaseException:
+            self.disk.release(2 * download.size, final=True)
+            raise
+        # Only what this archive wrote stays claimed; clips kept from an earlier release were never part of the claim.
+        self.disk.release(max(0, 2 * download.size - unpacked), final=True)
+        logging.info(f"Unpacked {download.language} ({unpacked / 2**30:.2f} GB) in {time.perf_counter() - start:.1f}s")
+        return extract_path
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import requests
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.util.retry import Retry
+from downloader.limits import BandwidthLimiter
+
+DEFAULT_CONNECTIONS = 8
+DEFAULT_SEGMENT_BYTES = 64 * 2**20
+BUFFER_BYTES = 2**20
+PROGRESS_SAVE_BYTES = 16 * 2**20
+SEGMENT_ATTEMPTS = 3
+REQUEST_TIMEOUT = 60
+
+
+def create_session(pool_size: int = DEFAULT_CONNECTIONS) -> requests.Session:
+    """Session with a connection pool large enough for one connection per segment worker, retrying transient errors."""
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET", "HEAD"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SegmentedDownloader:
+    """
+    Download a file over several concurrent HTTP Range requests into a preallocated file.
+
+    Progress of every segment is kept in a `<file>.progress` JSON file next to the download,
+    so an interrupted download continues where each segment stopped. Servers that do not
+    answer a Range request with 206 get a single streamed download instead. Downloads sharing
+    a `limiter` are throttled to its combined bandwidth.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session | None = None,
+        connections: int = DEFAULT_CONNECTIONS,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        buffer_bytes: int = BUFFER_BYTES,
+        limiter: BandwidthLimiter | None = None,
+    ):
+        self.session = session or create_session(connections)
+        self.connections = connections
+        self.segment_bytes = segment_bytes
+        self.buffer_bytes = buffer_bytes
+        self.limiter = limiter
+
+    def download(self, url: str, save_path: Path) -> None:
+        file_name = save_path.name
+        logging.info(f"Starting download of file: {file_name}")
+
+        probe = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=REQUEST_TIMEOUT)
+        probe.raise_for_status()
+
+        if probe.status_code != 206 or "Content-Range" not in probe.headers:
+            logging.info(f"Server does not support range requests for {file_name}, using a single stream")
+            self._download_single_stream(probe, save_path)
+        else:
+            probe.close()
+            total_size = int(probe.headers["Content-Range"].split("/")[-1])
+            self._download_segments(url, save_path, total_size, probe.headers.get("ETag"))
+
+        logging.info(f"Download completed for file: {file_name}")
+
+    def _download_single_stream(self, response: requests.Response, save_path: Path) -> None:
+        total_size = int(response.headers.get("content-length", 0))
+        with response, open(save_path, "wb") as file, self._progress_bar(save_path.name, total_size) as bar:
+            for data in response.iter_content(chunk_size=self.buffer_bytes):
+                file.write(data)
+                bar.update(len(data))
+                if self.limiter is not None:
+                    self.limiter.consume(len(data))
+
+    def _download_segments(self, url: str, save_path: Path, total_size: int, etag: str | None) -> None:
+        progress_path = save_path.with_name(f"{save_path.name}.progress")
+        state = self._load_progress(progress_path, save_path, total_size, etag)
+
+        if state is None:
+            state = {
+                "size": total_size,
+                "etag": etag,
+                "segment_bytes": self.segment_bytes,
+                "completed": [0] * -(-total_size // self.segment_bytes),
+            }
+            with open(save_path, "wb") as file:
+                file.truncate(total_size)
+            self._save_progress(progress_path, state)
+        else:
+            logging.info(f"Resuming download of {save_path.name}: {sum(state['completed']) / total_size:.1%} already downloaded")
+
+        lock = threading.Lock()
+        segment_bytes = state["segment_bytes"]
+
+        def download_segment(index: int) -> None:
+            start = index * segment_bytes
+            end = min(start + segment_bytes, total_size)
+
+            for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+                position = start + state["completed"][index]
+                if position >= end:
+                    return
+                try:
+                    self._download_range(url, save_path, position, end, index, state, progress_path, lock, bar)
+                    return
+                except (requests.RequestException, OSError) as e:
+                    if attempt == SEGMENT_ATTEMPTS:
+                        raise
+                    logging.warning(f"Segment {index} of {save_path.name} failed (attempt {attempt}): {e}")
+
+        pending = [
+            index
+            for index, completed in enumerate(state["completed"])
+            if completed < min(segment_bytes, total_size - index * segment_bytes)
+        ]
+
+        with self._progress_bar(save_path.name, total_size) as bar:
+            bar.update(sum(state["completed"]))
+            try:
+                with ThreadPoolExecutor(max_workers=self.connections) as executor:
+                    for _ in executor.map(download_segment, pending):
+                        pass
+            finally:
+                with lock:
+                    self._save_progress(progress_path, state)
+
+        if sum(state["completed"]) != total_size:
+            raise IOError(f"Incomplete download of {save_path.name}: {sum(state['completed'])} of {total_size} bytes")
+        progress_path.unlink()
+
+    def _download_range(
+        self,
+        url: str,
+        save_path: Path,
+        position: int,
+        end: int,
+        index: int,
+        state: dict,
+        progress_path: Path,
+        lock: threading.Lock,
+        bar: tqdm,
+    ) -> None:
+        headers = {"Range": f"bytes={position}-{end - 1}"}
+        unsaved = 0
+
+        with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Expected a partial response for bytes {position}-{end - 1}, got {response.status_code}")
+
+            # Unbuffered, so the saved progress never counts bytes still sitting in a Python buffer.
+            with open(save_path, "r+b", buffering=0) as file:
+                file.seek(position)
+                for data in response.iter_content(chunk_size=self.buffer_bytes):
+                    data = data[: end - position]
+                    file.write(data)
+                    position += len(data)
+                    unsaved += len(data)
+
+                    with lock:
+                        state["completed"][index] += len(data)
+                        bar.update(len(data))
+                        if unsaved >= PROGRESS_SAVE_BYTES:
+                            self._save_progress(progress_path, state)
+                            unsaved = 0
+
+                    if self.limiter is not None:
+                        self.limiter.consume(len(data))
+                    if position >= end:
+                        break
+
+        if position < end:
+            raise IOError(f"Connection closed at byte {position} of segment ending at {end}")
+
+    def _load_progress(self, progress_path: Path, save_path: Path, total_size: int, etag: str | None) -> dict | None:
+        if not progress_path.exists() or not save_path.exists():
+            return None
+
+        state = json.loads(progress_path.read_text())
+        if state["size"] != total_size or state["etag"] != etag or save_path.stat().st_size != total_size:
+            logging.warning(f"Remote file changed since the interrupted download of {save_path.name}, starting over")
+            return None
+        return state
+
+    @staticmethod
+    def _save_progress(progress_path: Path, state: dict) -> None:
+        tmp_path = progress_path.with_name(f"{progress_path.name}.tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, progress_path)
+
+    @staticmethod
+    def _progress_bar(file_name: str, total_size: int) -> tqdm:
+        return tqdm(desc=file_name, total=total_size, unit="iB", unit_scale=True, unit_divisor=1024)
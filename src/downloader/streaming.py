@@ -0,0 +1,199 @@
+import logging
+import pickle
+import queue
+import tarfile
+import tempfile
+import threading
+import pandas as pd
+import requests
+from pathlib import Path
+from collections.abc import Callable, Iterable, Iterator
+from pipeline.metadata import ClipTask, MetadataFilter, iter_metadata, shard_of
+from downloader.limits import BandwidthLimiter
+from downloader.segmented import BUFFER_BYTES, REQUEST_TIMEOUT
+
+_END = None
+# Gender and age of a clip handed out before validated.tsv was read; results get the real ones in `attach_metadata`.
+PENDING_METADATA = ""
+
+
+def stream_extract_tar(
+    url: str,
+    extract_path: Path,
+    session: requests.Session,
+    on_validated: Callable[[Path], None] | None = None,
+    on_clip: Callable[[str], None] | None = None,
+    bufsize: int = BUFFER_BYTES,
+    limiter: BandwidthLimiter | None = None,
+) -> None:
+    """
+    Extract `validated.tsv` and the clips of a .tar.gz archive while it is being downloaded.
+
+    The archive is read as a stream straight from the HTTP response, so it is never stored
+    on disk. Members are renamed like in `extract_files_from_tar`, and the callbacks are
+    invoked as soon as each file has been written.
+    """
+    logging.info(f"Streaming extraction of {url} into {extract_path}")
+    with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        fileobj = response.raw if limiter is None else _ThrottledReader(response.raw, limiter)
+
+        with tarfile.open(fileobj=fileobj, mode="r|gz", bufsize=bufsize) as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                if member.name.endswith("validated.tsv"):
+                    member.name = "validated.tsv"
+                    tar.extract(member, path=extract_path, set_attrs=False)
+                    if on_validated is not None:
+                        on_validated(extract_path / member.name)
+                elif "clips/" in member.name:
+                    member.name = str(Path("clips") / Path(member.name).name)
+                    tar.extract(member, path=extract_path, set_attrs=False)
+                    if on_clip is not None:
+                        on_clip(Path(member.name).name)
+    logging.info(f"Streaming extraction completed for {url}")
+
+
+class _ThrottledReader:
+    def __init__(self, raw, limiter: BandwidthLimiter):
+        self.raw = raw
+        self.limiter = limiter
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.limiter.consume(len(data))
+        return data
+
+
+class StreamedClips:
+    """
+    Clip tasks for clips that have been extracted from an archive still being downloaded.
+
+    Common Voice archives store validated.tsv after the clips. With `defer_metadata`, every
+    clip is handed out as soon as it is extracted, without its gender and age, and
+    `attach_metadata` fills them in on the results once validated.tsv has been read,
+    dropping the results of clips it does not list. Otherwise clips arriving before
+    validated.tsv are held back until it has been read, which is needed when clips are
+    selected by their metadata. Iterating blocks until the next clip is available and
+    ends once `close` is called.
+    """
+
+    def __init__(self, metadata_filter: MetadataFilter | None = None, defer_metadata: bool = False):
+        self.metadata_filter = metadata_filter or MetadataFilter()
+        self.defer_metadata = defer_metadata
+        self._queue: queue.Queue[ClipTask | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._held: list[str] = []
+        self._metadata: dict[str, tuple[str, str]] | None = None
+        self.error: BaseException | None = None
+        self.dropped = 0
+
+    def set_metadata(self, validated_tsv_path: Path) -> None:
+        metadata = {path: (gender, age) for path, gender, age in iter_metadata(validated_tsv_path, self.metadata_filter)}
+        with self._lock:
+            self._metadata = metadata
+            held, self._held = self._held, []
+        logging.info(f"Read metadata for {len(metadata)} clips, {len(held)} clips were held back until now")
+        for name in held:
+            self._put(name)
+
+    def add_clip(self, name: str) -> None:
+        with self._lock:
+            if self._metadata is None:
+                if self.defer_metadata:
+                    if self._in_shard(name):
+                        self._queue.put((name, PENDING_METADATA, PENDING_METADATA))
+                else:
+                    self._held.append(name)
+                return
+        self._put(name)
+
+    def close(self, error: BaseException | None = None) -> None:
+        self.error = error
+        if self._metadata is None and error is None:
+            logging.warning("Archive did not contain validated.tsv, no clips will be processed")
+        self._queue.put(_END)
+
+    def attach_metadata(self, results: Iterable[dict | None]) -> Iterator[dict | None]:
+        """
+        Give results the gender and age of their clip, dropping clips that validated.tsv does not list.
+
+        Results that arrive before validated.tsv has been read are spooled to a temporary
+        file rather than kept in memory, and released once it has been read. The results
+        end only after the archive has been read, so nothing is left spooled at the end
+        unless the archive had no validated.tsv.
+        """
+        self.dropped = 0
+        with tempfile.TemporaryFile() as spool:
+            spooled = 0
+            for result in results:
+                if result is not None and self._metadata is None:
+                    pickle.dump(result, spool)
+                    spooled += 1
+                    continue
+                if spooled and self._metadata is not None:
+                    spool.seek(0)
+                    yield from self._resolved(pickle.load(spool) for _ in range(spooled))
+                    spool.seek(0)
+                    spool.truncate()
+                    spooled = 0
+                if result is None:
+                    yield None
+                else:
+                    yield from self._resolved([result])
+            if spooled and self._metadata is not None:
+                spool.seek(0)
+                yield from self._resolved(pickle.load(spool) for _ in range(spooled))
+        if self.dropped:
+            logging.info(f"Dropped the results of {self.dropped} clips that are not among the selected clips of validated.tsv")
+
+    def _resolved(self, results: Iterable[dict]) -> Iterator[dict]:
+        assert self._metadata is not None
+        for result in results:
+            metadata = self._metadata.get(result["path"])
+            if metadata is None:
+                self.dropped += 1
+                continue
+            result["gender"], result["age"] = metadata
+            yield result
+
+    def _in_shard(self, name: str) -> bool:
+        if self.metadata_filter.shard_count == 1:
+            return True
+        return shard_of(pd.Series([name]), self.metadata_filter.shard_count)[0] == self.metadata_filter.shard_index
+
+    def _put(self, name: str) -> None:
+        assert self._metadata is not None
+        if name in self._metadata:
+            gender, age = self._metadata[name]
+            self._queue.put((name, gender, age))
+
+    def __iter__(self) -> Iterator[ClipTask]:
+        while (clip := self._queue.get()) is not _END:
+            yield clip
+
+
+def stream_clips(
+    url: str,
+    extract_path: Path,
+    session: requests.Session,
+    metadata_filter: MetadataFilter | None = None,
+    limiter: BandwidthLimiter | None = None,
+    defer_metadata: bool = False,
+) -> tuple[StreamedClips, threading.Thread]:
+    """Start downloading and extracting `url` in a background thread, returning the stream of its validated clips."""
+    clips = StreamedClips(metadata_filter, defer_metadata)
+
+    def run() -> None:
+        try:
+            stream_extract_tar(url, extract_path, session, on_validated=clips.set_metadata, on_clip=clips.add_clip, limiter=limiter)
+        except BaseException as e:
+            clips.close(e)
+        else:
+            clips.close()
+
+    thread = threading.Thread(target=run, name=f"stream-{extract_path.name}", daemon=True)
+    thread.start()
+    return clips, thread
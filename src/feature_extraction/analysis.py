@@ -0,0 +1,71 @@
+import librosa
+import numpy as np
+from functools import cached_property
+
+N_FFT = 2048
+HOP_LENGTH = 512
+TRIM_TOP_DB = 60
+
+
+class AudioAnalysis:
+    """
+    Per-clip cache of spectral intermediates shared by all extractors.
+
+    Every intermediate is computed lazily on first access with librosa's default
+    parameters, so extractors reading from it produce the same numbers as calling
+    librosa on the raw waveform, while a full run computes a single STFT per clip.
+    """
+
+    def __init__(self, audio: np.ndarray, sr: int | float, rms: np.ndarray | None = None, stft: np.ndarray | None = None):
+        self.audio = audio
+        self.sr = sr
+        self._rms = rms
+        # Per-frame tracks of the extractors that ran on this clip, see BaseExtractor.frames.
+        self.tracks: dict[str, np.ndarray] = {}
+        if stft is not None:
+            self.stft = stft
+
+    @classmethod
+    def from_untrimmed(cls, audio: np.ndarray, sr: int | float, top_db: float = TRIM_TOP_DB) -> "AudioAnalysis":
+        """Trim leading and trailing silence like `librosa.effects.trim`, keeping the RMS envelope it is based on."""
+        rms = librosa.feature.rms(y=audio, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+        non_silent = librosa.amplitude_to_db(rms, ref=np.max, top_db=None) > -top_db
+        nonzero = np.flatnonzero(non_silent)
+
+        if nonzero.size > 0:
+            start = int(librosa.frames_to_samples(nonzero[0], hop_length=HOP_LENGTH))
+            end = min(audio.shape[-1], int(librosa.frames_to_samples(nonzero[-1] + 1, hop_length=HOP_LENGTH)))
+        else:
+            start, end = 0, 0
+
+        return cls(audio[start:end], sr, rms=rms)
+
+    @property
+    def rms(self) -> np.ndarray:
+        """RMS envelope of the untrimmed clip when built with `from_untrimmed`, otherwise of the trimmed clip."""
+        if self._rms is None:
+            self._rms = librosa.feature.rms(y=self.audio, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+        return self._rms
+
+    @cached_property
+    def frames(self) -> np.ndarray:
+        """Edge-padded, centered frames of the waveform, shaped (N_FFT, n_frames)."""
+        padded = np.pad(self.audio, (N_FFT // 2, N_FFT // 2), mode="edge")
+        return librosa.util.frame(padded, frame_length=N_FFT, hop_length=HOP_LENGTH)
+
+    @cached_property
+    def stft(self) -> np.ndarray:
+        return librosa.stft(self.audio, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        return np.abs(self.stft)
+
+    @cached_property
+    def power(self) -> np.ndarray:
+        return self.magnitude**2
+
+    @cached_property
+    def mel(self) -> np.ndarray:
+        """Mel power spectrogram."""
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr)
@@ -1,9 +1,34 @@
+import hashlib
+import json
 import librosa
 import numpy as np
 from abc import ABC, abstractmethod
+from feature_extraction.analysis import AudioAnalysis, N_FFT, HOP_LENGTH, TRIM_TOP_DB
+from feature_extraction.batch import BatchAnalysis
 
 class BaseExtractor(ABC):
-    @abstractmethod
+    # Bump whenever a change to the extractor changes its output, so cached results are recomputed.
+    version = 1
+
+    def params(self) -> dict:
+        """Public, non-callable attributes of the extractor, i.e. everything that configures its output."""
+        return {
+            name: getattr(self, name)
+            for name in dir(self)
+            if not name.startswith("_") and name != "version" and not callable(getattr(self, name))
+        }
+
+    def cache_key(self) -> str:
+        """Identifier of the extractor's output; it changes with the extractor's version, its parameters and the shared analysis settings."""
+        description = {
+            "class": type(self).__name__,
+            "version": self.version,
+            "params": self.params(),
+            "analysis": {"n_fft": N_FFT, "hop_length": HOP_LENGTH, "top_db": TRIM_TOP_DB},
+        }
+        digest = hashlib.sha1(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return f"v{self.version}-{digest}"
+
     def extract(self, audio: np.ndarray, sr: int | float) -> dict[str, float]:
         """
         Extract features from the provided audio data.
@@ -15,4 +40,61 @@ class BaseExtractor(ABC):
         Returns:
             dict: A dictionary of extracted features.
         """
-        pass
\ No newline at end of file
+        return self.extract_from_analysis(AudioAnalysis(audio, sr))
+
+    def frames(self, analysis: AudioAnalysis) -> np.ndarray:
+        """
+        Per-frame values of the clip that the features summarize, computed once per analysis.
+        
+        Extractors read their track through this method, so storing the frames of a clip
+        (see pipeline.frame_store) does not compute them a second time. Extractors of the
+        same class and parameters share the track.
+        """
+        # Keyed by what configures the output rather than by the instance, which may not outlive the analysis.
+        key = self.cache_key()
+        track = analysis.tracks.get(key)
+        if track is None:
+            track = analysis.tracks[key] = self.frames_from_analysis(analysis)
+        return track
+
+    @abstractmethod
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        """
+        Compute the per-frame track of the extractor.
+        
+        Parameters:
+            analysis (AudioAnalysis): The shared spectral analysis of the clip.
+        
+        Returns:
+            numpy.ndarray: Values shaped (n_values, n_frames), or (n_frames,) for a single value per frame.
+        """
+        pass
+
+    @abstractmethod
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict[str, float]:
+        """
+        Extract features reusing the intermediates cached on a per-clip analysis.
+        
+        Parameters:
+            analysis (AudioAnalysis): The shared spectral analysis of the clip.
+        
+        Returns:
+            dict: A dictionary of extracted features.
+        """
+        pass
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict[str, float]]:
+        """
+        Extract features for every clip of a batch.
+        
+        The default runs the per-clip extraction on each clip, reusing the batch STFT.
+        Extractors whose features are computed frame by frame override this with a
+        single vectorized call over the whole batch.
+        
+        Parameters:
+            batch (BatchAnalysis): The padded, stacked analysis of clips with the same sampling rate.
+        
+        Returns:
+            list: One dictionary of extracted features per clip, in batch order.
+        """
+        return [self.extract_from_analysis(batch.clip(i)) for i in range(len(batch))]
@@ -0,0 +1,126 @@
+import librosa
+import numpy as np
+from functools import cached_property
+from feature_extraction.analysis import AudioAnalysis, N_FFT, HOP_LENGTH
+
+MAX_PADDING = 0.25
+ZERO_CROSSING_THRESHOLD = 1e-10
+
+
+class BatchAnalysis:
+    """
+    Spectral intermediates for several clips of the same sample rate, stacked into padded 2-D arrays.
+
+    Clips are zero-padded to the longest one, which is exactly what a centered STFT sees past
+    the end of each clip, so frame `t` of clip `i` equals the per-clip STFT frame `t` for every
+    valid frame. `frame_mask` marks the valid frames of each clip, and every aggregate computed
+    from the batch must only use those.
+    """
+
+    def __init__(self, clips: list[np.ndarray], sr: int | float):
+        self.sr = sr
+        self.lengths = np.array([len(clip) for clip in clips])
+        self.audio = np.zeros((len(clips), self.lengths.max()), dtype=np.float32)
+        for i, clip in enumerate(clips):
+            self.audio[i, : len(clip)] = clip
+
+        self.n_frames = 1 + self.lengths // HOP_LENGTH
+        self.frame_mask = np.arange(1 + self.audio.shape[1] // HOP_LENGTH) < self.n_frames[:, None]
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @cached_property
+    def edge_padded(self) -> np.ndarray:
+        """Every clip extended with its own last sample and edge-padded by N_FFT // 2 on both sides, like per-clip framing."""
+        sample_mask = np.arange(self.audio.shape[1]) < self.lengths[:, None]
+        last_samples = self.audio[np.arange(len(self)), self.lengths - 1]
+        filled = np.where(sample_mask, self.audio, last_samples[:, None])
+        return np.pad(filled, ((0, 0), (N_FFT // 2, N_FFT // 2)), mode="edge")
+
+    @cached_property
+    def zero_crossing_rate(self) -> np.ndarray:
+        """
+        Per-frame zero-crossing rate, equal to `librosa.feature.zero_crossing_rate` on each clip.
+
+        Sign changes are found once per sample and summed per frame through a cumulative sum,
+        instead of re-examining every sample in each of the overlapping frames.
+        """
+        negative = self.edge_padded < -ZERO_CROSSING_THRESHOLD
+        crossings = np.zeros(negative.shape, dtype=np.int32)
+        crossings[:, 1:] = negative[:, 1:] != negative[:, :-1]
+        cumulative = np.cumsum(crossings, axis=-1)
+
+        starts = np.arange(self.frame_mask.shape[1]) * HOP_LENGTH
+        counts = cumulative[:, starts + N_FFT - 1] - cumulative[:, starts]
+        return counts / N_FFT
+
+    @cached_property
+    def stft(self) -> np.ndarray:
+        return librosa.stft(self.audio, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        return np.abs(self.stft)
+
+    @cached_property
+    def power(self) -> np.ndarray:
+        return self.magnitude**2
+
+    @cached_property
+    def mel(self) -> np.ndarray:
+        """Mel power spectrogram."""
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr)
+
+    @cached_property
+    def spectral_moments(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Per-frame centroid and second moment (in Hz and Hz^2) of the magnitude spectrum normalized to unit sum.
+
+        Computed as two matrix products over the frequency axis; frames without energy get 0,
+        as they do in librosa.
+        """
+        freqs = librosa.fft_frequencies(sr=self.sr, n_fft=N_FFT)
+        total = self.magnitude.sum(axis=-2, dtype=np.float64)
+        first = np.einsum("f,bft->bt", freqs, self.magnitude)
+        second = np.einsum("f,bft->bt", freqs**2, self.magnitude)
+
+        has_energy = total > np.finfo(self.magnitude.dtype).tiny
+        centroid = np.divide(first, total, out=np.zeros_like(total), where=has_energy)
+        second_moment = np.divide(second, total, out=np.zeros_like(total), where=has_energy)
+        return centroid, second_moment
+
+    def clip(self, i: int) -> AudioAnalysis:
+        """Per-clip analysis of clip `i`, sharing the batch STFT."""
+        return AudioAnalysis(self.audio[i, : self.lengths[i]], self.sr, stft=self.stft[i, :, : self.n_frames[i]])
+
+    def masked_mean_var(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Mean and variance over the valid frames of per-frame values shaped (n_clips, ..., n_frames)."""
+        mask = self.frame_mask.reshape(len(self), *([1] * (values.ndim - 2)), -1)
+        return np.mean(values, axis=-1, where=mask), np.var(values, axis=-1, where=mask)
+
+
+def bucket_by_length(lengths: list[int], sample_rates: list[int | float], max_clips: int, max_padding: float = MAX_PADDING) -> list[list[int]]:
+    """
+    Group clip indices into buckets of one sample rate and similar length.
+
+    A bucket is closed once the next clip would be more than `max_padding` longer than its
+    shortest clip or it holds `max_clips` clips, which bounds the padding wasted per batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: (sample_rates[i], lengths[i]))
+    buckets: list[list[int]] = []
+    current: list[int] = []
+
+    for i in order:
+        if current and (
+            sample_rates[i] != sample_rates[current[0]]
+            or lengths[i] > lengths[current[0]] * (1 + max_padding)
+            or len(current) >= max_clips
+        ):
+            buckets.append(current)
+            current = []
+        current.append(i)
+
+    if current:
+        buckets.append(current)
+    return buckets
@@ -1,11 +1,15 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
 
 class ChromaExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.chroma_stft(S=analysis.power, sr=analysis.sr)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
+            chroma = self.frames(analysis)
             chroma_mean = np.mean(chroma, axis=1)
             chroma_var = np.var(chroma, axis=1)
 
@@ -1,13 +1,29 @@
 import numpy as np
-import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.hnr_backends import HNR_BACKENDS, HNR_MIN_PITCH, HNR_MAX_PITCH
 
 class HarmonicNoiseRatioExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def __init__(self, backend: str = "autocorrelation", min_pitch: float = HNR_MIN_PITCH, max_pitch: float = HNR_MAX_PITCH):
+        if backend not in HNR_BACKENDS:
+            raise ValueError(f"Unknown HNR backend: {backend}. Available backends: {', '.join(HNR_BACKENDS)}")
+        if backend == "praat" and max_pitch != HNR_MAX_PITCH:
+            raise ValueError("The praat HNR backend does not take a maximum pitch")
+        self.backend = backend
+        self.min_pitch = min_pitch
+        self.max_pitch = max_pitch
+
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        if self.backend == "praat":
+            return HNR_BACKENDS[self.backend](analysis, min_pitch=self.min_pitch)
+        return HNR_BACKENDS[self.backend](analysis, min_pitch=self.min_pitch, max_pitch=self.max_pitch)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            harmonic_signal = librosa.effects.harmonic(y=audio)
-            hnr_mean = np.mean(harmonic_signal)
-            hnr_var = np.var(harmonic_signal)
+            hnr = self.frames(analysis)
+            voiced_hnr = hnr[np.isfinite(hnr)]
+            hnr_mean = np.mean(voiced_hnr)
+            hnr_var = np.var(voiced_hnr)
 
             hnr_features = {
                 "hnr_mean": hnr_mean,
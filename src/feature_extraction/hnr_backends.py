@@ -0,0 +1,77 @@
+import librosa
+import numpy as np
+from collections.abc import Callable
+from feature_extraction.analysis import AudioAnalysis
+
+HNR_MIN_PITCH = 75.0
+HNR_MAX_PITCH = 600.0
+HNR_TIME_STEP = 0.01
+PERIODS_PER_WINDOW = 4.5
+SILENCE_THRESHOLD = 0.1
+PRAAT_UNVOICED = -200.0
+
+
+def autocorrelation_hnr(analysis: AudioAnalysis, min_pitch: float = HNR_MIN_PITCH, max_pitch: float = HNR_MAX_PITCH) -> np.ndarray:
+    """
+    Per-frame HNR in dB from the normalized autocorrelation peak, following Boersma (1993).
+
+    All frames are processed at once: each windowed frame's autocorrelation is computed
+    through one batched FFT and divided by the window's own autocorrelation, and the
+    strongest peak r in the pitch lag range gives HNR = 10 * log10(r / (1 - r)).
+    Frames whose peak amplitude is below `SILENCE_THRESHOLD` of the clip's peak are NaN.
+    """
+    import scipy.fft
+
+    audio = analysis.audio
+    sr = analysis.sr
+    frame_length = int(round(PERIODS_PER_WINDOW * sr / min_pitch))
+    hop_length = max(1, int(round(HNR_TIME_STEP * sr)))
+    min_lag = max(1, int(np.floor(sr / max_pitch)))
+    max_lag = int(np.ceil(sr / min_pitch))
+
+    if len(audio) < frame_length:
+        return np.full(0, np.nan)
+
+    frames = librosa.util.frame(audio, frame_length=frame_length, hop_length=hop_length, axis=0)
+    frames = (frames - frames.mean(axis=1, keepdims=True)).astype(np.float32, copy=False)
+
+    window = np.hanning(frame_length).astype(np.float32)
+    # Zero-padding by max_lag is enough to keep the lags we look at free of circular wrap-around.
+    n_fft = scipy.fft.next_fast_len(frame_length + max_lag, real=True)
+    spectrum = scipy.fft.rfft(frames * window, n=n_fft, axis=1)
+    autocorrelation = scipy.fft.irfft(np.abs(spectrum) ** 2, n=n_fft, axis=1)[:, : max_lag + 1]
+    window_autocorrelation = scipy.fft.irfft(np.abs(scipy.fft.rfft(window, n=n_fft)) ** 2, n=n_fft)[: max_lag + 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = (autocorrelation / autocorrelation[:, :1]) / (window_autocorrelation / window_autocorrelation[0])
+        peak = np.clip(np.max(normalized[:, min_lag:], axis=1), 1e-6, 1 - 1e-6)
+        hnr = 10 * np.log10(peak / (1 - peak))
+
+    frame_peaks = np.max(np.abs(frames), axis=1)
+    hnr[frame_peaks < SILENCE_THRESHOLD * np.max(np.abs(audio))] = np.nan
+    return hnr
+
+
+def praat_hnr(analysis: AudioAnalysis, min_pitch: float = HNR_MIN_PITCH) -> np.ndarray:
+    """
+    Per-frame HNR in dB from Praat's autocorrelation harmonicity, with unvoiced frames set to NaN.
+
+    Praat searches every period up to 1 / `min_pitch` and has no maximum pitch.
+    """
+    import parselmouth
+
+    sound = parselmouth.Sound(analysis.audio.astype(np.float64), sampling_frequency=analysis.sr)
+    harmonicity = sound.to_harmonicity_ac(
+        time_step=HNR_TIME_STEP,
+        minimum_pitch=min_pitch,
+        silence_threshold=SILENCE_THRESHOLD,
+        periods_per_window=PERIODS_PER_WINDOW,
+    )
+    hnr = harmonicity.values[0]
+    return np.where(hnr == PRAAT_UNVOICED, np.nan, hnr)
+
+
+HNR_BACKENDS: dict[str, Callable[..., np.ndarray]] = {
+    "autocorrelation": autocorrelation_hnr,
+    "praat": praat_hnr,
+}
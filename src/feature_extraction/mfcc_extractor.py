@@ -1,11 +1,18 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.batch import BatchAnalysis
 
 class MFCCExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    top_db = 80.0
+
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.mfcc(S=librosa.power_to_db(analysis.mel, top_db=self.top_db), sr=analysis.sr, n_mfcc=13)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+            mfccs = self.frames(analysis)
             mfcc_mean = np.mean(mfccs, axis=1)
             mfcc_var = np.var(mfccs, axis=1)
 
@@ -16,3 +23,20 @@ class MFCCExtractor(BaseExtractor):
             return mfcc_features
         except Exception as e:
             return {"error": str(e)}
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict]:
+        try:
+            # power_to_db clips to top_db below the maximum of its whole input, so clip per clip instead.
+            log_mel = librosa.power_to_db(batch.mel, top_db=None)
+            clip_max = np.max(log_mel, axis=(-2, -1), initial=-np.inf, where=batch.frame_mask[:, None, :])
+            log_mel = np.maximum(log_mel, clip_max[:, None, None] - self.top_db)
+
+            mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
+            mfcc_mean, mfcc_var = batch.masked_mean_var(mfccs)
+
+            return [
+                {"mfcc_mean": mfcc_mean[i], "mfcc_var": mfcc_var[i]}
+                for i in range(len(batch))
+            ]
+        except Exception as e:
+            return [{"error": str(e)} for _ in range(len(batch))]
@@ -0,0 +1,35 @@
+import librosa
+import numpy as np
+from collections.abc import Callable
+from feature_extraction.analysis import AudioAnalysis, N_FFT, HOP_LENGTH
+
+F0_MIN = 65.0
+F0_MAX = 500.0
+
+
+def piptrack_f0(analysis: AudioAnalysis, fmin: float = F0_MIN, fmax: float = F0_MAX) -> np.ndarray:
+    """Per-frame f0 from the strongest `piptrack` peak of each frame, reusing the shared magnitude spectrogram."""
+    pitches, magnitudes = librosa.core.piptrack(S=analysis.magnitude, sr=analysis.sr, fmin=fmin, fmax=fmax)
+    strongest = np.argmax(magnitudes, axis=0)
+    return pitches[strongest, np.arange(pitches.shape[1])]
+
+
+def yin_f0(analysis: AudioAnalysis, fmin: float = F0_MIN, fmax: float = F0_MAX) -> np.ndarray:
+    """Per-frame f0 from `librosa.yin`. YIN has no voicing decision, so every frame gets an estimate."""
+    return librosa.yin(analysis.audio, fmin=fmin, fmax=fmax, sr=analysis.sr, frame_length=N_FFT, hop_length=HOP_LENGTH)
+
+
+def praat_f0(analysis: AudioAnalysis, fmin: float = F0_MIN, fmax: float = F0_MAX) -> np.ndarray:
+    """Per-frame f0 from Praat's autocorrelation pitch tracker, with unvoiced frames set to 0."""
+    import parselmouth
+
+    sound = parselmouth.Sound(analysis.audio.astype(np.float64), sampling_frequency=analysis.sr)
+    pitch = sound.to_pitch(time_step=HOP_LENGTH / analysis.sr, pitch_floor=fmin, pitch_ceiling=fmax)
+    return pitch.selected_array["frequency"]
+
+
+PITCH_BACKENDS: dict[str, Callable[..., np.ndarray]] = {
+    "piptrack": piptrack_f0,
+    "yin": yin_f0,
+    "praat": praat_f0,
+}
@@ -1,13 +1,25 @@
 import numpy as np
-import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.pitch_backends import PITCH_BACKENDS, F0_MIN, F0_MAX
 
 class PitchExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def __init__(self, backend: str = "piptrack", fmin: float = F0_MIN, fmax: float = F0_MAX):
+        if backend not in PITCH_BACKENDS:
+            raise ValueError(f"Unknown pitch backend: {backend}. Available backends: {', '.join(PITCH_BACKENDS)}")
+        self.backend = backend
+        self.fmin = fmin
+        self.fmax = fmax
+
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return PITCH_BACKENDS[self.backend](analysis, fmin=self.fmin, fmax=self.fmax)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            pitches, magnitudes = librosa.core.piptrack(y=audio, sr=sr)
-            pitch_mean = np.mean([np.max(pitch) for pitch in pitches if np.max(pitch) > 0])
-            pitch_var = np.var([np.max(pitch) for pitch in pitches if np.max(pitch) > 0])
+            f0 = self.frames(analysis)
+            voiced_f0 = f0[f0 > 0]
+            pitch_mean = np.mean(voiced_f0)
+            pitch_var = np.var(voiced_f0)
 
             pitch_features = {
                 "pitch_mean": pitch_mean,
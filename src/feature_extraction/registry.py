@@ -0,0 +1,84 @@
+import importlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from feature_extraction.base_extractor import BaseExtractor
+
+
+@dataclass(frozen=True)
+class ExtractorSpec:
+    """Where an extractor is defined and what it produces; describing an extractor does not import it."""
+
+    module: str
+    class_name: str
+    description: str
+    backends: tuple[str, ...] = ()
+
+    def load(self) -> type["BaseExtractor"]:
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+EXTRACTORS: dict[str, ExtractorSpec] = {
+    "pitch": ExtractorSpec(
+        "feature_extraction.pitch_extractor", "PitchExtractor",
+        "Mean and variance of the fundamental frequency over voiced frames",
+        backends=("piptrack", "yin", "praat"),
+    ),
+    "mfcc": ExtractorSpec(
+        "feature_extraction.mfcc_extractor", "MFCCExtractor",
+        "Mean and variance of 13 mel-frequency cepstral coefficients",
+    ),
+    "hnr": ExtractorSpec(
+        "feature_extraction.harmonic_noise_ratio_extractor", "HarmonicNoiseRatioExtractor",
+        "Mean and variance of the harmonics-to-noise ratio in dB over voiced frames",
+        backends=("autocorrelation", "praat"),
+    ),
+    "spectral_centroid": ExtractorSpec(
+        "feature_extraction.spectral_centroid_extractor", "SpectralCentroidExtractor",
+        "Mean and variance of the spectral centroid",
+    ),
+    "spectral_bandwidth": ExtractorSpec(
+        "feature_extraction.spectral_bandwidth_extractor", "SpectralBandwidthExtractor",
+        "Mean and variance of the spectral bandwidth",
+    ),
+    "spectral_flatness": ExtractorSpec(
+        "feature_extraction.spectral_flatness_extractor", "SpectralFlatnessExtractor",
+        "Mean and variance of the spectral flatness",
+    ),
+    "spectral_contrast": ExtractorSpec(
+        "feature_extraction.spectral_contrast_extractor", "SpectralContrastExtractor",
+        "Mean and variance of the spectral contrast of each sub-band",
+    ),
+    "chroma": ExtractorSpec(
+        "feature_extraction.chroma_extractor", "ChromaExtractor",
+        "Mean and variance of the 12 chroma bins",
+    ),
+    "zero_crossing": ExtractorSpec(
+        "feature_extraction.zero_crossing_extractor", "ZeroCrossingExtractor",
+        "Mean and variance of the zero-crossing rate",
+    ),
+}
+
+
+def get_available_extractors() -> dict[str, ExtractorSpec]:
+    return dict(EXTRACTORS)
+
+
+def get_extractors(features: list[str] | None = None, options: dict[str, dict] | None = None) -> dict[str, "BaseExtractor"]:
+    """
+    Import and instantiate the selected extractors, or all of them when no selection is given.
+
+    Only the modules of the selected extractors are imported. `options` maps a feature name to
+    keyword arguments for its extractor, e.g. {"pitch": {"backend": "yin"}}.
+    """
+    unknown = set(features or ()) - EXTRACTORS.keys()
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}. Available features: {', '.join(EXTRACTORS)}")
+
+    options = options or {}
+    return {
+        name: spec.load()(**options.get(name, {}))
+        for name, spec in EXTRACTORS.items()
+        if features is None or name in features
+    }
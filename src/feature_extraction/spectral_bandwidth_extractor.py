@@ -1,11 +1,16 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.batch import BatchAnalysis
 
 class SpectralBandwidthExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.spectral_bandwidth(S=analysis.magnitude, sr=analysis.sr)[0]
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr)[0]
+            spectral_bandwidth = self.frames(analysis)
             sb_mean = np.mean(spectral_bandwidth)
             sb_var = np.var(spectral_bandwidth)
 
@@ -16,3 +21,16 @@ class SpectralBandwidthExtractor(BaseExtractor):
             return spectral_bandwidth_features
         except Exception as e:
             return {"error": str(e)}
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict]:
+        try:
+            centroid, second_moment = batch.spectral_moments
+            spectral_bandwidth = np.sqrt(np.maximum(second_moment - centroid**2, 0))
+            sb_mean, sb_var = batch.masked_mean_var(spectral_bandwidth)
+
+            return [
+                {"spectral_bandwidth_mean": sb_mean[i], "spectral_bandwidth_var": sb_var[i]}
+                for i in range(len(batch))
+            ]
+        except Exception as e:
+            return [{"error": str(e)} for _ in range(len(batch))]
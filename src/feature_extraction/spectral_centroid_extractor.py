@@ -1,11 +1,16 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.batch import BatchAnalysis
 
 class SpectralCentroidExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.spectral_centroid(S=analysis.magnitude, sr=analysis.sr)[0]
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            spectral_centroid = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
+            spectral_centroid = self.frames(analysis)
             sc_mean = np.mean(spectral_centroid)
             sc_var = np.var(spectral_centroid)
 
@@ -16,3 +21,15 @@ class SpectralCentroidExtractor(BaseExtractor):
             return spectral_centroid_features
         except Exception as e:
             return {"error": str(e)}
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict]:
+        try:
+            spectral_centroid, _ = batch.spectral_moments
+            sc_mean, sc_var = batch.masked_mean_var(spectral_centroid)
+
+            return [
+                {"spectral_centroid_mean": sc_mean[i], "spectral_centroid_var": sc_var[i]}
+                for i in range(len(batch))
+            ]
+        except Exception as e:
+            return [{"error": str(e)} for _ in range(len(batch))]
@@ -1,11 +1,15 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
 
 class SpectralContrastExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.spectral_contrast(S=analysis.magnitude, sr=analysis.sr)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            spectral_contrast = librosa.feature.spectral_contrast(y=audio, sr=sr)
+            spectral_contrast = self.frames(analysis)
             sc_mean = np.mean(spectral_contrast, axis=1)
             sc_var = np.var(spectral_contrast, axis=1)
 
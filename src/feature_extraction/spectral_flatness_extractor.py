@@ -1,11 +1,16 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.batch import BatchAnalysis
 
 class SpectralFlatnessExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return librosa.feature.spectral_flatness(S=analysis.magnitude)[0]
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            spectral_flatness = librosa.feature.spectral_flatness(y=audio)[0]
+            spectral_flatness = self.frames(analysis)
             sf_mean = np.mean(spectral_flatness)
             sf_var = np.var(spectral_flatness)
 
@@ -16,3 +21,15 @@ class SpectralFlatnessExtractor(BaseExtractor):
             return spectral_flatness_features
         except Exception as e:
             return {"error": str(e)}
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict]:
+        try:
+            spectral_flatness = librosa.feature.spectral_flatness(S=batch.power, power=1.0)[:, 0]
+            sf_mean, sf_var = batch.masked_mean_var(spectral_flatness)
+
+            return [
+                {"spectral_flatness_mean": sf_mean[i], "spectral_flatness_var": sf_var[i]}
+                for i in range(len(batch))
+            ]
+        except Exception as e:
+            return [{"error": str(e)} for _ in range(len(batch))]
@@ -1,11 +1,16 @@
 import numpy as np
 import librosa
+from feature_extraction.analysis import AudioAnalysis
 from feature_extraction.base_extractor import BaseExtractor
+from feature_extraction.batch import BatchAnalysis
 
 class ZeroCrossingExtractor(BaseExtractor):
-    def extract(self, audio: np.ndarray, sr: int | float) -> dict:
+    def frames_from_analysis(self, analysis: AudioAnalysis) -> np.ndarray:
+        return np.mean(librosa.zero_crossings(analysis.frames, pad=False, axis=-2), axis=-2)
+
+    def extract_from_analysis(self, analysis: AudioAnalysis) -> dict:
         try:
-            zero_crossings = librosa.feature.zero_crossing_rate(audio)[0]
+            zero_crossings = self.frames(analysis)
             zcr_mean = np.mean(zero_crossings)
             zcr_var = np.var(zero_crossings)
 
@@ -17,4 +22,16 @@ class ZeroCrossingExtractor(BaseExtractor):
             }
             return zero_crossing_features
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    def extract_batch(self, batch: BatchAnalysis) -> list[dict]:
+        try:
+            zero_crossings = batch.zero_crossing_rate
+            zcr_mean, zcr_var = batch.masked_mean_var(zero_crossings)
+
+            return [
+                {"zcr_mean": zcr_mean[i], "zcr_var": zcr_var[i]}
+                for i in range(len(batch))
+            ]
+        except Exception as e:
+            return [{"error": str(e)} for _ in range(len(batch))]
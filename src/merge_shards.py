@@ -0,0 +1,53 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+from pipeline.options import OUTPUT_FORMATS, MetadataFilter, add_metadata_arguments
+from utils.logging_setup import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the shards written by extract_features.py --shard-count into one feature table per language.")
+    parser.add_argument("--languages", nargs="+", required=True, help="List of languages to merge")
+    parser.add_argument("--destination", type=str, default="data/features", help="Directory holding the shard tables, where the merged tables are written")
+    parser.add_argument("--shard-count", type=int, required=True, help="Number of shards the extraction was split into")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="csv", help="Format the shards were written in")
+    parser.add_argument("--source", type=str, default=None, help="Path to preprocessed data; when given, the merged clips are checked against each language's validated.tsv")
+    parser.add_argument("--allow-incomplete", action="store_true", help="Merge even when shards are missing or did not finish")
+    parser.add_argument("--strict", action="store_true", help="With --source, fail when clips are missing from the shards instead of warning")
+    add_metadata_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging()
+
+    # Imported here so that --help does not load pandas and pyarrow.
+    from pipeline.metadata import iter_metadata
+    from pipeline.shards import merge_shards
+
+    metadata_filter = MetadataFilter.from_args(args)
+    destination_dir = Path(args.destination)
+    failed = False
+
+    for language in args.languages:
+        expected = None
+        if args.source is not None:
+            expected = (clip[0] for clip in iter_metadata(Path(args.source) / language / "validated.tsv", metadata_filter))
+        try:
+            merge_shards(
+                destination_dir,
+                language,
+                args.output_format,
+                args.shard_count,
+                expected=expected,
+                allow_incomplete=args.allow_incomplete,
+                strict=args.strict,
+            )
+        except (ValueError, FileNotFoundError) as e:
+            logging.error(f"Could not merge {language}: {e}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
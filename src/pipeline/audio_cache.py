@@ -0,0 +1,96 @@
+import threading
+import uuid
+import librosa
+import numpy as np
+from pathlib import Path
+from feature_extraction.analysis import AudioAnalysis, TRIM_TOP_DB
+from pipeline.cache_index import CacheIndex
+
+DEFAULT_SHARD_BYTES = 2**30
+PCM_DTYPE = np.float32
+INDEX_NAME = "index.sqlite"
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    key TEXT PRIMARY KEY, shard TEXT, offset INTEGER, length INTEGER, sr NUMERIC, size INTEGER, mtime_ns INTEGER, params TEXT
+)
+"""
+ENTRY_COLUMNS = ("shard", "offset", "length", "sr", "size", "mtime_ns", "params")
+
+
+class AudioCache:
+    """
+    Cache of decoded, trimmed clips packed into memory-mapped float32 shard files.
+
+    Each cache instance appends to its own shards, so thread and process workers can fill
+    the same cache directory without coordinating. A SQLite index shared by all of them
+    maps a clip key to (shard, offset, length, sr) and remembers the source file's size,
+    mtime and the decode parameters; an entry is only used while all of them still match.
+    Entries are looked up one clip at a time, so no worker holds the whole index. Cached
+    samples are returned as read-only views into the shard mapping, without copying.
+    """
+
+    def __init__(self, cache_dir: Path, shard_bytes: int = DEFAULT_SHARD_BYTES, top_db: float = TRIM_TOP_DB):
+        self.cache_dir = cache_dir
+        self.shard_bytes = shard_bytes
+        self.top_db = top_db
+        self.params = f"sr=native,mono=true,top_db={top_db}"
+        self.index = CacheIndex(cache_dir / INDEX_NAME, INDEX_SCHEMA)
+
+        self._writer_id = uuid.uuid4().hex[:12]
+        self._shard_number = 0
+        self._shard_size = 0
+        self._maps: dict[str, np.memmap] = {}
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def load(self, file_path: Path, key: str) -> AudioAnalysis:
+        """Return the clip's analysis, decoding and caching the trimmed samples on a miss."""
+        stat = file_path.stat()
+        entry = self._entry(key)
+
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns and entry["params"] == self.params:
+            return AudioAnalysis(self._read(entry), entry["sr"])
+
+        audio, sr = librosa.load(file_path, sr=None)
+        analysis = AudioAnalysis.from_untrimmed(audio, sr, top_db=self.top_db)
+        self._append(key, stat.st_size, stat.st_mtime_ns, analysis.audio, sr)
+        return analysis
+
+    def _entry(self, key: str) -> dict | None:
+        rows = self.index.query(f"SELECT {', '.join(ENTRY_COLUMNS)} FROM clips WHERE key = ?", (key,))
+        return dict(zip(ENTRY_COLUMNS, rows[0])) if rows else None
+
+    def _read(self, entry: dict) -> np.ndarray:
+        if entry["length"] == 0:
+            return np.zeros(0, dtype=PCM_DTYPE)
+
+        end = entry["offset"] + entry["length"]
+        with self._lock:
+            mapping = self._maps.get(entry["shard"])
+            if mapping is None or len(mapping) < end:
+                mapping = np.memmap(self.cache_dir / entry["shard"], dtype=PCM_DTYPE, mode="r")
+                self._maps[entry["shard"]] = mapping
+
+        return mapping[entry["offset"]:end]
+
+    def _append(self, key: str, size: int, mtime_ns: int, audio: np.ndarray, sr: int | float) -> None:
+        samples = np.ascontiguousarray(audio, dtype=PCM_DTYPE)
+
+        with self._lock:
+            if self._shard_size > 0 and self._shard_size + samples.nbytes > self.shard_bytes:
+                self._shard_number += 1
+                self._shard_size = 0
+
+            shard = f"shard-{self._writer_id}-{self._shard_number:05d}.pcm"
+            with open(self.cache_dir / shard, "ab") as shard_file:
+                shard_file.write(samples.tobytes())
+
+            offset = self._shard_size // samples.itemsize
+            self._shard_size += samples.nbytes
+
+        # The samples are on disk before the entry pointing at them is committed.
+        self.index.execute(
+            f"INSERT OR REPLACE INTO clips (key, {', '.join(ENTRY_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, shard, offset, len(samples), sr, size, mtime_ns, self.params),
+        )
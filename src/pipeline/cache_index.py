@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Seconds a writer waits for another process holding the database lock.
+LOCK_TIMEOUT = 60.0
+# Keys per query when looking up many entries at once, below SQLite's limit on query parameters.
+MAX_KEYS_PER_QUERY = 500
+
+
+class CacheIndex:
+    """
+    SQLite index of a cache directory, shared by every thread and process filling the cache.
+
+    Entries are looked up by key rather than loaded into memory, so memory does not grow with
+    the number of cached clips or the number of workers. Every process opens its own
+    connection on first use, and the database is in WAL mode, so lookups do not wait for
+    writers and each insert is committed on its own without syncing the disk.
+    """
+
+    def __init__(self, path: Path, schema: str):
+        self.path = path
+        self.schema = schema
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, parameters: tuple | list = ()) -> list[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def execute(self, sql: str, parameters: tuple | list = ()) -> None:
+        with self._lock:
+            self._connect().execute(sql, parameters)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited through fork belongs to the parent and must not be used.
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(self.schema)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
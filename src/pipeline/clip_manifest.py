@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+CLIP_MANIFEST_NAME = "clips.manifest.tsv"
+HASH_BLOCK_BYTES = 2**20
+HEADER_PREFIX = "# "
+
+
+class ClipRecord(NamedTuple):
+    size: int
+    digest: str
+    # Modification time of the file when it was hashed, so unchanged files are not hashed again.
+    mtime_ns: int = 0
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while block := file.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ClipManifest:
+    """
+    Size and content hash of every clip of a language, stored as a TSV file.
+
+    Unpacking an archive records every clip it contains, so a later release only writes
+    the clips that are new or whose content changed, and removes the ones it no longer
+    contains. Feature tables keep a copy of the manifest of the clips they were extracted
+    from, which tells an incremental extraction which rows are out of date. `info` is
+    stored as a JSON comment line at the top of the file.
+    """
+
+    def __init__(self, path: Path, records: dict[str, ClipRecord] | None = None, info: dict | None = None):
+        self.path = path
+        self.records: dict[str, ClipRecord] = records if records is not None else {}
+        self.info: dict = info if info is not None else {}
+
+    @classmethod
+    def load(cls, path: Path) -> "ClipManifest":
+        """Read a manifest, or start an empty one if the file does not exist."""
+        manifest = cls(path)
+        if not path.exists():
+            return manifest
+        with open(path) as lines:
+            for line in lines:
+                if line.startswith(HEADER_PREFIX):
+                    manifest.info = json.loads(line[len(HEADER_PREFIX):])
+                    continue
+                name, size, digest, mtime_ns = line.rstrip("\n").split("\t")
+                if name != "path":
+                    manifest.records[name] = ClipRecord(int(size), digest, int(mtime_ns))
+        return manifest
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A temporary file of its own, so concurrent writers of the same manifest never share one.
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp", delete=False) as manifest:
+            tmp_path = Path(manifest.name)
+            if self.info:
+                manifest.write(f"{HEADER_PREFIX}{json.dumps(self.info, sort_keys=True)}\n")
+            manifest.write("path\tsize\tdigest\tmtime_ns\n")
+            manifest.writelines(f"{name}\t{record.size}\t{record.digest}\t{record.mtime_ns}\n" for name, record in self.records.items())
+            manifest.flush()
+            os.fsync(manifest.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def digest(self, name: str) -> str | None:
+        record = self.records.get(name)
+        return record.digest if record is not None else None
+
+    def is_current(self, name: str, size: int, digest: str, clips_dir: Path) -> bool:
+        """Whether the clip on disk already has this content, so unpacking it again can be skipped."""
+        record = self.records.get(name)
+        if record is None or record.size != size or record.digest != digest:
+            return False
+        try:
+            stat = (clips_dir / name).stat()
+        except FileNotFoundError:
+            return False
+        return stat.st_size == record.size and stat.st_mtime_ns == record.mtime_ns
+
+    def write_clip(self, name: str, data: bytes, clips_dir: Path, digest: str | None = None) -> None:
+        """Write a clip through a temporary file and record it."""
+        clips_dir.mkdir(parents=True, exist_ok=True)
+        clip_path = clips_dir / name
+        tmp_path = clips_dir / f".{name}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, clip_path)
+        self.records[name] = ClipRecord(len(data), digest or content_hash(data), clip_path.stat().st_mtime_ns)
+
+    def remove_missing(self, names: set[str], clips_dir: Path) -> int:
+        """Delete the recorded clips that are not in `names`, e.g. clips left out of a new release, returning how many were removed."""
+        removed = [name for name in self.records if name not in names]
+        for name in removed:
+            (clips_dir / name).unlink(missing_ok=True)
+            del self.records[name]
+        return len(removed)
+
+    def current_record(self, name: str, clips_dir: Path) -> ClipRecord | None:
+        """
+        Record of a clip as it is on disk now, or None if the file is missing.
+
+        A clip whose size and modification time still match its record keeps its hash, so
+        only new or modified files are read.
+        """
+        clip_path = clips_dir / name
+        try:
+            stat = clip_path.stat()
+        except FileNotFoundError:
+            return None
+        record = self.records.get(name)
+        if record is None or record.size != stat.st_size or record.mtime_ns != stat.st_mtime_ns:
+            record = ClipRecord(stat.st_size, file_hash(clip_path), stat.st_mtime_ns)
+            self.records[name] = record
+        return record
+
+    def refresh(self, clips_dir: Path) -> int:
+        """Bring the manifest in line with the clips on disk, returning the number of clips hashed."""
+        hashed = 0
+        present = set()
+        with os.scandir(clips_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                present.add(entry.name)
+                record = self.records.get(entry.name)
+                hashed += self.current_record(entry.name, clips_dir) is not record
+
+        for name in [name for name in self.records if name not in present]:
+            del self.records[name]
+        if hashed:
+            logging.info(f"Hashed {hashed} new or modified clips in {clips_dir}")
+        return hashed
+
+
+def clip_manifest_path(language_dir: Path) -> Path:
+    return language_dir / CLIP_MANIFEST_NAME
+
+
+def sources_path(output_path: Path) -> Path:
+    """Copy of the clip manifest a feature table was extracted from."""
+    return output_path.with_name(f"{output_path.name}.sources")
@@ -0,0 +1,476 @@
+import logging
+import multiprocessing
+import os
+import time
+import librosa
+import numpy as np
+from dataclasses import dataclass, field
+from typing import NamedTuple
+from collections import deque
+from pathlib import Path
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from feature_extraction.analysis import AudioAnalysis, N_FFT
+from feature_extraction.batch import BatchAnalysis, bucket_by_length
+from feature_extraction.registry import get_extractors
+from pipeline.audio_cache import AudioCache
+from pipeline.metadata import ClipTask
+from pipeline.options import EXECUTORS
+from pipeline.feature_cache import CachedResults, FeatureCache
+from pipeline.frame_store import FRAMES_KEY, FRAME_DTYPE
+from pipeline.profiling import DEFAULT_SLOW_CLIP_SECONDS, NULL_PROFILER, NullProfiler, Profiler, current_rss_bytes
+from pipeline.spectrum import SpectrumProfile
+
+MAX_BUCKET_CLIPS = 16
+
+# A clip with the extractor results already found in the feature cache
+ExtractionTask = tuple[ClipTask, CachedResults | None]
+# Forking a process that runs other threads can copy locks they hold, leaving the workers deadlocked.
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+@dataclass(frozen=True)
+class ProcessorConfig:
+    """Everything a worker needs to build its ClipProcessor; small and picklable."""
+
+    clips_dir: Path
+    features: list[str] | None = None
+    extractor_options: dict[str, dict] = field(default_factory=dict)
+    audio_cache_dir: Path | None = None
+    batch_sr: int | None = None
+    feature_cache_dir: Path | None = None
+    profile: bool = False
+    slow_clip_seconds: float = DEFAULT_SLOW_CLIP_SECONDS
+    spectrum: bool = False
+    frames: bool = False
+
+    @property
+    def audio_params(self) -> str:
+        """Decoding settings that feature values depend on besides the extractor's own parameters."""
+        return f"sr={self.batch_sr or 'native'}"
+
+
+class ClipProcessor:
+    """
+    Decode clips, build their shared analysis and run every selected extractor on them.
+
+    Each analysis is also added to the spectrum profile when one is built, and with
+    `frames` every result carries the per-frame tracks of its extractors under FRAMES_KEY.
+    """
+
+    def __init__(self, config: ProcessorConfig, profiler: Profiler | None = None, spectrum: SpectrumProfile | None = None):
+        self.config = config
+        self.profiler: Profiler | NullProfiler = profiler or (Profiler(config.slow_clip_seconds) if config.profile else NULL_PROFILER)
+        self.spectrum = spectrum or (SpectrumProfile() if config.spectrum else None)
+        self.clips_dir = config.clips_dir
+        self.extractors = get_extractors(config.features, config.extractor_options)
+        self.audio_cache = AudioCache(config.audio_cache_dir) if config.audio_cache_dir is not None else None
+        self.feature_cache = (
+            FeatureCache(config.feature_cache_dir, self.extractors, config.audio_params)
+            if config.feature_cache_dir is not None
+            else None
+        )
+        # Clips are decoded even when every feature is cached if something else needs their audio.
+        self.needs_analysis = self.spectrum is not None or config.frames
+
+    def analyze(self, path: str) -> AudioAnalysis:
+        file_path = self.clips_dir / path
+        if self.audio_cache is not None:
+            # A cache hit only maps the stored samples, a miss decodes and trims; both count as decoding.
+            with self.profiler.stage("decode"):
+                return self.audio_cache.load(file_path, path)
+
+        with self.profiler.stage("decode"):
+            audio, sr = librosa.load(file_path, sr=None)
+        with self.profiler.stage("trim"):
+            return AudioAnalysis.from_untrimmed(audio, sr)
+
+    def __call__(self, clip: ClipTask, cached: CachedResults | None = None) -> dict | None:
+        start = time.perf_counter()
+        cached = cached or {}
+        try:
+            analysis = self.analyze(clip[0]) if self.extractors.keys() - cached.keys() or self.needs_analysis else None
+            self._add_to_spectrum(clip, analysis)
+            row = self._extract(clip, analysis, cached)
+            if self.config.frames and analysis is not None:
+                row[FRAMES_KEY] = self._tracks(clip[0], analysis)
+            return row
+        except Exception as e:
+            logging.error(f"Error processing {clip[0]}: {e}")
+            return None
+        finally:
+            self.profiler.clip(clip[0], time.perf_counter() - start)
+
+    def process_chunk(self, tasks: list[ExtractionTask]) -> list[dict | None]:
+        return [self(clip, cached) for clip, cached in tasks]
+
+    def _extract(self, clip: ClipTask, analysis: AudioAnalysis | None, cached: CachedResults) -> dict:
+        start = time.perf_counter()
+        elsewhere = 0.0
+        path, gender, age = clip
+        row_results = {"path": path, "gender": gender, "age": age}
+
+        for feature_name, extractor in self.extractors.items():
+            if feature_name in cached:
+                row_results.update(cached[feature_name])
+                continue
+
+            assert analysis is not None
+            extractor_start = time.perf_counter()
+            extracted_features = extractor.extract_from_analysis(analysis)
+            extractor_time = time.perf_counter() - extractor_start
+            self.profiler.record(f"extractor:{feature_name}", extractor_time)
+
+            elsewhere += extractor_time + self._store(path, feature_name, extracted_features)
+            row_results.update(extracted_features)
+
+        self.profiler.record("assemble", time.perf_counter() - start - elsewhere)
+        return row_results
+
+    def _add_to_spectrum(self, clip: ClipTask, analysis: AudioAnalysis | None) -> None:
+        if self.spectrum is not None and analysis is not None:
+            with self.profiler.stage("spectrum"):
+                self.spectrum.add(clip, analysis)
+
+    def _tracks(self, path: str, analysis: AudioAnalysis) -> dict[str, np.ndarray]:
+        """Per-frame tracks of every extractor; tracks the features were computed from are reused."""
+        tracks = {}
+        with self.profiler.stage("frames"):
+            for feature_name, extractor in self.extractors.items():
+                try:
+                    tracks[feature_name] = np.asarray(extractor.frames(analysis), dtype=FRAME_DTYPE)
+                except Exception as e:
+                    logging.error(f"Error computing the {feature_name} frames of {path}: {e}")
+        return tracks
+
+    def _store(self, path: str, feature_name: str, features: dict) -> float:
+        """Store a fresh result in the feature cache, returning the time it took."""
+        if self.feature_cache is None:
+            return 0.0
+        start = time.perf_counter()
+        self.feature_cache.store(self.clips_dir / path, path, feature_name, features)
+        elapsed = time.perf_counter() - start
+        self.profiler.record("feature_cache", elapsed)
+        return elapsed
+
+    def process_batch(self, tasks: list[ExtractionTask]) -> list[dict | None]:
+        """
+        Process several clips at once, bucketing them by length so that extractors
+        supporting it compute their features for a whole bucket in one vectorized call.
+
+        When `batch_sr` is set, clips are resampled to it first so that clips recorded at
+        different rates share buckets. Clips shorter than one STFT frame go through the
+        per-clip path. Results are returned in input order.
+        """
+        clips = [clip for clip, _ in tasks]
+        cached = [cached or {} for _, cached in tasks]
+        results: list[dict | None] = [None] * len(clips)
+        analyses: dict[int, AudioAnalysis] = {}
+
+        clip_times = [0.0] * len(clips)
+
+        for i, clip in enumerate(clips):
+            start = time.perf_counter()
+            if not self.extractors.keys() - cached[i].keys() and not self.needs_analysis:
+                results[i] = self._extract(clip, None, cached[i])
+                self.profiler.clip(clip[0], time.perf_counter() - start)
+                continue
+            try:
+                analysis = self.analyze(clip[0])
+                if self.config.batch_sr is not None and analysis.sr != self.config.batch_sr:
+                    with self.profiler.stage("resample"):
+                        audio = librosa.resample(analysis.audio, orig_sr=analysis.sr, target_sr=self.config.batch_sr)
+                    analysis = AudioAnalysis(audio, self.config.batch_sr)
+                self._add_to_spectrum(clip, analysis)
+                analyses[i] = analysis
+            except Exception as e:
+                logging.error(f"Error processing {clip[0]}: {e}")
+            clip_times[i] = time.perf_counter() - start
+
+        batchable = [i for i, analysis in analyses.items() if len(analysis.audio) >= N_FFT]
+        for i in analyses.keys() - set(batchable):
+            start = time.perf_counter()
+            results[i] = self._extract(clips[i], analyses[i], cached[i])
+            clip_times[i] += time.perf_counter() - start
+
+        buckets = bucket_by_length(
+            [len(analyses[i].audio) for i in batchable],
+            [analyses[i].sr for i in batchable],
+            max_clips=MAX_BUCKET_CLIPS,
+        )
+        for bucket in buckets:
+            indices = [batchable[j] for j in bucket]
+            rows = [{"path": clips[i][0], "gender": clips[i][1], "age": clips[i][2]} for i in indices]
+            bucket_start = time.perf_counter()
+            elsewhere = 0.0
+
+            try:
+                batch = BatchAnalysis([analyses[i].audio for i in indices], analyses[indices[0]].sr)
+                for feature_name, extractor in self.extractors.items():
+                    missing = [feature_name not in cached[i] for i in indices]
+                    if any(missing):
+                        extractor_start = time.perf_counter()
+                        batch_features = extractor.extract_batch(batch)
+                        extractor_time = time.perf_counter() - extractor_start
+                        # Each clip of the bucket is charged an equal share of the vectorized call.
+                        self.profiler.record(f"extractor:{feature_name}", extractor_time / len(indices), len(indices))
+                        elsewhere += extractor_time
+                    else:
+                        batch_features = [None] * len(indices)
+                    for i, row, is_missing, extracted_features in zip(indices, rows, missing, batch_features):
+                        if is_missing:
+                            elsewhere += self._store(clips[i][0], feature_name, extracted_features)
+                        else:
+                            extracted_features = cached[i][feature_name]
+                        row.update(extracted_features)
+            except Exception as e:
+                logging.error(f"Error processing batch of {len(indices)} clips starting with {clips[indices[0]][0]}: {e}")
+                continue
+            finally:
+                bucket_share = (time.perf_counter() - bucket_start) / len(indices)
+                for i in indices:
+                    clip_times[i] += bucket_share
+
+            self.profiler.record("assemble", bucket_share - elsewhere / len(indices), len(indices))
+            for i, row in zip(indices, rows):
+                results[i] = row
+
+        for i in analyses:
+            if self.config.frames and results[i] is not None:
+                start = time.perf_counter()
+                results[i][FRAMES_KEY] = self._tracks(clips[i][0], analyses[i])
+                clip_times[i] += time.perf_counter() - start
+            self.profiler.clip(clips[i][0], clip_times[i])
+        return results
+
+
+_worker_processor: ClipProcessor | None = None
+
+
+def _init_worker(config: ProcessorConfig, log_level: int = logging.INFO) -> None:
+    global _worker_processor
+    # Workers are not forked, so they do not inherit the logging setup of the parent, only its level.
+    logging.basicConfig(level=log_level, format="%(asctime)s - %(levelname)s - %(message)s")
+    _worker_processor = ClipProcessor(config)
+
+
+class TaskResult(NamedTuple):
+    """Results of a task, with what a worker process reports about it: its profile, its partial spectrum and its memory use."""
+
+    results: list[dict | None]
+    profile: dict | None = None
+    spectrum: dict | None = None
+    # (pid, current RSS in bytes) of the worker process after the task
+    worker_rss: tuple[int, int | None] | None = None
+
+
+def _process_chunk_in_worker(tasks: list[ExtractionTask]) -> TaskResult:
+    assert _worker_processor is not None, "worker was not initialized"
+    return _worker_result(_worker_processor, _worker_processor.process_chunk(tasks))
+
+
+def _process_batch_in_worker(tasks: list[ExtractionTask]) -> TaskResult:
+    assert _worker_processor is not None, "worker was not initialized"
+    return _worker_result(_worker_processor, _worker_processor.process_batch(tasks))
+
+
+def _worker_result(processor: ClipProcessor, results: list[dict | None]) -> TaskResult:
+    return TaskResult(
+        results,
+        processor.profiler.drain(),
+        processor.spectrum.drain() if processor.spectrum is not None else None,
+        (os.getpid(), current_rss_bytes()),
+    )
+
+
+def create_executor(
+    kind: str,
+    config: ProcessorConfig,
+    workers: int | None = None,
+    profiler: Profiler | None = None,
+    spectrum: SpectrumProfile | None = None,
+) -> tuple[Executor, ClipProcessor | None]:
+    """
+    Create the execution backend for a language run.
+
+    The thread backend shares a single processor between threads. The process backend
+    builds one processor per worker in its initializer, so only clip tuples travel to
+    the workers and only result dicts travel back. Workers are started by a fork server
+    (or spawned where there is none) instead of being forked from this process, which may
+    be running other threads, such as the download thread of a pipelined run.
+    """
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers), ClipProcessor(config, profiler, spectrum)
+    if kind == "process":
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+            initializer=_init_worker,
+            initargs=(config, logging.getLogger().getEffectiveLevel()),
+        )
+        return executor, None
+    raise ValueError(f"Unknown executor: {kind}. Available executors: {', '.join(EXECUTORS)}")
+
+
+def _chunks(clips: Iterable[ClipTask], size: int, clips_dir: Path, large_clip_bytes: int | None = None) -> Iterator[tuple[list[ClipTask], bool]]:
+    """
+    Group clips into chunks of `size`, flagging the chunks that hold a large clip.
+
+    A clip whose file is larger than `large_clip_bytes` always gets a chunk of its own;
+    the chunk collected before it is sent first, so input order is kept.
+    """
+    chunk: list[ClipTask] = []
+    for clip in clips:
+        if large_clip_bytes is not None and _file_size(clips_dir / clip[0]) > large_clip_bytes:
+            if chunk:
+                yield chunk, False
+                chunk = []
+            yield [clip], True
+            continue
+
+        chunk.append(clip)
+        if len(chunk) == size:
+            yield chunk, False
+            chunk = []
+    if chunk:
+        yield chunk, False
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        # Missing clips are reported by the worker that fails to decode them.
+        return 0
+
+
+def _with_cached_results(chunks: Iterable[tuple[list[ClipTask], bool]], config: ProcessorConfig) -> Iterator[tuple[list[ExtractionTask], bool]]:
+    """Pair every clip with its cached extractor results, looked up a chunk at a time, so workers only compute the missing ones."""
+    if config.feature_cache_dir is None:
+        for chunk, large in chunks:
+            yield [(clip, None) for clip in chunk], large
+        return
+
+    cache = FeatureCache(config.feature_cache_dir, get_extractors(config.features, config.extractor_options), config.audio_params)
+    for chunk, large in chunks:
+        yield list(zip(chunk, cache.lookup(config.clips_dir, [clip[0] for clip in chunk]))), large
+
+
+def run_clips(
+    clips: Iterable[ClipTask],
+    config: ProcessorConfig,
+    executor: str = "thread",
+    workers: int | None = None,
+    chunksize: int = 1,
+    batch_clips: int = 0,
+    profiler: Profiler | None = None,
+    spectrum: SpectrumProfile | None = None,
+    max_inflight: int | None = None,
+    max_rss: int | None = None,
+    large_clip_bytes: int | None = None,
+) -> Iterator[dict | None]:
+    """
+    Process clips on the selected backend, yielding results in input order.
+
+    Clips are taken from `clips` lazily and only a bounded amount of work is in flight,
+    so the iterable may still be growing (e.g. clips extracted from an archive that is
+    being downloaded) and results start coming back before it is exhausted.
+
+    Every task is a chunk of `chunksize` clips, or with `batch_clips` > 0 a group of that
+    many clips handled by `ClipProcessor.process_batch`. With a feature cache, the clips of
+    each task are looked up here in one query, and only the extractors without a cached
+    result run in the workers.
+
+    Before a task is submitted, results are collected until at most `max_inflight` clips
+    would be in flight (by default four tasks per worker) and, with a `max_rss` budget in
+    bytes, until the resident memory of this process and of the workers is back under it.
+    A clip whose file is larger than `large_clip_bytes` is never grouped with other clips
+    and runs alone: it is submitted once everything in flight has been collected, and
+    nothing else is submitted until its result is back. At least one task is always in flight.
+
+    With a `profiler`, the time spent waiting for results is recorded and the profiles of
+    process workers are merged into it; likewise the partial spectrum profiles of process
+    workers are merged into `spectrum` as their results arrive.
+    """
+    pool, processor = create_executor(executor, config, workers, profiler, spectrum)
+    task_size = batch_clips if batch_clips > 0 else chunksize
+
+    if processor is not None:
+        process = processor.process_batch if batch_clips > 0 else processor.process_chunk
+        fn = lambda task: TaskResult(process(task))
+    else:
+        fn = _process_batch_in_worker if batch_clips > 0 else _process_chunk_in_worker
+    tasks = _with_cached_results(_chunks(clips, task_size, config.clips_dir, large_clip_bytes), config)
+
+    if max_inflight is None:
+        max_inflight = 4 * (workers or os.cpu_count() or 1) * task_size
+    if max_rss is not None and current_rss_bytes() is None:
+        logging.warning("Memory use cannot be measured on this platform, ignoring the memory budget")
+        max_rss = None
+
+    # (future, number of clips, holds a large clip)
+    pending: deque[tuple[Future, int, bool]] = deque()
+    inflight = 0
+    large_inflight = 0
+    worker_rss: dict[int, int] = {}
+    throttled = 0
+    large_clips = 0
+    warned = False
+
+    def collect() -> list[dict | None]:
+        nonlocal inflight, large_inflight
+        future, n_clips, large = pending.popleft()
+        start = time.perf_counter()
+        result = future.result()
+        inflight -= n_clips
+        large_inflight -= large
+
+        if result.worker_rss is not None and result.worker_rss[1] is not None:
+            worker_rss[result.worker_rss[0]] = result.worker_rss[1]
+        if spectrum is not None and result.spectrum is not None:
+            spectrum.merge(result.spectrum)
+        if profiler is not None:
+            profiler.record("wait", time.perf_counter() - start)
+            if result.profile is not None:
+                profiler.merge(result.profile)
+        return result.results
+
+    def must_wait(n_clips: int, large: bool) -> bool:
+        nonlocal throttled, warned
+        memory = (current_rss_bytes() or 0) + sum(worker_rss.values()) if max_rss is not None else 0
+        if not pending:
+            if max_rss is not None and memory > max_rss and not warned:
+                logging.warning(
+                    f"Memory use of {memory / 2**20:.0f} MiB is above the budget of {max_rss / 2**20:.0f} MiB "
+                    f"with nothing in flight; continuing with one task at a time while it lasts"
+                )
+                warned = True
+            return False
+        # A large clip runs alone: it waits for everything in flight, and nothing joins it.
+        if large or large_inflight > 0 or inflight + n_clips > max_inflight:
+            return True
+        if max_rss is not None and memory > max_rss:
+            throttled += 1
+            return True
+        return False
+
+    with pool:
+        for task, large in tasks:
+            while must_wait(len(task), large):
+                yield from collect()
+
+            pending.append((pool.submit(fn, task), len(task), large))
+            inflight += len(task)
+            large_inflight += large
+            large_clips += large
+
+            while pending and pending[0][0].done():
+                yield from collect()
+
+        while pending:
+            yield from collect()
+
+    if throttled:
+        logging.info(f"Held back new work {throttled} times to stay under the memory budget of {max_rss / 2**20:.0f} MiB")
+    if large_clips:
+        logging.info(f"Processed {large_clips} clips larger than {large_clip_bytes / 2**20:.2f} MiB on their own")
@@ -0,0 +1,92 @@
+import json
+import numpy as np
+from pathlib import Path
+from feature_extraction.base_extractor import BaseExtractor
+from pipeline.cache_index import MAX_KEYS_PER_QUERY, CacheIndex
+
+# name -> features of one extractor for one clip
+CachedResults = dict[str, dict]
+INDEX_NAME = "results.sqlite"
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT, extractor TEXT, size INTEGER, mtime_ns INTEGER, audio_params TEXT, features TEXT, PRIMARY KEY (key, extractor)
+)
+"""
+
+
+def _to_json(value):
+    # Keep the numpy dtype, so cached values are written out exactly like freshly computed ones.
+    if isinstance(value, (np.ndarray, np.generic)):
+        return {"dtype": value.dtype.str, "value": value.tolist()}
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        array = np.array(value["value"], dtype=value["dtype"])
+        return array[()] if array.ndim == 0 else array
+    return value
+
+
+class FeatureCache:
+    """
+    Persistent cache of per-extractor results, so a run only computes the (clip, extractor) pairs it has not seen.
+
+    Results are rows of a SQLite table keyed by clip and by `<name>-<cache key>` of the
+    extractor, and the cache key changes with the extractor's version and parameters, so
+    changing one extractor only invalidates its own results. Like AudioCache, the index is
+    shared by every thread and process worker, and an entry is only used while the clip's
+    size and mtime still match. Results are looked up for a group of clips at a time, so
+    nothing beyond that group is held in memory. Failed extractions are not cached.
+    """
+
+    def __init__(self, cache_dir: Path, extractors: dict[str, BaseExtractor], audio_params: str = ""):
+        self.cache_dir = cache_dir
+        self.audio_params = audio_params
+        self.extractor_keys = {name: f"{name}-{extractor.cache_key()}" for name, extractor in extractors.items()}
+        self.index = CacheIndex(cache_dir / INDEX_NAME, INDEX_SCHEMA)
+
+    def lookup(self, clips_dir: Path, keys: list[str]) -> list[CachedResults]:
+        """Cached features of each clip for every extractor whose result is still valid, in the order of `keys`."""
+        names = {extractor_key: name for name, extractor_key in self.extractor_keys.items()}
+        entries: dict[str, list[tuple]] = {}
+        for start in range(0, len(keys), MAX_KEYS_PER_QUERY):
+            group = keys[start:start + MAX_KEYS_PER_QUERY]
+            rows = self.index.query(
+                f"SELECT key, extractor, size, mtime_ns, audio_params, features FROM results "
+                f"WHERE key IN ({', '.join('?' * len(group))}) AND extractor IN ({', '.join('?' * len(names))})",
+                [*group, *names],
+            )
+            for row in rows:
+                entries.setdefault(row[0], []).append(row[1:])
+
+        results = []
+        for key in keys:
+            cached: CachedResults = {}
+            if key in entries:
+                try:
+                    stat = (clips_dir / key).stat()
+                except OSError:
+                    stat = None
+                for extractor_key, size, mtime_ns, audio_params, features in entries[key]:
+                    if stat is not None and size == stat.st_size and mtime_ns == stat.st_mtime_ns and audio_params == self.audio_params:
+                        cached[names[extractor_key]] = {column: _from_json(value) for column, value in json.loads(features).items()}
+            results.append(cached)
+        return results
+
+    def store(self, file_path: Path, key: str, name: str, features: dict) -> None:
+        if "error" in features:
+            return
+
+        stat = file_path.stat()
+        self.index.execute(
+            "INSERT OR REPLACE INTO results (key, extractor, size, mtime_ns, audio_params, features) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                self.extractor_keys[name],
+                stat.st_size,
+                stat.st_mtime_ns,
+                self.audio_params,
+                json.dumps({column: _to_json(value) for column, value in features.items()}),
+            ),
+        )
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from collections import OrderedDict
+from pathlib import Path
+from collections.abc import Iterable, Iterator
+from pipeline.options import FRAME_COMPRESSIONS
+
+FRAME_DTYPE = np.float32
+DEFAULT_CHUNK_BYTES = 64 * 2**20
+CACHED_CHUNKS = 4
+INDEX_NAME = "index.jsonl"
+CHUNK_SUFFIXES = {"none": ".f32", "zstd": ".f32.zst", "lz4": ".f32.lz4"}
+# Compressed chunks start with the size of their decompressed data.
+SIZE_HEADER_BYTES = 8
+# Key of the per-frame tracks in a result dict; the runner hands them to the frame store before the row is written.
+FRAMES_KEY = "frames"
+
+
+class FrameWriter:
+    """
+    Append the per-frame tracks of clips to a frame store directory.
+
+    Tracks are buffered and written as chunk files of about `chunk_bytes` before compression.
+    A chunk holds every track of its clips one after another as C-ordered float32 matrices
+    shaped (n_frames, n_values) and is compressed as a whole unless `compression` is "none".
+    The chunk is synced to disk before its clips are appended to the index, which maps every
+    clip path to its chunk and to the (offset, n_frames, n_values) of each of its tracks, so
+    the index only ever points at complete chunks.
+    """
+
+    def __init__(self, store_dir: Path, compression: str = "zstd", chunk_bytes: int = DEFAULT_CHUNK_BYTES, resume: bool = False):
+        if compression not in CHUNK_SUFFIXES:
+            raise ValueError(f"Unknown frame compression: {compression}. Available compressions: {', '.join(FRAME_COMPRESSIONS)}")
+        if not resume and store_dir.exists():
+            shutil.rmtree(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+
+        self.store_dir = store_dir
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+        self._chunk_number = 1 + max((_chunk_number(chunk) for chunk in store_dir.glob("chunk-*")), default=-1)
+        self._arrays: list[np.ndarray] = []
+        self._entries: list[dict] = []
+        self._size = 0
+
+    def add(self, path: str, gender: str, age: str, tracks: dict[str, np.ndarray]) -> None:
+        entry_tracks = {}
+        for feature, track in tracks.items():
+            matrix = np.ascontiguousarray(np.atleast_2d(track).T, dtype=FRAME_DTYPE)
+            entry_tracks[feature] = [self._size, matrix.shape[0], matrix.shape[1]]
+            self._arrays.append(matrix.ravel())
+            self._size += matrix.size
+
+        self._entries.append({"path": path, "gender": gender, "age": age, "tracks": entry_tracks})
+        if self._size * np.dtype(FRAME_DTYPE).itemsize >= self.chunk_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._entries:
+            return
+
+        chunk = f"chunk-{self._chunk_number:05d}{CHUNK_SUFFIXES[self.compression]}"
+        data = np.concatenate(self._arrays) if self._arrays else np.zeros(0, dtype=FRAME_DTYPE)
+        tmp_path = self.store_dir / f".{chunk}.tmp"
+        with open(tmp_path, "wb") as chunk_file:
+            if self.compression == "none":
+                chunk_file.write(data.tobytes())
+            else:
+                chunk_file.write(data.nbytes.to_bytes(SIZE_HEADER_BYTES, "little"))
+                chunk_file.write(pa.compress(data, codec=self.compression, asbytes=True))
+            chunk_file.flush()
+            os.fsync(chunk_file.fileno())
+        tmp_path.rename(self.store_dir / chunk)
+
+        with open(self.store_dir / INDEX_NAME, "a") as index_file:
+            index_file.writelines(json.dumps({**entry, "chunk": chunk}) + "\n" for entry in self._entries)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+        self._chunk_number += 1
+        self._arrays.clear()
+        self._entries.clear()
+        self._size = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class FrameStore:
+    """
+    Read the per-frame tracks of a frame store without copying them.
+
+    Uncompressed chunks are memory-mapped and compressed ones are decompressed once into
+    memory, keeping the `cached_chunks` most recently used; every track is returned as a
+    read-only (n_frames, n_values) view into its chunk. `index` lists the clips with their
+    gender, age and chunk, to select subsets with pandas.
+    """
+
+    def __init__(self, store_dir: Path, cached_chunks: int = CACHED_CHUNKS):
+        self.store_dir = store_dir
+        self.cached_chunks = cached_chunks
+        self._chunks: OrderedDict[str, np.ndarray] = OrderedDict()
+
+        # A resumed run may store a clip again; its latest entry wins.
+        self._entries: dict[str, dict] = {}
+        with open(store_dir / INDEX_NAME) as index_file:
+            for line in index_file:
+                if not line.endswith("\n"):
+                    break
+                entry = json.loads(line)
+                self._entries[entry["path"]] = entry
+
+        self.index = pd.DataFrame(
+            [(path, entry["gender"], entry["age"], entry["chunk"]) for path, entry in self._entries.items()],
+            columns=["path", "gender", "age", "chunk"],
+        )
+        self.features = sorted({feature for entry in self._entries.values() for feature in entry["tracks"]})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def load(self, path: str, feature: str) -> np.ndarray:
+        """Frames of one track of a clip, shaped (n_frames, n_values)."""
+        entry = self._entries[path]
+        offset, n_frames, n_values = entry["tracks"][feature]
+        return self._chunk(entry["chunk"])[offset:offset + n_frames * n_values].reshape(n_frames, n_values)
+
+    def load_clip(self, path: str) -> dict[str, np.ndarray]:
+        return {feature: self.load(path, feature) for feature in self._entries[path]["tracks"]}
+
+    def select(self, genders: Iterable[str] | None = None, ages: Iterable[str] | None = None) -> list[str]:
+        """Paths of the stored clips of the given genders and age groups."""
+        mask = pd.Series(True, index=self.index.index)
+        if genders is not None:
+            mask &= self.index["gender"].isin(list(genders))
+        if ages is not None:
+            mask &= self.index["age"].isin(list(ages))
+        return self.index.loc[mask, "path"].tolist()
+
+    def iter_frames(self, feature: str, paths: Iterable[str] | None = None) -> Iterator[tuple[str, np.ndarray]]:
+        """
+        Yield (path, frames) for one track of the given clips, or of every clip.
+
+        Clips are visited in storage order, so each chunk is read or decompressed only once;
+        clips without the track are skipped.
+        """
+        selected = self._entries.keys() if paths is None else [path for path in paths if path in self._entries]
+        ordered = sorted(
+            (path for path in selected if feature in self._entries[path]["tracks"]),
+            key=lambda path: (self._entries[path]["chunk"], self._entries[path]["tracks"][feature][0]),
+        )
+        for path in ordered:
+            yield path, self.load(path, feature)
+
+    def _chunk(self, chunk: str) -> np.ndarray:
+        data = self._chunks.get(chunk)
+        if data is not None:
+            self._chunks.move_to_end(chunk)
+            return data
+
+        chunk_path = self.store_dir / chunk
+        if chunk.endswith(CHUNK_SUFFIXES["none"]):
+            data = np.memmap(chunk_path, dtype=FRAME_DTYPE, mode="r") if chunk_path.stat().st_size > 0 else np.zeros(0, dtype=FRAME_DTYPE)
+        else:
+            codec = "zstd" if chunk.endswith(CHUNK_SUFFIXES["zstd"]) else "lz4"
+            raw = chunk_path.read_bytes()
+            size = int.from_bytes(raw[:SIZE_HEADER_BYTES], "little")
+            buffer = pa.decompress(memoryview(raw)[SIZE_HEADER_BYTES:], decompressed_size=size, codec=codec)
+            data = np.frombuffer(buffer, dtype=FRAME_DTYPE)
+            data.flags.writeable = False
+
+        self._chunks[chunk] = data
+        if len(self._chunks) > self.cached_chunks:
+            self._chunks.popitem(last=False)
+        return data
+
+
+def frame_store_path(destination: Path, language: str, shard: tuple[int, int] | None = None) -> Path:
+    if shard is None:
+        return destination / f"{language}_frames"
+    return destination / f"{language}_frames.shard-{shard[0]:04d}-of-{shard[1]:04d}"
+
+
+def merge_frame_stores(sources: list[Path], store_dir: Path) -> None:
+    """Combine frame stores, e.g. of shards, into a new store by renumbering their chunks; the latest entry of each clip is kept."""
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    store_dir.mkdir(parents=True)
+
+    chunk_number = 0
+    with open(store_dir / INDEX_NAME, "w") as index_file:
+        for source in sources:
+            renamed: dict[str, str] = {}
+            for entry in FrameStore(source)._entries.values():
+                chunk = renamed.get(entry["chunk"])
+                if chunk is None:
+                    suffix = entry["chunk"][entry["chunk"].index("."):]
+                    chunk = renamed[entry["chunk"]] = f"chunk-{chunk_number:05d}{suffix}"
+                    chunk_number += 1
+                    shutil.copyfile(source / entry["chunk"], store_dir / chunk)
+                index_file.write(json.dumps({**entry, "chunk": chunk}) + "\n")
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+    logging.info(f"Merged {len(sources)} frame stores into {store_dir} ({chunk_number} chunks)")
+
+
+def _chunk_number(chunk_path: Path) -> int:
+    return int(chunk_path.name.split("-")[1].split(".")[0])
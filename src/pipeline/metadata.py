@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections.abc import Iterator
+from pipeline.options import MetadataFilter
+
+METADATA_COLUMNS = ["path", "gender", "age"]
+STRATUM_COLUMNS = ["gender", "age"]
+DEFAULT_CHUNK_ROWS = 100_000
+# Fixed key of the path hash that assigns clips to shards; changing it reshuffles every shard.
+SHARD_HASH_KEY = "clip-path-shards"
+
+# (path, gender, age) as read from validated.tsv
+ClipTask = tuple[str, str, str]
+
+
+def iter_metadata(
+    validated_tsv_path: Path,
+    metadata_filter: MetadataFilter | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[ClipTask]:
+    """
+    Stream the clips of validated.tsv as (path, gender, age) tuples in file order.
+
+    The file is read `chunk_rows` rows at a time, only the three needed columns are parsed
+    and the filters are applied to each chunk as it is read, so memory does not grow with
+    the size of the file. The only exception is a seeded per-stratum cap, which keeps at
+    most `max_per_stratum` candidates per stratum until the whole file has been read.
+
+    Sharding is applied last, so the shards of a capped selection together hold exactly the
+    clips an unsharded run would extract.
+    """
+    metadata_filter = metadata_filter or MetadataFilter()
+    chunks = _read_chunks(validated_tsv_path, metadata_filter, chunk_rows)
+
+    if metadata_filter.max_per_stratum is not None and metadata_filter.seed is None:
+        chunks = _first_per_stratum(chunks, metadata_filter.max_per_stratum)
+    elif metadata_filter.max_per_stratum is not None:
+        chunks = _sample_per_stratum(chunks, metadata_filter.max_per_stratum, metadata_filter.seed)
+
+    for chunk in chunks:
+        if metadata_filter.shard_count > 1:
+            chunk = chunk[shard_of(chunk["path"], metadata_filter.shard_count) == metadata_filter.shard_index]
+        yield from _tuples(chunk)
+
+
+def shard_of(paths: pd.Series, shard_count: int) -> np.ndarray:
+    """Shard index of every clip path; it depends only on the path, never on the file or the machine."""
+    return pd.util.hash_pandas_object(paths, index=False, hash_key=SHARD_HASH_KEY).to_numpy() % np.uint64(shard_count)
+
+
+def _read_chunks(validated_tsv_path: Path, metadata_filter: MetadataFilter, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(validated_tsv_path, sep='\t', usecols=METADATA_COLUMNS, dtype=str, chunksize=chunk_rows)  # type: ignore
+    with reader:
+        for chunk in reader:
+            chunk = chunk.dropna()
+            mask = chunk["path"].str.endswith(".mp3")
+            if metadata_filter.genders is not None:
+                mask &= chunk["gender"].isin(metadata_filter.genders)
+            if metadata_filter.ages is not None:
+                mask &= chunk["age"].isin(metadata_filter.ages)
+            yield chunk[mask]
+
+
+def _tuples(chunk: pd.DataFrame) -> Iterator[ClipTask]:
+    return zip(chunk["path"].to_numpy(), chunk["gender"].to_numpy(), chunk["age"].to_numpy())
+
+
+def _first_per_stratum(chunks: Iterator[pd.DataFrame], cap: int) -> Iterator[pd.DataFrame]:
+    counts: dict[tuple[str, str], int] = {}
+    for chunk in chunks:
+        kept = []
+        for stratum, group in chunk.groupby(STRATUM_COLUMNS, sort=False):
+            taken = counts.get(stratum, 0)
+            if taken < cap:
+                kept.append(group.head(cap - taken))
+                counts[stratum] = taken + min(len(group), cap - taken)
+        if kept:
+            yield pd.concat(kept).sort_index()
+
+
+def _sample_per_stratum(chunks: Iterator[pd.DataFrame], cap: int, seed: int) -> Iterator[pd.DataFrame]:
+    """Keep the `cap` clips of every stratum with the smallest seeded hash of their path, then yield them in file order."""
+    hash_key = f"{seed:016d}"[-16:]
+    sample = pd.DataFrame(columns=[*METADATA_COLUMNS, "priority"])
+
+    for chunk in chunks:
+        chunk = chunk.assign(priority=pd.util.hash_pandas_object(chunk["path"], index=False, hash_key=hash_key).to_numpy())
+        candidates = pd.concat([sample, chunk]) if len(sample) else chunk
+        sample = candidates.sort_values("priority", kind="stable").groupby(STRATUM_COLUMNS, sort=False).head(cap)
+
+    yield sample.sort_index()
@@ -0,0 +1,169 @@
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+from feature_extraction.registry import EXTRACTORS
+from pipeline.profiling import DEFAULT_SLOW_CLIP_SECONDS
+
+if TYPE_CHECKING:
+    from pipeline.engine import ProcessorConfig
+
+# Kept here rather than next to their implementations, so the CLIs can be built without importing them.
+EXECUTORS = ("thread", "process")
+OUTPUT_FORMATS = ("csv", "parquet", "arrow")
+FRAME_COMPRESSIONS = ("zstd", "lz4", "none")
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """
+    Which clips of validated.tsv to extract.
+
+    `genders` and `ages` keep only the listed values. `max_per_stratum` caps the number of
+    clips per (gender, age) stratum: the first ones in file order, or with a `seed` a
+    deterministic random sample that does not depend on the order of the rows.
+    """
+
+    genders: tuple[str, ...] | None = None
+    ages: tuple[str, ...] | None = None
+    max_per_stratum: int | None = None
+    seed: int | None = None
+    shard_index: int = 0
+    shard_count: int = 1
+
+    def __post_init__(self):
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(f"Shard index {self.shard_index} is out of range for {self.shard_count} shards")
+
+    @property
+    def shard(self) -> tuple[int, int] | None:
+        return (self.shard_index, self.shard_count) if self.shard_count > 1 else None
+
+    @property
+    def selects_by_metadata(self) -> bool:
+        """Whether clips are chosen by gender, age or stratum, which only validated.tsv tells."""
+        return self.genders is not None or self.ages is not None or self.max_per_stratum is not None
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace, shard: tuple[int, int] = (0, 1)) -> "MetadataFilter":
+        return cls(
+            genders=tuple(args.genders) if args.genders else None,
+            ages=tuple(args.ages) if args.ages else None,
+            max_per_stratum=args.max_per_stratum,
+            seed=args.sample_seed,
+            shard_index=shard[0],
+            shard_count=shard[1],
+        )
+
+
+@dataclass
+class ExtractionOptions:
+    """How a language's clips are processed and written, shared by every entry point that runs extraction."""
+
+    features: list[str] | None = None
+    executor: str = "thread"
+    workers: int | None = None
+    chunksize: int = 1
+    batch_clips: int = 0
+    max_inflight: int | None = None
+    max_rss_mb: float | None = None
+    large_clip_mb: float | None = None
+    batch_sr: int | None = None
+    extractor_options: dict[str, dict] = field(default_factory=dict)
+    audio_cache_root: Path | None = None
+    feature_cache_root: Path | None = None
+    output_format: str = "csv"
+    flush_size: int = 1000
+    resume: bool = False
+    incremental: bool = False
+    profile: bool = False
+    profile_dir: Path | None = None
+    slow_clip_seconds: float = DEFAULT_SLOW_CLIP_SECONDS
+    spectrum: bool = False
+    frames: bool = False
+    frames_compression: str = "zstd"
+    metadata_filter: MetadataFilter = field(default_factory=MetadataFilter)
+
+    def processor_config(self, language: str, clips_dir: Path) -> "ProcessorConfig":
+        from pipeline.engine import ProcessorConfig
+
+        return ProcessorConfig(
+            clips_dir=clips_dir,
+            features=self.features,
+            extractor_options=self.extractor_options,
+            audio_cache_dir=self.audio_cache_root / language if self.audio_cache_root else None,
+            batch_sr=self.batch_sr,
+            feature_cache_dir=self.feature_cache_root / language if self.feature_cache_root else None,
+            profile=self.profile,
+            slow_clip_seconds=self.slow_clip_seconds,
+            spectrum=self.spectrum,
+            frames=self.frames,
+        )
+
+    def output_settings(self) -> dict:
+        """Options that change the rows of the feature table; an incremental run only appends to a table extracted with the same settings."""
+        return {"features": self.features, "extractor_options": self.extractor_options, "batch_sr": self.batch_sr}
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "ExtractionOptions":
+        return cls(
+            features=args.features if args.features else None,
+            executor=args.executor,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            batch_clips=args.batch_clips,
+            max_inflight=args.max_inflight,
+            max_rss_mb=args.max_rss,
+            large_clip_mb=args.large_clip_mb,
+            batch_sr=args.batch_sr,
+            extractor_options={"pitch": {"backend": args.pitch_backend}, "hnr": {"backend": args.hnr_backend}},
+            audio_cache_root=Path(args.audio_cache) if args.audio_cache else None,
+            feature_cache_root=Path(args.feature_cache) if args.feature_cache else None,
+            output_format=args.output_format,
+            flush_size=args.batch_size,
+            resume=args.resume,
+            incremental=args.incremental,
+            profile=args.profile or args.profile_dir is not None,
+            profile_dir=Path(args.profile_dir) if args.profile_dir else None,
+            slow_clip_seconds=args.slow_clip_seconds,
+            spectrum=args.spectrum,
+            frames=args.frames,
+            frames_compression=args.frames_compression,
+            metadata_filter=MetadataFilter.from_args(args, shard=(args.shard_index, args.shard_count)),
+        )
+
+
+def add_extraction_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--features", nargs="*", choices=list(EXTRACTORS), metavar="FEATURE", help="List of features to extract (e.g., pitch, mfcc, formant). If not provided, all features will be extracted.")
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread", help="Execution backend: threads in one process or a pool of worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="Number of workers (defaults to the executor's own default)")
+    parser.add_argument("--chunksize", type=int, default=1, help="Number of clips sent to a process worker at a time")
+    parser.add_argument("--max-inflight", type=int, default=None, help="Maximum number of clips submitted to the workers and not yet written (default: four tasks per worker)")
+    parser.add_argument("--max-rss", type=float, default=None, help="Memory budget in MiB for this process and its workers; no new clips are submitted while it is exceeded")
+    parser.add_argument("--large-clip-mb", type=float, default=None, help="Process clips whose file is larger than this many MiB on their own, one at a time")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Number of results buffered before they are flushed to the output")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="csv", help="Output format; parquet and arrow store vector features as typed float32 columns")
+    parser.add_argument("--pitch-backend", choices=EXTRACTORS["pitch"].backends, default="piptrack", help="Pitch tracker used by the pitch feature")
+    parser.add_argument("--hnr-backend", choices=EXTRACTORS["hnr"].backends, default="autocorrelation", help="Harmonics-to-noise ratio estimator used by the hnr feature")
+    parser.add_argument("--batch-clips", type=int, default=0, help="Decode this many clips together and compute features for clips of similar length in one vectorized call (0 disables batching)")
+    parser.add_argument("--batch-sr", type=int, default=None, help="Resample clips to this rate in batch mode so clips of different rates can be batched together")
+    parser.add_argument("--audio-cache", type=str, default=None, help="Directory for the decoded-audio cache; clips decoded once are read back from memory-mapped shards")
+    parser.add_argument("--feature-cache", type=str, default=None, help="Directory for cached per-extractor results; only extractors without a cached result for a clip are run")
+    parser.add_argument("--resume", action="store_true", help="Skip clips already written by a previous, interrupted run")
+    parser.add_argument("--incremental", action="store_true", help="Keep the existing feature table: drop the rows of clips that changed or were removed since they were extracted and only extract clips without a row")
+    parser.add_argument("--profile", action="store_true", help="Time every pipeline stage and log a summary table after each language")
+    parser.add_argument("--profile-dir", type=str, default=None, help="Also write each language's profile as JSON and as a Prometheus textfile to this directory (implies --profile)")
+    parser.add_argument("--slow-clip-seconds", type=float, default=DEFAULT_SLOW_CLIP_SECONDS, help="Clips taking longer than this are reported as slow outliers when profiling")
+    parser.add_argument("--spectrum", action="store_true", help="Also build each language's long-term average spectrum and band-level statistics per gender and age, saved as {language}_spectrum.json")
+    parser.add_argument("--frames", action="store_true", help="Also store the per-frame values behind every feature in {language}_frames, a chunked store readable with pipeline.frame_store.FrameStore")
+    parser.add_argument("--frames-compression", choices=FRAME_COMPRESSIONS, default="zstd", help="Compression of the frame store chunks; uncompressed chunks are memory-mapped when read")
+    parser.add_argument("--shard-index", type=int, default=0, help="Index of this shard, from 0 to --shard-count - 1")
+    parser.add_argument("--shard-count", type=int, default=1, help="Split every language's clips into this many shards by a hash of the clip path and only extract --shard-index")
+    add_metadata_arguments(parser)
+
+
+def add_metadata_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--genders", nargs="+", default=None, help="Only extract clips of these genders, as written in validated.tsv")
+    parser.add_argument("--ages", nargs="+", default=None, help="Only extract clips of these age groups, as written in validated.tsv")
+    parser.add_argument("--max-per-stratum", type=int, default=None, help="Extract at most this many clips per (gender, age) combination")
+    parser.add_argument("--sample-seed", type=int, default=None, help="With --max-per-stratum, pick a deterministic random sample with this seed instead of the first clips")
@@ -0,0 +1,242 @@
+import bisect
+import heapq
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from collections.abc import Iterator
+
+# Upper bounds of the histogram buckets in seconds, from a fraction of a millisecond to a minute.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+DEFAULT_SLOW_CLIP_SECONDS = 1.0
+SLOWEST_CLIPS = 10
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, so histograms from several workers can be merged by adding them up."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, count: int = 1) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += count
+        self.count += count
+        self.total += seconds * count
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating linearly inside its bucket, like Prometheus' histogram_quantile."""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = min(BUCKETS[i], self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "count": self.count, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class Profiler:
+    """
+    Per-stage timing of the extraction pipeline.
+
+    Every timed stage (decode, trim, each extractor, result assembly, writing, waiting for
+    workers) gets a histogram of its per-clip durations. Whole-clip durations above
+    `slow_clip_seconds` are counted and the slowest clips are kept with their paths.
+    Process workers have their own profiler and send its `drain()` snapshot back with
+    their results, where it is merged into the profiler of the run.
+    """
+
+    enabled = True
+
+    def __init__(self, slow_clip_seconds: float = DEFAULT_SLOW_CLIP_SECONDS):
+        self.slow_clip_seconds = slow_clip_seconds
+        self.stages: dict[str, Histogram] = {}
+        self.slow_clips = 0
+        self.slowest: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, count: int = 1) -> None:
+        """Record `count` clips that spent `seconds` each in `stage`."""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds, count)
+
+    @contextmanager
+    def stage(self, stage: str, count: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) / count, count)
+
+    def clip(self, path: str, seconds: float) -> None:
+        """Record the total processing time of one clip."""
+        self.record("clip", seconds)
+        if seconds < self.slow_clip_seconds:
+            return
+        with self._lock:
+            self.slow_clips += 1
+            entry = (seconds, path)
+            if len(self.slowest) < SLOWEST_CLIPS:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def drain(self) -> dict:
+        """Return everything recorded so far as a picklable snapshot and start over."""
+        with self._lock:
+            snapshot = self.to_dict()
+            self.stages = {}
+            self.slow_clips = 0
+            self.slowest = []
+        return snapshot
+
+    def merge(self, snapshot: dict) -> None:
+        with self._lock:
+            for stage, data in snapshot["stages"].items():
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    self.stages[stage] = Histogram.from_dict(data)
+                else:
+                    histogram.merge(Histogram.from_dict(data))
+            self.slow_clips += snapshot["slow_clips"]
+            for entry in snapshot["slowest"]:
+                entry = (entry["seconds"], entry["path"])
+                if len(self.slowest) < SLOWEST_CLIPS:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+            "slow_clips": self.slow_clips,
+            "slowest": [{"seconds": seconds, "path": path} for seconds, path in sorted(self.slowest, reverse=True)],
+        }
+
+    def summary(self, title: str) -> str:
+        """Table of every stage's share of the time and its latency distribution."""
+        lines = [
+            title,
+            f"{'stage':<28} {'clips':>8} {'total s':>9} {'share':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}",
+        ]
+        clip_total = self.stages["clip"].total if "clip" in self.stages else 0.0
+        for stage, histogram in sorted(self.stages.items(), key=lambda item: -item[1].total):
+            share = f"{histogram.total / clip_total:>6.0%}" if clip_total and stage not in ("clip", "wait", "write") else f"{'':>6}"
+            lines.append(
+                f"{stage:<28} {histogram.count:>8} {histogram.total:>9.1f} {share} "
+                f"{1000 * histogram.total / max(histogram.count, 1):>9.1f} {1000 * histogram.quantile(0.5):>9.1f} "
+                f"{1000 * histogram.quantile(0.95):>9.1f} {1000 * histogram.max:>9.1f}"
+            )
+
+        lines.append(f"Clips slower than {self.slow_clip_seconds:g}s: {self.slow_clips}")
+        for seconds, path in sorted(self.slowest, reverse=True):
+            lines.append(f"  {seconds:8.2f}s {path}")
+        lines.append(f"Peak RSS: {peak_rss_bytes() / 2**20:.0f} MiB (largest child process: {peak_rss_bytes(resource.RUSAGE_CHILDREN) / 2**20:.0f} MiB)")
+        return "\n".join(lines)
+
+    def dump(self, output_dir: Path, language: str, shard: tuple[int, int] | None = None) -> None:
+        """Write `{language}_profile.json` and a Prometheus textfile-collector file `{language}_profile.prom`, with a shard suffix for sharded runs."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        name = language if shard is None else f"{language}.shard-{shard[0]:04d}-of-{shard[1]:04d}"
+        base_labels = f'language="{language}"' if shard is None else f'language="{language}",shard="{shard[0]}"'
+
+        data = self.to_dict()
+        data["language"] = language
+        data["shard"] = list(shard) if shard is not None else None
+        data["buckets"] = [bucket if bucket != float("inf") else "+Inf" for bucket in BUCKETS]
+        data["peak_rss_bytes"] = {"main": peak_rss_bytes(), "workers": peak_rss_bytes(resource.RUSAGE_CHILDREN)}
+        (output_dir / f"{name}_profile.json").write_text(json.dumps(data, indent=2))
+
+        lines = [
+            "# HELP speech_stage_seconds Per-clip time spent in each stage of feature extraction.",
+            "# TYPE speech_stage_seconds histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            labels = f'{base_labels},stage="{stage}"'
+            cumulative = 0
+            for bucket, bucket_count in zip(BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bucket == float("inf") else f"{bucket:g}"
+                lines.append(f'speech_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"speech_stage_seconds_sum{{{labels}}} {histogram.total}")
+            lines.append(f"speech_stage_seconds_count{{{labels}}} {histogram.count}")
+        lines += [
+            "# HELP speech_slow_clips_total Clips whose processing took longer than the slow-clip threshold.",
+            "# TYPE speech_slow_clips_total counter",
+            f'speech_slow_clips_total{{{base_labels}}} {self.slow_clips}',
+            "# HELP speech_peak_rss_bytes Peak resident set size of the main process and of the largest worker process.",
+            "# TYPE speech_peak_rss_bytes gauge",
+            f'speech_peak_rss_bytes{{{base_labels},process="main"}} {peak_rss_bytes()}',
+            f'speech_peak_rss_bytes{{{base_labels},process="workers"}} {peak_rss_bytes(resource.RUSAGE_CHILDREN)}',
+        ]
+        (output_dir / f"{name}_profile.prom").write_text("\n".join(lines) + "\n")
+        logging.info(f"Saved profile of {name} to {output_dir}")
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every call is a no-op."""
+
+    enabled = False
+
+    def record(self, stage: str, seconds: float, count: int = 1) -> None:
+        pass
+
+    def stage(self, stage: str, count: int = 1) -> nullcontext:
+        return _NO_STAGE
+
+    def clip(self, path: str, seconds: float) -> None:
+        pass
+
+    def drain(self) -> None:
+        return None
+
+
+_NO_STAGE = nullcontext()
+NULL_PROFILER = NullProfiler()
+
+
+def current_rss_bytes() -> int | None:
+    """Resident set size of this process right now, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """Peak resident set size of this process or, with RUSAGE_CHILDREN, of its largest finished child."""
+    return resource.getrusage(who).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
@@ -0,0 +1,165 @@
+import logging
+import time
+from pathlib import Path
+from collections.abc import Callable, Iterable
+from tqdm import tqdm
+from pipeline.clip_manifest import ClipManifest, clip_manifest_path, sources_path
+from pipeline.engine import run_clips
+from pipeline.frame_store import FRAMES_KEY, FrameWriter, frame_store_path
+from pipeline.metadata import ClipTask
+from pipeline.options import ExtractionOptions
+from pipeline.profiling import NULL_PROFILER, Profiler
+from pipeline.spectrum import SpectrumProfile
+from pipeline.writer import ResultWriter, create_writer
+
+
+def extract_clips(
+    language: str,
+    clips: Iterable[ClipTask],
+    clips_dir: Path,
+    destination: Path,
+    options: ExtractionOptions,
+    total: int | None = None,
+    attach_metadata: Callable[[Iterable[dict | None]], Iterable[dict | None]] | None = None,
+) -> int:
+    """
+    Extract features for `clips` and write them to the language's feature table, returning the number of clips processed.
+
+    `clips` is consumed lazily, so it may be a stream that is still being produced;
+    `total` is only used for the progress bar. When the options select a shard, the
+    results go to that shard's own table and are combined later by `merge_shards`.
+    With `options.frames`, per-frame tracks are stored alongside and committed before
+    the rows that refer to them. With `options.incremental`, the existing table is kept
+    and only clips without an up-to-date row are extracted and appended. `attach_metadata`
+    completes the results of clips handed out before their gender and age were known.
+    """
+    shard = options.metadata_filter.shard
+    resume = options.resume or options.incremental
+    label = language if shard is None else f"{language} (shard {shard[0]} of {shard[1]})"
+    frame_writer = (
+        FrameWriter(frame_store_path(destination, language, shard), options.frames_compression, resume=resume)
+        if options.frames
+        else None
+    )
+
+    with create_writer(
+        options.output_format,
+        destination,
+        language,
+        batch_size=options.flush_size,
+        resume=resume,
+        shard=shard,
+    ) as writer:
+        if options.incremental:
+            clip_records = ClipManifest.load(clip_manifest_path(clips_dir.parent))
+            sources = _drop_outdated(writer, clip_records, clips_dir, options)
+        else:
+            sources = None
+            if not options.resume:
+                sources_path(writer.output_path).unlink(missing_ok=True)
+        if frame_writer is not None:
+            writer.before_flush = frame_writer.flush
+        completed = writer.completed
+        skipped = 0
+
+        def pending_clips():
+            nonlocal skipped
+            for clip in clips:
+                if clip[0] in completed:
+                    skipped += 1
+                    continue
+                if sources is not None:
+                    record = clip_records.current_record(clip[0], clips_dir)
+                    if record is not None:
+                        sources.records[clip[0]] = record
+                yield clip
+
+        profiler = Profiler(options.slow_clip_seconds) if options.profile else None
+        spectrum = SpectrumProfile() if options.spectrum else None
+        start_time = time.perf_counter()
+        processed = 0
+        results = run_clips(
+            pending_clips(),
+            options.processor_config(language, clips_dir),
+            executor=options.executor,
+            workers=options.workers,
+            chunksize=options.chunksize,
+            batch_clips=options.batch_clips,
+            profiler=profiler,
+            spectrum=spectrum,
+            max_inflight=options.max_inflight,
+            max_rss=int(options.max_rss_mb * 2**20) if options.max_rss_mb is not None else None,
+            large_clip_bytes=int(options.large_clip_mb * 2**20) if options.large_clip_mb is not None else None,
+        )
+        if attach_metadata is not None:
+            results = attach_metadata(results)
+        write_stage = profiler or NULL_PROFILER
+
+        for result in tqdm(results, total=total, desc=f"Extracting features for {label}", unit="clip"):
+            processed += 1
+            if result is not None:
+                tracks = result.pop(FRAMES_KEY, None)
+                with write_stage.stage("write"):
+                    if frame_writer is not None and tracks is not None:
+                        frame_writer.add(result["path"], result["gender"], result["age"], tracks)
+                    writer.write(result)
+        if sources is not None:
+            writer.flush()
+            sources.records = {name: record for name, record in sources.records.items() if name in writer.completed}
+            sources.save()
+        writer.mark_complete()
+
+    elapsed = time.perf_counter() - start_time
+
+    if skipped:
+        logging.info(f"Skipped {skipped} clips already extracted for {label}")
+        if spectrum is not None:
+            logging.warning(f"The spectrum profile of {label} only covers the {processed} clips processed in this run")
+    logging.info(
+        f"Processed {processed} clips for {label} in {elapsed:.1f}s "
+        f"({processed / max(elapsed, 1e-9):.2f} clips/sec, executor={options.executor})"
+    )
+
+    if spectrum is not None:
+        spectrum.dump(destination, language, shard)
+    if profiler is not None:
+        logging.info(profiler.summary(f"Profile of {label} ({elapsed:.1f}s wall time):"))
+        if options.profile_dir is not None:
+            profiler.dump(options.profile_dir, language, shard)
+    return processed
+
+
+def _drop_outdated(writer: ResultWriter, clip_records: ClipManifest, clips_dir: Path, options: ExtractionOptions) -> ClipManifest:
+    """
+    Drop the rows of clips that changed or were removed since they were extracted, returning the sources of the rows kept.
+
+    Every row is dropped if the table was extracted with other settings or without a
+    record of its clips. Only the clips with a row are looked at, and a clip is only
+    hashed again if it changed on disk since the language's clip manifest recorded it.
+    Clips the clip manifest does not know, e.g. in a corpus unpacked before it existed,
+    fall back to the records of the table, so they are not hashed again on every run.
+    """
+    path = sources_path(writer.output_path)
+    sources = ClipManifest.load(path)
+    for clip, record in sources.records.items():
+        clip_records.records.setdefault(clip, record)
+    current = ClipManifest(path, info=options.output_settings())
+    if not writer.completed:
+        return current
+
+    if not path.exists():
+        logging.warning(f"{writer.output_path} has no record of the clips it was extracted from, extracting every clip again")
+        outdated = set(writer.completed)
+    elif sources.info != options.output_settings():
+        logging.warning(f"{writer.output_path} was extracted with other features or settings, extracting every clip again")
+        outdated = set(writer.completed)
+    else:
+        outdated = set()
+        for clip in writer.completed:
+            record = clip_records.current_record(clip, clips_dir)
+            if record is None or record.digest != sources.digest(clip):
+                outdated.add(clip)
+            else:
+                current.records[clip] = record
+    writer.drop(outdated)
+    return current
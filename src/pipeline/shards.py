@@ -0,0 +1,121 @@
+import logging
+from pathlib import Path
+from collections.abc import Iterable
+from pipeline.clip_manifest import ClipManifest, sources_path
+from pipeline.frame_store import frame_store_path, merge_frame_stores
+from pipeline.spectrum import SpectrumProfile, spectrum_path
+from pipeline.writer import complete_path, create_writer, feature_table_path, manifest_path, read_manifest
+
+# How many offending clip paths are named in a log message or error.
+MAX_REPORTED_CLIPS = 10
+
+
+def merge_shards(
+    destination: Path,
+    language: str,
+    output_format: str,
+    shard_count: int,
+    expected: Iterable[str] | None = None,
+    allow_incomplete: bool = False,
+    strict: bool = False,
+) -> int:
+    """
+    Combine the shard tables of a language into its final feature table and return the number of clips in it.
+
+    Only committed rows of each shard are merged. Every shard must exist and have finished
+    unless `allow_incomplete` is set, and a clip written by more than one shard is always an
+    error. When `expected` holds the clip paths the shards were cut from, clips missing from
+    the shards (usually clips that failed to load) or not expected at all are reported, and
+    with `strict` they are an error too. Nothing is written when a check fails.
+
+    Spectrum profiles, frame stores and the sources of incremental extraction written by
+    the shards are merged as well.
+    """
+    shards = []
+    spectrum_paths = []
+    frame_stores = []
+    problems = []
+    for index in range(shard_count):
+        spectrum_paths.append(spectrum_path(destination, language, (index, shard_count)))
+        frame_stores.append(frame_store_path(destination, language, (index, shard_count)))
+        shard_path = feature_table_path(output_format, destination, language, (index, shard_count))
+        if not manifest_path(shard_path).exists():
+            problems.append(f"shard {index} ({shard_path.name}) is missing")
+            continue
+        if not complete_path(shard_path).exists():
+            problems.append(f"shard {index} ({shard_path.name}) did not finish")
+        shards.append((shard_path, read_manifest(manifest_path(shard_path))))
+
+    if problems and not allow_incomplete:
+        raise ValueError(f"Cannot merge the shards of {language}: {'; '.join(problems)}")
+    for problem in problems:
+        logging.warning(f"Merging {language} anyway: {problem}")
+
+    owners: dict[str, int] = {}
+    duplicates = []
+    for index, (_, manifest) in enumerate(shards):
+        for path in manifest.paths:
+            if path in owners:
+                duplicates.append(path)
+            owners[path] = index
+    if duplicates:
+        raise ValueError(
+            f"{len(duplicates)} clips of {language} were written more than once, e.g. {', '.join(duplicates[:MAX_REPORTED_CLIPS])}"
+        )
+
+    if expected is not None:
+        expected_paths = set(expected)
+        missing = sorted(expected_paths - owners.keys())
+        unexpected = sorted(owners.keys() - expected_paths)
+        if missing:
+            logging.warning(f"{len(missing)} clips of {language} are missing from the shards, e.g. {', '.join(missing[:MAX_REPORTED_CLIPS])}")
+        if unexpected:
+            logging.warning(f"{len(unexpected)} clips of {language} in the shards were not expected, e.g. {', '.join(unexpected[:MAX_REPORTED_CLIPS])}")
+        if strict and (missing or unexpected):
+            raise ValueError(f"The shards of {language} do not match the expected clips")
+
+    with create_writer(output_format, destination, language) as writer:
+        for shard_path, manifest in shards:
+            writer.append_committed(shard_path, manifest)
+        writer.mark_complete()
+
+    logging.info(f"Merged {len(shards)} shards of {language} into {writer.output_path} ({len(owners)} clips)")
+    _merge_sources([shard_path for shard_path, _ in shards], writer.output_path, language)
+
+    spectra = [path for path in spectrum_paths if path.exists()]
+    if spectra and len(spectra) < len(shards):
+        logging.warning(f"Not merging the spectrum profiles of {language}: only {len(spectra)} of {len(shards)} shards wrote one")
+    elif spectra:
+        spectrum = SpectrumProfile()
+        for path in spectra:
+            spectrum.merge(SpectrumProfile.load(path).groups)
+        spectrum.dump(destination, language)
+
+    stores = [path for path in frame_stores if path.exists()]
+    if stores and len(stores) < len(shards):
+        logging.warning(f"Not merging the frame stores of {language}: only {len(stores)} of {len(shards)} shards wrote one")
+    elif stores:
+        merge_frame_stores(stores, frame_store_path(destination, language))
+    return len(owners)
+
+
+def _merge_sources(shard_paths: list[Path], output_path: Path, language: str) -> None:
+    """Record the union of the shards' sources next to the merged table, so `--incremental` can update it."""
+    merged_path = sources_path(output_path)
+    merged_path.unlink(missing_ok=True)
+    paths = [sources_path(shard_path) for shard_path in shard_paths]
+    present = [path for path in paths if path.exists()]
+    if not present:
+        return
+    if len(present) < len(paths):
+        logging.warning(f"Not merging the sources of {language}: only {len(present)} of {len(paths)} shards were extracted with --incremental")
+        return
+
+    shard_sources = [ClipManifest.load(path) for path in present]
+    if any(sources.info != shard_sources[0].info for sources in shard_sources):
+        logging.warning(f"Not merging the sources of {language}: the shards were extracted with different settings")
+        return
+    merged = ClipManifest(merged_path, info=shard_sources[0].info)
+    for sources in shard_sources:
+        merged.records.update(sources.records)
+    merged.save()
@@ -0,0 +1,220 @@
+import json
+import logging
+import threading
+import numpy as np
+from pathlib import Path
+from feature_extraction.analysis import AudioAnalysis, N_FFT
+from pipeline.metadata import ClipTask
+
+# Edges of the bands whose per-frame level is tracked: everything below 125 Hz, then third octaves up to 16 kHz.
+# Every band is wider than one STFT bin up to 48 kHz, and bands above a clip's Nyquist frequency are left out for it.
+BAND_EDGES_HZ = np.concatenate([[0.0], np.geomspace(125.0, 16000.0, 22)])
+# Frequency grid of the long-term average spectrum, shared by clips of every sample rate.
+LTAS_BIN_HZ = 31.25
+LTAS_MAX_HZ = 16000.0
+# Band levels below the first edge or above the last one are counted in the outermost histogram bins.
+HISTOGRAM_EDGES_DB = np.arange(-120.0, 1.0, 1.0)
+LEVEL_FLOOR = 1e-12
+# Turns the power of STFT bins into mean-square amplitude, so levels do not depend on the sample rate.
+POWER_SCALE = 2.0 / (N_FFT * np.sum(np.hanning(N_FFT + 1)[:-1] ** 2))
+
+# (gender, age) of the clips aggregated together
+Group = tuple[str, str]
+
+
+class BandStatistics:
+    """
+    Running statistics of the spectrum of a group of clips, mergeable exactly.
+
+    For every band, the level in dB of each STFT frame goes into a Welford mean and
+    variance and into a fixed-bin histogram; the long-term average spectrum is kept as the
+    sum of frame powers and the number of frames of every grid bin. Merging partial
+    statistics gives the same result as one pass over all clips.
+    """
+
+    def __init__(self):
+        bands = len(BAND_EDGES_HZ) - 1
+        self.clips = 0
+        self.frames = np.zeros(bands, dtype=np.int64)
+        self.mean_db = np.zeros(bands)
+        self.m2_db = np.zeros(bands)
+        self.histogram = np.zeros((bands, len(HISTOGRAM_EDGES_DB) - 1), dtype=np.int64)
+        self.ltas_power = np.zeros(int(LTAS_MAX_HZ / LTAS_BIN_HZ))
+        self.ltas_frames = np.zeros(int(LTAS_MAX_HZ / LTAS_BIN_HZ), dtype=np.int64)
+
+    def add(self, levels_db: np.ndarray, ltas_power: np.ndarray, n_frames: int) -> None:
+        """Add one clip: its band levels shaped (bands, frames) with NaN rows for unavailable bands, and its summed power per grid bin."""
+        available = ~np.isnan(levels_db[:, 0])
+        clip = BandStatistics()
+        clip.clips = 1
+        clip.frames[available] = n_frames
+        clip.mean_db[available] = levels_db[available].mean(axis=1)
+        clip.m2_db[available] = ((levels_db[available] - clip.mean_db[available, None]) ** 2).sum(axis=1)
+
+        bins = len(HISTOGRAM_EDGES_DB) - 1
+        indices = np.clip(np.floor((levels_db[available] - HISTOGRAM_EDGES_DB[0]) / (HISTOGRAM_EDGES_DB[1] - HISTOGRAM_EDGES_DB[0])), 0, bins - 1).astype(np.int64)
+        offsets = np.flatnonzero(available)[:, None] * bins
+        clip.histogram += np.bincount((indices + offsets).ravel(), minlength=clip.histogram.size).reshape(clip.histogram.shape)
+
+        covered = ~np.isnan(ltas_power)
+        clip.ltas_power[covered] = ltas_power[covered]
+        clip.ltas_frames[covered] = n_frames
+        self.merge(clip)
+
+    def merge(self, other: "BandStatistics") -> None:
+        """Combine with another partial result, using Chan et al.'s update of the mean and variance."""
+        frames = self.frames + other.frames
+        delta = other.mean_db - self.mean_db
+        share = np.divide(other.frames, frames, out=np.zeros(len(frames)), where=frames > 0)
+        self.mean_db = self.mean_db + delta * share
+        self.m2_db = self.m2_db + other.m2_db + delta**2 * self.frames * share
+        self.frames = frames
+        self.clips += other.clips
+        self.histogram += other.histogram
+        self.ltas_power += other.ltas_power
+        self.ltas_frames += other.ltas_frames
+
+    @property
+    def var_db(self) -> np.ndarray:
+        return np.divide(self.m2_db, self.frames, out=np.zeros(len(self.frames)), where=self.frames > 0)
+
+    @property
+    def ltas_db(self) -> np.ndarray:
+        """Long-term average spectrum as power spectral density in dB, NaN where no clip reached the grid bin."""
+        density = np.divide(self.ltas_power, self.ltas_frames * LTAS_BIN_HZ, out=np.full(len(self.ltas_power), np.nan), where=self.ltas_frames > 0)
+        return 10 * np.log10(np.maximum(density, LEVEL_FLOOR))
+
+    def to_dict(self) -> dict:
+        return {
+            "clips": self.clips,
+            "frames": self.frames.tolist(),
+            "mean_db": _nullable(self.mean_db, self.frames > 0),
+            "var_db": _nullable(self.var_db, self.frames > 0),
+            "m2_db": self.m2_db.tolist(),
+            "histogram": self.histogram.tolist(),
+            "ltas_db": _nullable(self.ltas_db, self.ltas_frames > 0),
+            "ltas_power": self.ltas_power.tolist(),
+            "ltas_frames": self.ltas_frames.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BandStatistics":
+        statistics = cls()
+        statistics.clips = data["clips"]
+        statistics.frames = np.asarray(data["frames"], dtype=np.int64)
+        statistics.mean_db = np.asarray([value or 0.0 for value in data["mean_db"]])
+        statistics.m2_db = np.asarray(data["m2_db"])
+        statistics.histogram = np.asarray(data["histogram"], dtype=np.int64)
+        statistics.ltas_power = np.asarray(data["ltas_power"])
+        statistics.ltas_frames = np.asarray(data["ltas_frames"], dtype=np.int64)
+        return statistics
+
+
+class SpectrumProfile:
+    """
+    Long-term spectrum and band-level profile of a language, grouped by gender and age.
+
+    Clips are added as their analysis is built, so the profile is complete once extraction
+    finishes and memory does not grow with the number of clips. Process workers keep their
+    own profile and send its `drain()` snapshot back with their results, where it is merged
+    into the profile of the run.
+    """
+
+    def __init__(self):
+        self.groups: dict[Group, BandStatistics] = {}
+        self._bins: dict[float, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, clip: ClipTask, analysis: AudioAnalysis) -> None:
+        band_starts, band_ends, ltas_starts, ltas_ends = self._frequency_bins(analysis.sr)
+        power = analysis.power
+        if power.shape[1] == 0:
+            return
+
+        cumulative = np.zeros((power.shape[0] + 1, power.shape[1]))
+        np.cumsum(power, axis=0, dtype=np.float64, out=cumulative[1:])
+        band_power = POWER_SCALE * (cumulative[band_ends] - cumulative[band_starts])
+        levels_db = 10 * np.log10(np.maximum(band_power, LEVEL_FLOOR))
+        levels_db[band_ends <= band_starts] = np.nan
+
+        total_power = np.concatenate([[0.0], np.cumsum(power.sum(axis=1, dtype=np.float64))])
+        ltas_power = POWER_SCALE * (total_power[ltas_ends] - total_power[ltas_starts])
+        ltas_power[ltas_ends <= ltas_starts] = np.nan
+
+        with self._lock:
+            statistics = self.groups.get((clip[1], clip[2]))
+            if statistics is None:
+                statistics = self.groups[(clip[1], clip[2])] = BandStatistics()
+            statistics.add(levels_db, ltas_power, power.shape[1])
+
+    def _frequency_bins(self, sr: float) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """STFT bin ranges of every band and grid bin at a sample rate; ranges above the Nyquist frequency are empty."""
+        bins = self._bins.get(sr)
+        if bins is None:
+            frequencies = np.fft.rfftfreq(N_FFT, 1 / sr)
+            ltas_edges = np.arange(0.0, LTAS_MAX_HZ + LTAS_BIN_HZ, LTAS_BIN_HZ)
+            bins = []
+            for edges in (BAND_EDGES_HZ, ltas_edges):
+                starts = np.searchsorted(frequencies, edges[:-1])
+                ends = np.searchsorted(frequencies, edges[1:])
+                ends[edges[1:] > sr / 2] = starts[edges[1:] > sr / 2]
+                bins += [starts, ends]
+            bins = self._bins[sr] = tuple(bins)
+        return bins
+
+    def drain(self) -> dict[Group, BandStatistics]:
+        """Return everything added so far and start over."""
+        with self._lock:
+            groups, self.groups = self.groups, {}
+        return groups
+
+    def merge(self, groups: dict[Group, BandStatistics]) -> None:
+        with self._lock:
+            for group, statistics in groups.items():
+                if group in self.groups:
+                    self.groups[group].merge(statistics)
+                else:
+                    self.groups[group] = statistics
+
+    def total(self) -> BandStatistics:
+        total = BandStatistics()
+        for statistics in self.groups.values():
+            total.merge(statistics)
+        return total
+
+    def dump(self, output_dir: Path, language: str, shard: tuple[int, int] | None = None) -> Path:
+        """Write `{language}_spectrum.json` with every group and their total, with a shard suffix for sharded runs."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = spectrum_path(output_dir, language, shard)
+        data = {
+            "language": language,
+            "shard": list(shard) if shard is not None else None,
+            "band_edges_hz": BAND_EDGES_HZ.tolist(),
+            "ltas_bin_hz": LTAS_BIN_HZ,
+            "histogram_edges_db": HISTOGRAM_EDGES_DB.tolist(),
+            "groups": [
+                {"gender": gender, "age": age, **statistics.to_dict()}
+                for (gender, age), statistics in sorted(self.groups.items())
+            ],
+            "total": self.total().to_dict(),
+        }
+        path.write_text(json.dumps(data))
+        logging.info(f"Saved spectrum profile of {language} ({self.total().clips} clips in {len(self.groups)} groups) to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "SpectrumProfile":
+        profile = cls()
+        for group in json.loads(path.read_text())["groups"]:
+            profile.groups[(group["gender"], group["age"])] = BandStatistics.from_dict(group)
+        return profile
+
+
+def spectrum_path(output_dir: Path, language: str, shard: tuple[int, int] | None = None) -> Path:
+    if shard is None:
+        return output_dir / f"{language}_spectrum.json"
+    return output_dir / f"{language}_spectrum.shard-{shard[0]:04d}-of-{shard[1]:04d}.json"
+
+
+def _nullable(values: np.ndarray, present: np.ndarray) -> list[float | None]:
+    return [float(value) if is_present else None for value, is_present in zip(values, present)]
@@ -0,0 +1,495 @@
+import logging
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from collections.abc import Callable
+from pipeline.options import OUTPUT_FORMATS
+
+COMMIT_MARKER = "#commit "
+METADATA_COLUMNS = ("path", "gender", "age")
+CATEGORICAL_COLUMNS = ("gender", "age")
+STRING_COLUMNS = ("path", "error")
+
+
+@dataclass
+class Manifest:
+    """Committed state of an output: its clip paths, the output checkpoint and the manifest bytes covering them."""
+
+    paths: list[str] = field(default_factory=list)
+    checkpoint: int = 0
+    size: int = 0
+
+
+def read_manifest(manifest_path: Path) -> Manifest:
+    """Read the committed part of a manifest; paths after the last commit line belong to an unfinished batch and are ignored."""
+    manifest = Manifest()
+    pending: list[str] = []
+
+    with open(manifest_path, "rb") as lines:
+        for line in lines:
+            if not line.endswith(b"\n"):
+                break
+            entry = line.decode().rstrip("\n")
+            if entry.startswith(COMMIT_MARKER):
+                manifest.checkpoint = int(entry[len(COMMIT_MARKER):])
+                manifest.size = lines.tell()
+                manifest.paths.extend(pending)
+                pending.clear()
+            else:
+                pending.append(entry)
+    return manifest
+
+
+class ResultWriter:
+    """
+    Append clip results to a feature table in batches, checkpointing finished clips.
+
+    Every flushed batch is appended to the output, synced to disk and then recorded in a
+    manifest next to it: the batch's clip paths followed by a commit line holding an
+    output checkpoint. On resume, anything written after the last commit is rolled back,
+    so a crash never leaves partial or duplicated rows behind. A finished run is marked by
+    a `.complete` file next to the manifest.
+
+    This base writer produces CSV, with vector features stored as they are rendered by pandas.
+    """
+
+    def __init__(self, output_path: Path, batch_size: int = 1000, resume: bool = False):
+        self.output_path = output_path
+        self.manifest_path = manifest_path(output_path)
+        self.complete_path = complete_path(output_path)
+        self.batch_size = batch_size
+        self.columns: list[str] | None = None
+        self.completed: set[str] = set()
+        self._batch: list[dict] = []
+        # Called before every flush, to commit data the rows refer to (such as stored frames) before the rows themselves.
+        self.before_flush: Callable[[], None] | None = None
+        self.complete_path.unlink(missing_ok=True)
+
+        if resume and self.manifest_path.exists() and self.output_path.exists():
+            self._restore_checkpoint()
+        else:
+            if resume:
+                logging.warning(f"No checkpoint found for {output_path}, starting from scratch")
+            self._reset_output()
+            self.manifest_path.unlink(missing_ok=True)
+
+    def _restore_checkpoint(self) -> None:
+        manifest = read_manifest(self.manifest_path)
+        self.completed.update(manifest.paths)
+
+        os.truncate(self.manifest_path, manifest.size)
+        self._rollback(manifest.checkpoint)
+
+        if manifest.checkpoint > 0:
+            self.columns = self._read_columns()
+
+        logging.info(f"Resuming {self.output_path}: {len(self.completed)} clips already extracted")
+
+    def write(self, result: dict) -> None:
+        self._batch.append(self._prepare(result))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        if self.before_flush is not None:
+            self.before_flush()
+
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(key for result in self._batch for key in result))
+        else:
+            known = set(self.columns)
+            new_columns = list(dict.fromkeys(key for result in self._batch for key in result if key not in known))
+            if new_columns:
+                self._add_columns(new_columns)
+
+        self._append_rows(self._batch)
+        self._commit([result["path"] for result in self._batch])
+        self._batch.clear()
+
+    def append_committed(self, source: Path, manifest: Manifest) -> None:
+        """
+        Append the committed rows of another output of the same format, such as a shard, and commit them.
+
+        When the other output has other columns, the columns missing here are added and its
+        rows are converted, with empty values in the columns they do not have.
+        """
+        self.flush()
+        if manifest.checkpoint == 0:
+            return
+        self._copy_committed(source, manifest.checkpoint)
+        self._commit(manifest.paths)
+
+    def drop(self, paths: set[str]) -> None:
+        """
+        Rewrite the committed output without the rows of `paths`, e.g. clips whose audio changed since they were extracted.
+        """
+        self.flush()
+        if not self.completed & paths:
+            return
+
+        kept = [path for path in read_manifest(self.manifest_path).paths if path not in paths]
+        self.completed.clear()
+        if not kept:
+            # Nothing left, so the next rows may have other columns.
+            self.manifest_path.unlink()
+            self._reset_output()
+            self.columns = None
+            logging.info(f"Dropped every row of {self.output_path}")
+            return
+
+        self._rewrite(paths, kept)
+        logging.info(f"Dropped the rows of {len(paths)} clips from {self.output_path}, {len(kept)} rows kept")
+
+    def mark_complete(self) -> None:
+        self.flush()
+        self.complete_path.touch()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _add_columns(self, columns: list[str]) -> None:
+        """Add columns that first appear after rows were written, e.g. `error`; the committed rows are rewritten with them empty."""
+        assert self.columns is not None
+        self.columns = self.columns + columns
+        committed = read_manifest(self.manifest_path).paths if self.manifest_path.exists() else []
+        if committed:
+            self._rewrite(set(), committed)
+        logging.info(f"Added columns {columns} to {self.output_path}")
+
+    def _rewrite(self, dropped: set[str], kept: list[str]) -> None:
+        """
+        Replace the committed output with a copy in the current columns, without the rows of `dropped`.
+
+        The manifest is emptied before the output is replaced and committed again after, so
+        an interruption loses the checkpoint rather than leaving it pointing at other rows.
+        """
+        tmp_path = self.output_path.with_name(f".{self.output_path.name}.tmp")
+        self._write_without(dropped, tmp_path)
+        os.truncate(self.manifest_path, 0)
+        self._replace_output(tmp_path)
+        self._commit(kept)
+
+    def _commit(self, paths: list[str]) -> None:
+        with open(self.manifest_path, "a") as manifest:
+            manifest.writelines(f"{path}\n" for path in paths)
+            manifest.write(f"{COMMIT_MARKER}{self._checkpoint()}\n")
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+        self.completed.update(paths)
+
+    def _prepare(self, result: dict) -> dict:
+        return result
+
+    def _reset_output(self) -> None:
+        self.output_path.unlink(missing_ok=True)
+
+    def _rollback(self, checkpoint: int) -> None:
+        os.truncate(self.output_path, checkpoint)
+
+    def _checkpoint(self) -> int:
+        return self.output_path.stat().st_size
+
+    def _read_columns(self) -> list[str]:
+        return list(pd.read_csv(self.output_path, nrows=0).columns)
+
+    def _append_rows(self, rows: list[dict]) -> None:
+        write_header = not self.output_path.exists() or self.output_path.stat().st_size == 0
+        with open(self.output_path, "a", newline="") as output:
+            pd.DataFrame(rows, columns=self.columns).to_csv(output, header=write_header, index=False)
+            output.flush()
+            os.fsync(output.fileno())
+
+    def _write_without(self, paths: set[str], tmp_path: Path) -> None:
+        # Values are copied as text, so kept rows are written back exactly as they were.
+        with open(tmp_path, "w", newline="") as output:
+            pd.DataFrame(columns=self.columns).to_csv(output, index=False)
+            for rows in pd.read_csv(self.output_path, dtype=str, keep_default_na=False, chunksize=100_000):
+                rows[~rows["path"].isin(paths)].reindex(columns=self.columns).to_csv(output, header=False, index=False)
+            output.flush()
+            os.fsync(output.fileno())
+
+    def _replace_output(self, tmp_path: Path) -> None:
+        os.replace(tmp_path, self.output_path)
+
+    def _copy_committed(self, source: Path, checkpoint: int) -> None:
+        columns = list(pd.read_csv(source, nrows=0).columns)
+        if self.columns is not None and columns != self.columns:
+            self._copy_converted(source, columns)
+            return
+
+        with open(source, "rb") as rows:
+            header = rows.readline()
+            with open(self.output_path, "ab") as output:
+                if self.columns is None:
+                    output.write(header)
+                    self.columns = columns
+                remaining = checkpoint - rows.tell()
+                while remaining > 0:
+                    block = rows.read(min(remaining, 1 << 20))
+                    if not block:
+                        raise ValueError(f"{source} is shorter than its manifest checkpoint")
+                    output.write(block)
+                    remaining -= len(block)
+                output.flush()
+                os.fsync(output.fileno())
+
+    def _copy_converted(self, source: Path, columns: list[str]) -> None:
+        """Append the committed rows of an output with other columns, e.g. a shard where some clips failed, in the columns of this one."""
+        assert self.columns is not None
+        known = set(self.columns)
+        new_columns = [column for column in columns if column not in known]
+        if new_columns:
+            self._add_columns(new_columns)
+        n_rows = len(read_manifest(manifest_path(source)).paths)
+        with open(self.output_path, "a", newline="") as output:
+            for rows in pd.read_csv(source, dtype=str, keep_default_na=False, nrows=n_rows, chunksize=100_000):
+                rows.reindex(columns=self.columns).to_csv(output, header=False, index=False)
+            output.flush()
+            os.fsync(output.fileno())
+
+
+class PartitionedResultWriter(ResultWriter, ABC):
+    """
+    Write results as a directory of typed columnar part files, one per flushed batch.
+
+    Vector features are expanded into one float32 column per element (`mfcc_mean_0`, ...),
+    `gender` and `age` are dictionary encoded so they load as pandas categoricals. The
+    schema comes from the first batch; columns that appear later are added to every part,
+    so all parts share one schema. The checkpoint is the number of committed parts.
+    """
+
+    suffix: str
+
+    def _prepare(self, result: dict) -> dict:
+        return flatten_result(result)
+
+    def _part_path(self, index: int) -> Path:
+        return self.output_path / f"part-{index:05d}{self.suffix}"
+
+    def _parts(self) -> list[Path]:
+        return sorted(self.output_path.glob(f"part-*{self.suffix}"))
+
+    def _reset_output(self) -> None:
+        if self.output_path.exists():
+            shutil.rmtree(self.output_path)
+
+    def _rollback(self, checkpoint: int) -> None:
+        for part in self._parts()[checkpoint:]:
+            part.unlink()
+
+    def _checkpoint(self) -> int:
+        return len(self._parts())
+
+    def _read_columns(self) -> list[str]:
+        return self._read_schema(self._parts()[0]).names
+
+    def _append_rows(self, rows: list[dict]) -> None:
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=build_schema(self.columns))
+
+        part_path = self._part_path(self._checkpoint())
+        tmp_path = part_path.with_name(f".{part_path.name}.tmp")
+        self._write_table(table, tmp_path)
+        with open(tmp_path, "rb") as part:
+            os.fsync(part.fileno())
+        tmp_path.rename(part_path)
+
+    def _write_without(self, paths: set[str], tmp_path: Path) -> None:
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        dropped = pa.array(sorted(paths), pa.string())
+        schema = build_schema(self.columns)
+        index = 0
+        for part in self._parts():
+            table = self._read_table(part)
+            table = table.filter(pc.invert(pc.is_in(table["path"], value_set=dropped)))
+            if table.num_rows == 0:
+                continue
+            part_path = tmp_path / f"part-{index:05d}{self.suffix}"
+            self._write_table(conform_table(table, schema), part_path)
+            with open(part_path, "rb") as written:
+                os.fsync(written.fileno())
+            index += 1
+
+    def _replace_output(self, tmp_path: Path) -> None:
+        old_path = self.output_path.with_name(f".{self.output_path.name}.old")
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        self.output_path.rename(old_path)
+        tmp_path.rename(self.output_path)
+        shutil.rmtree(old_path)
+
+    def _copy_committed(self, source: Path, checkpoint: int) -> None:
+        parts = sorted(source.glob(f"part-*{self.suffix}"))[:checkpoint]
+        if len(parts) < checkpoint:
+            raise ValueError(f"{source} has fewer parts than its manifest checkpoint")
+
+        columns = self._read_schema(parts[0]).names
+        if self.columns is None:
+            self.columns = columns
+        known = set(self.columns)
+        new_columns = [column for column in columns if column not in known]
+        if new_columns:
+            self._add_columns(new_columns)
+
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        schema = build_schema(self.columns)
+        for part in parts:
+            part_path = self._part_path(self._checkpoint())
+            tmp_path = part_path.with_name(f".{part_path.name}.tmp")
+            if columns == self.columns:
+                shutil.copyfile(part, tmp_path)
+            else:
+                # Parts of a source with other columns are rewritten in the schema of this output.
+                self._write_table(conform_table(self._read_table(part), schema), tmp_path)
+            with open(tmp_path, "rb") as copy:
+                os.fsync(copy.fileno())
+            tmp_path.rename(part_path)
+
+    @abstractmethod
+    def _read_schema(self, path: Path) -> pa.Schema:
+        pass
+
+    @abstractmethod
+    def _read_table(self, path: Path) -> pa.Table:
+        pass
+
+    @abstractmethod
+    def _write_table(self, table: pa.Table, path: Path) -> None:
+        pass
+
+
+class ParquetResultWriter(PartitionedResultWriter):
+    suffix = ".parquet"
+
+    def _read_schema(self, path: Path) -> pa.Schema:
+        return pq.read_schema(path)
+
+    def _read_table(self, path: Path) -> pa.Table:
+        return pq.read_table(path)
+
+    def _write_table(self, table: pa.Table, path: Path) -> None:
+        pq.write_table(table, path, compression="zstd")
+
+
+class ArrowResultWriter(PartitionedResultWriter):
+    suffix = ".arrow"
+
+    def _read_schema(self, path: Path) -> pa.Schema:
+        with pa.memory_map(str(path)) as source:
+            return pa.ipc.open_file(source).schema
+
+    def _read_table(self, path: Path) -> pa.Table:
+        return feather.read_table(path, memory_map=False)
+
+    def _write_table(self, table: pa.Table, path: Path) -> None:
+        feather.write_feather(table, path, compression="lz4")
+
+
+def flatten_result(result: dict) -> dict:
+    """Expand vector features into one float32 value per element, named `{feature}_{index}`."""
+    flat = {}
+    for key, value in result.items():
+        if key in METADATA_COLUMNS or key in STRING_COLUMNS:
+            flat[key] = value
+        elif isinstance(value, np.ndarray) and value.ndim > 0:
+            for index, element in enumerate(value.astype(np.float32).ravel()):
+                flat[f"{key}_{index}"] = float(element)
+        else:
+            flat[key] = float(np.float32(value))
+    return flat
+
+
+def build_schema(columns: list[str]) -> pa.Schema:
+    fields = []
+    for column in columns:
+        if column in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in STRING_COLUMNS:
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.field(column, pa.float32()))
+    return pa.schema(fields)
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Arrange a table in the columns of `schema`, with nulls in the columns it does not have."""
+    columns = [
+        table[field.name].cast(field.type) if field.name in table.column_names else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def manifest_path(output_path: Path) -> Path:
+    return output_path.with_name(f"{output_path.name}.manifest")
+
+
+def complete_path(output_path: Path) -> Path:
+    return output_path.with_name(f"{output_path.name}.complete")
+
+
+def feature_table_path(output_format: str, destination: Path, language: str, shard: tuple[int, int] | None = None) -> Path:
+    """Path of a language's feature table, or of one shard of it as (shard index, shard count)."""
+    if shard is None:
+        return destination / f"{language}_features.{output_format}"
+    index, count = shard
+    return destination / f"{language}_features.shard-{index:04d}-of-{count:04d}.{output_format}"
+
+
+def read_feature_table(output_path: Path) -> pd.DataFrame:
+    """
+    Load the committed rows of a feature table in any output format.
+
+    Parquet and Arrow tables are read as a `pyarrow.dataset` of their committed part files,
+    so a batch that was being written when a run stopped is left out, like in a CSV table.
+    """
+    manifest = read_manifest(manifest_path(output_path))
+    output_format = output_path.suffix[1:]
+    if output_format == "csv":
+        return pd.read_csv(output_path, nrows=len(manifest.paths))
+
+    parts = sorted(output_path.glob(f"part-*.{output_format}"))[:manifest.checkpoint]
+    dataset = ds.dataset([str(part) for part in parts], format="parquet" if output_format == "parquet" else "ipc")
+    return dataset.to_table().to_pandas()
+
+
+def create_writer(
+    output_format: str,
+    destination: Path,
+    language: str,
+    batch_size: int = 1000,
+    resume: bool = False,
+    shard: tuple[int, int] | None = None,
+) -> ResultWriter:
+    """Create the result writer for a language's feature table, or one shard of it, in the requested format."""
+    writers = {
+        "csv": ResultWriter,
+        "parquet": ParquetResultWriter,
+        "arrow": ArrowResultWriter,
+    }
+    if output_format not in writers:
+        raise ValueError(f"Unknown output format: {output_format}. Available formats: {', '.join(OUTPUT_FORMATS)}")
+
+    output_path = feature_table_path(output_format, destination, language, shard)
+    return writers[output_format](output_path, batch_size=batch_size, resume=resume)
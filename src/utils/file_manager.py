@@ -1,7 +1,6 @@
 import logging
 import tarfile
 import shutil
-import pandas as pd
 from pathlib import Path
 
 
@@ -0,0 +1,121 @@
+import http.server
+import re
+import sys
+import threading
+import urllib.parse
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile
+
+# The pipeline packages are imported relative to src, like the scripts in it do.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from benchmarking.synthetic import synthesize_clip  # noqa: E402
+
+
+@pytest.fixture
+def clips_dir(tmp_path: Path) -> Path:
+    """Synthetic speech-like clips of several lengths and sample rates, as WAV files."""
+    directory = tmp_path / "clips"
+    directory.mkdir()
+    settings = [(0.6, 16000), (0.9, 16000), (1.3, 16000), (0.7, 22050), (1.1, 22050), (0.8, 48000)]
+    for i, (duration, sr) in enumerate(settings):
+        audio, _ = synthesize_clip(duration, sr, f0=100.0 + 25.0 * i, seed=i)
+        soundfile.write(directory / f"c{i}.wav", audio, sr)
+    return directory
+
+
+def clip_tasks(clips_dir: Path) -> list[tuple[str, str, str]]:
+    return [(path.name, "female", "twenties") for path in sorted(clips_dir.glob("*.wav"))]
+
+
+def assert_rows_close(expected: dict, actual: dict, rtol: float = 1e-4, atol: float = 1e-5) -> None:
+    assert "error" not in expected and "error" not in actual
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        if isinstance(value, str):
+            assert actual[key] == value, key
+        else:
+            np.testing.assert_allclose(actual[key], value, rtol=rtol, atol=atol, err_msg=key)
+
+
+class StandInServer:
+    """
+    Local HTTP server in a thread, standing in for the download and API servers.
+
+    `files` are served with Range support unless `ranges` is off, and responses are cut
+    off after `fail_after` bytes when it is set. `routes` answer other paths with a
+    callable returning (content type, body). Every request is logged as (path, Range header).
+    """
+
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self.routes: dict[str, object] = {}
+        self.ranges = True
+        self.fail_after: int | None = None
+        self.requests: list[tuple[str, str | None]] = []
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                path = urllib.parse.unquote(self.path.split("?")[0])
+                with server._lock:
+                    server.requests.append((path, self.headers.get("Range")))
+                if path in server.routes:
+                    content_type, body = server.routes[path]()
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if path not in server.files:
+                    self.send_error(404)
+                    return
+
+                data = server.files[path]
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+                if match and server.ranges:
+                    start = int(match[1])
+                    end = int(match[2]) if match[2] else len(data) - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                    self.send_header("ETag", '"v1"')
+                else:
+                    start, end = 0, len(data) - 1
+                    self.send_response(200)
+                body = data[start:end + 1]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.fail_after is not None and len(body) > server.fail_after:
+                    self.wfile.write(body[:server.fail_after])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server() -> Iterator[StandInServer]:
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.close()
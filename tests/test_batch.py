@@ -0,0 +1,29 @@
+from conftest import assert_rows_close, clip_tasks
+from feature_extraction.registry import get_available_extractors
+from pipeline.engine import ClipProcessor, ProcessorConfig
+from pipeline.profiling import Profiler
+
+
+def test_batch_results_match_per_clip_results(clips_dir):
+    config = ProcessorConfig(clips_dir=clips_dir, features=list(get_available_extractors()))
+    tasks = [(clip, None) for clip in clip_tasks(clips_dir)]
+
+    per_clip = ClipProcessor(config).process_chunk(tasks)
+    batched = ClipProcessor(config).process_batch(tasks)
+
+    assert len(batched) == len(per_clip)
+    for expected, actual in zip(per_clip, batched):
+        assert expected is not None and actual is not None
+        assert_rows_close(expected, actual)
+
+
+def test_batch_mode_profiles_the_same_stages(clips_dir):
+    config = ProcessorConfig(clips_dir=clips_dir, features=["mfcc", "zero_crossing"])
+    tasks = [(clip, None) for clip in clip_tasks(clips_dir)]
+
+    per_clip_profiler, batch_profiler = Profiler(), Profiler()
+    ClipProcessor(config, per_clip_profiler).process_chunk(tasks)
+    ClipProcessor(config, batch_profiler).process_batch(tasks)
+
+    assert set(batch_profiler.stages) == set(per_clip_profiler.stages)
+    assert batch_profiler.stages["assemble"].count == len(tasks)
@@ -0,0 +1,27 @@
+import sys
+
+import numpy as np
+import pytest
+from benchmarking.harness import StageMemory, compare_results
+
+
+def results(**metrics) -> dict:
+    return {"stages": {"process_clip": {"clips_per_sec": 10.0, **metrics}}}
+
+
+def test_compare_flags_p99_latency_regressions():
+    regressions = compare_results(results(latency_p99_ms=100.0), results(latency_p99_ms=150.0), tolerance=0.1)
+    assert regressions == ["process_clip latency_p99_ms: 100.00 -> 150.00 (+50.0%)"]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="the peak RSS of a stage can only be reset on Linux")
+def test_stage_memory_is_not_charged_for_an_earlier_peak():
+    with StageMemory() as heavy:
+        block = np.ones(256 * 2**20 // 8)
+        del block
+    with StageMemory() as light:
+        small = np.ones(16 * 2**20 // 8)
+        del small
+
+    assert heavy.delta_mb > 200
+    assert 8 < light.delta_mb < 100
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from conftest import assert_rows_close, clip_tasks
+from feature_extraction.registry import EXTRACTORS
+from pipeline import audio_cache
+from pipeline.audio_cache import AudioCache
+from pipeline.engine import ProcessorConfig, run_clips
+
+
+def count_decodes(monkeypatch) -> list[str]:
+    decoded = []
+    load = audio_cache.librosa.load
+    monkeypatch.setattr(audio_cache.librosa, "load", lambda path, **kwargs: decoded.append(path.name) or load(path, **kwargs))
+    return decoded
+
+
+def test_audio_cache_hit_returns_the_decoded_samples(clips_dir, tmp_path, monkeypatch):
+    decoded = count_decodes(monkeypatch)
+    first = AudioCache(tmp_path / "cache").load(clips_dir / "c0.wav", "c0.wav")
+    second = AudioCache(tmp_path / "cache").load(clips_dir / "c0.wav", "c0.wav")
+
+    assert decoded == ["c0.wav"]
+    assert second.sr == first.sr
+    np.testing.assert_array_equal(second.audio, first.audio)
+
+
+def test_audio_cache_decodes_a_modified_clip_again(clips_dir, tmp_path, monkeypatch):
+    decoded = count_decodes(monkeypatch)
+    AudioCache(tmp_path / "cache").load(clips_dir / "c0.wav", "c0.wav")
+    stat = (clips_dir / "c0.wav").stat()
+    os.utime(clips_dir / "c0.wav", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    AudioCache(tmp_path / "cache").load(clips_dir / "c0.wav", "c0.wav")
+    AudioCache(tmp_path / "cache").load(clips_dir / "c0.wav", "c0.wav")
+
+    assert decoded == ["c0.wav", "c0.wav"]
+
+
+def test_process_workers_fill_one_audio_cache(clips_dir, tmp_path):
+    config = ProcessorConfig(clips_dir=clips_dir, features=["zero_crossing"], audio_cache_dir=tmp_path / "cache")
+    tasks = clip_tasks(clips_dir)
+    first = list(run_clips(tasks, config, executor="process", workers=2))
+    second = list(run_clips(tasks, config, executor="process", workers=2))
+
+    assert first == second
+    with sqlite3.connect(tmp_path / "cache" / audio_cache.INDEX_NAME) as index:
+        assert index.execute("SELECT COUNT(*) FROM clips").fetchone()[0] == len(tasks)
+
+
+def count_extractions(monkeypatch, features: list[str]) -> list[str]:
+    extracted = []
+    for name in features:
+        extractor_class = EXTRACTORS[name].load()
+        extract = extractor_class.extract_from_analysis
+        monkeypatch.setattr(
+            extractor_class, "extract_from_analysis",
+            lambda self, analysis, name=name, extract=extract: extracted.append(name) or extract(self, analysis),
+        )
+    return extracted
+
+
+def test_feature_cache_hit_returns_the_computed_results(clips_dir, tmp_path, monkeypatch):
+    features = ["mfcc", "zero_crossing"]
+    config = ProcessorConfig(clips_dir=clips_dir, features=features, feature_cache_dir=tmp_path / "cache")
+    tasks = clip_tasks(clips_dir)
+    computed = list(run_clips(tasks, config, chunksize=4))
+
+    extracted = count_extractions(monkeypatch, features)
+    cached = list(run_clips(tasks, config, chunksize=4))
+    assert extracted == []
+    for expected, actual in zip(computed, cached):
+        assert_rows_close(expected, actual, rtol=0, atol=0)
+
+    stat = (clips_dir / "c2.wav").stat()
+    os.utime(clips_dir / "c2.wav", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    again = list(run_clips(tasks, config, chunksize=4))
+    assert sorted(extracted) == features
+    assert_rows_close(computed[2], again[2], rtol=0, atol=0)
+
+
+def test_feature_cache_only_computes_new_extractors(clips_dir, tmp_path, monkeypatch):
+    tasks = clip_tasks(clips_dir)
+    list(run_clips(tasks, ProcessorConfig(clips_dir=clips_dir, features=["zero_crossing"], feature_cache_dir=tmp_path / "cache")))
+
+    extracted = count_extractions(monkeypatch, ["mfcc", "zero_crossing"])
+    config = ProcessorConfig(clips_dir=clips_dir, features=["mfcc", "zero_crossing"], feature_cache_dir=tmp_path / "cache")
+    list(run_clips(tasks, config, chunksize=3))
+    assert extracted == ["mfcc"] * len(tasks)
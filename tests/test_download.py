@@ -0,0 +1,170 @@
+import io
+import json
+import random
+import tarfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+import download_data
+from downloader.api import CommonVoiceClient, ResponseCache
+from downloader.orchestrator import DownloadLimits, DownloadOrchestrator
+from downloader.streaming import StreamedClips, stream_clips
+from pipeline.options import ExtractionOptions
+from pipeline.runner import extract_clips
+from pipeline.writer import feature_table_path, read_feature_table
+
+TRANSLATIONS = "# Common Voice\n## Languages\nde = German\nen = English\nfr = French\n# [/]\n"
+LANGUAGES = ("de", "fr")
+CLIP_BYTES = 20_000
+VALIDATED_TSV = "path\tgender\tage\n".encode()
+
+
+def make_archive(language: str, n_clips: int) -> bytes:
+    """A dataset archive laid out like a Common Voice release."""
+    members = {f"cv-corpus/{language}/validated.tsv": VALIDATED_TSV}
+    for i in range(n_clips):
+        # Random bytes do not compress, like mp3 files, so the archive is about as large as its clips.
+        members[f"cv-corpus/{language}/clips/{language}_{i}.mp3"] = random.Random(f"{language}{i}").randbytes(CLIP_BYTES)
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def serve_json(value) -> object:
+    return lambda: ("application/json", json.dumps(value).encode())
+
+
+@pytest.fixture
+def api(server):
+    """The stand-in server answering the Common Voice endpoints, with one archive per language."""
+    server.routes["/api/v1/languages/en/translations"] = lambda: ("text/plain", TRANSLATIONS.encode())
+    for language in LANGUAGES:
+        archive = make_archive(language, 3)
+        server.files[f"/files/{language}.tar.gz"] = archive
+        server.routes[f"/api/v1/datasets/languages/{language}"] = serve_json(
+            [{"size": len(archive), "download_path": "cv-corpus/{locale}.tar.gz"}]
+        )
+        server.routes[f"/api/v1/bucket/dataset/cv-corpus/{language}.tar.gz"] = serve_json({"url": f"{server.url}/files/{language}.tar.gz"})
+    return server
+
+
+def api_requests(server, path: str) -> int:
+    return sum(1 for requested, _ in server.requests if requested == path)
+
+
+def test_cached_responses_skip_the_api(api, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl_seconds=3600)
+    for _ in range(2):
+        client = CommonVoiceClient(f"{api.url}/api/v1", cache)
+        assert client.list_languages() == {"de": "German", "en": "English", "fr": "French"}
+        assert client.language_datasets("de")[0]["download_path"] == "cv-corpus/{locale}.tar.gz"
+        client.download_url("cv-corpus/de.tar.gz")
+
+    assert api_requests(api, "/api/v1/languages/en/translations") == 1
+    assert api_requests(api, "/api/v1/datasets/languages/de") == 1
+    # Signed download URLs expire, so they are never cached.
+    assert api_requests(api, "/api/v1/bucket/dataset/cv-corpus/de.tar.gz") == 2
+
+
+def test_expired_and_refreshed_responses_are_requested_again(api, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    CommonVoiceClient(f"{api.url}/api/v1", ResponseCache(cache_dir, ttl_seconds=60)).list_languages()
+
+    CommonVoiceClient(f"{api.url}/api/v1", ResponseCache(cache_dir, ttl_seconds=60, refresh=True)).list_languages()
+    assert api_requests(api, "/api/v1/languages/en/translations") == 2
+
+    now = time.time()
+    monkeypatch.setattr("downloader.api.time.time", lambda: now + 120)
+    CommonVoiceClient(f"{api.url}/api/v1", ResponseCache(cache_dir, ttl_seconds=60)).list_languages()
+    assert api_requests(api, "/api/v1/languages/en/translations") == 3
+
+    CommonVoiceClient(f"{api.url}/api/v1", ResponseCache(cache_dir, ttl_seconds=0)).list_languages()
+    assert api_requests(api, "/api/v1/languages/en/translations") == 4
+
+
+def test_languages_are_downloaded_concurrently(api, tmp_path):
+    # Every download URL is only handed out once both languages asked for theirs, so a
+    # sequential orchestrator would fail both downloads.
+    barrier = threading.Barrier(len(LANGUAGES), timeout=10)
+    for language in LANGUAGES:
+        route = f"/api/v1/bucket/dataset/cv-corpus/{language}.tar.gz"
+        answer = api.routes[route]
+        api.routes[route] = lambda answer=answer: (barrier.wait(), answer())[1]
+
+    client = CommonVoiceClient(f"{api.url}/api/v1")
+    downloads = [download_data.select_dataset(language, 2**30, client) for language in LANGUAGES]
+    orchestrator = DownloadOrchestrator(
+        client, tmp_path / "zips", tmp_path / "raw", download_data.extract_files_from_tar, connections=2,
+        limits=DownloadLimits(parallel_downloads=2, untar_workers=2),
+    )
+    results = orchestrator.run(downloads)
+
+    assert results == {language: tmp_path / "raw" / language for language in LANGUAGES}
+    for language in LANGUAGES:
+        clips = sorted(path.name for path in (tmp_path / "raw" / language / "clips").iterdir())
+        assert clips == [f"{language}_{i}.mp3" for i in range(3)]
+        assert (tmp_path / "raw" / language / "validated.tsv").exists()
+    assert list((tmp_path / "zips").iterdir()) == []
+    # Only the unpacked files stay claimed once the archives are deleted.
+    assert orchestrator.disk.reserved == len(LANGUAGES) * (3 * CLIP_BYTES + len(VALIDATED_TSV))
+
+
+def test_unpacking_a_release_again_only_claims_what_it_writes(api, tmp_path):
+    client = CommonVoiceClient(f"{api.url}/api/v1")
+    downloads = [download_data.select_dataset(language, 2**30, client) for language in LANGUAGES]
+    for expected_bytes in (3 * CLIP_BYTES, 0):
+        orchestrator = DownloadOrchestrator(client, tmp_path / "zips", tmp_path / "raw", download_data.extract_files_from_tar)
+        orchestrator.run(downloads)
+        # Clips already unpacked from the previous release are not written again.
+        assert orchestrator.disk.reserved == len(LANGUAGES) * (expected_bytes + len(VALIDATED_TSV))
+
+
+def test_streamed_clips_are_extracted_before_validated_tsv_arrives(server, clips_dir, tmp_path, monkeypatch):
+    # Like real releases, the archive stores validated.tsv after the clips, and it leaves out c5.
+    # The clips keep their WAV contents under the .mp3 names validated.tsv lists.
+    genders = {f"c{i}.mp3": gender for i, gender in enumerate(["female", "male", "female", "male", "female"])}
+    validated_tsv = "path\tgender\tage\n" + "".join(f"{path}\t{gender}\tthirties\n" for path, gender in genders.items())
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for clip in sorted(clips_dir.iterdir()):
+            tar.add(clip, arcname=f"cv-corpus/en/clips/{clip.stem}.mp3")
+        info = tarfile.TarInfo("cv-corpus/en/validated.tsv")
+        info.size = len(validated_tsv)
+        tar.addfile(info, io.BytesIO(validated_tsv.encode()))
+    server.files["/files/en.tar.gz"] = buffer.getvalue()
+
+    # validated.tsv is only read once a clip has been handed to extraction, which would
+    # never happen if clips were held back until then.
+    handed_out = threading.Event()
+    waited: list[bool] = []
+    set_metadata = StreamedClips.set_metadata
+    monkeypatch.setattr(StreamedClips, "set_metadata", lambda self, path: (waited.append(handed_out.wait(10)), set_metadata(self, path)))
+    with requests.Session() as session:
+        clips, thread = stream_clips(f"{server.url}/files/en.tar.gz", tmp_path / "en", session, defer_metadata=True)
+
+        def tracked():
+            for clip in clips:
+                handed_out.set()
+                yield clip
+
+        destination = tmp_path / "features"
+        destination.mkdir()
+        options = ExtractionOptions(features=["pitch"], executor="process", workers=2)
+        processed = extract_clips("en", tracked(), tmp_path / "en" / "clips", destination, options, attach_metadata=clips.attach_metadata)
+        thread.join()
+
+    assert clips.error is None
+    assert waited == [True]
+    assert processed == len(genders)
+    assert clips.dropped == 1
+    table = read_feature_table(feature_table_path("csv", destination, "en"))
+    assert dict(zip(table["path"], table["gender"])) == genders
+    assert set(table["age"]) == {"thirties"}
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from conftest import clip_tasks
+from pipeline.engine import ClipProcessor, ProcessorConfig, run_clips
+
+
+def test_large_clips_run_alone(clips_dir, monkeypatch):
+    sizes = {path.name: path.stat().st_size for path in clips_dir.glob("*.wav")}
+    large = max(sizes, key=sizes.get)
+    threshold = max(size for name, size in sizes.items() if name != large)
+    tasks = clip_tasks(clips_dir)
+    # Put the large clip in the middle, so there is work in flight both before and after it.
+    tasks.remove(next(task for task in tasks if task[0] == large))
+    tasks.insert(len(tasks) // 2, (large, "female", "twenties"))
+
+    lock = threading.Lock()
+    running: set[str] = set()
+    overlaps: list[set[str]] = []
+    process_chunk = ClipProcessor.process_chunk
+
+    def tracked(self, chunk):
+        names = {clip[0] for clip, _ in chunk}
+        with lock:
+            running.update(names)
+            overlaps.append(set(running))
+        time.sleep(0.05)
+        with lock:
+            running.difference_update(names)
+        return process_chunk(self, chunk)
+
+    monkeypatch.setattr(ClipProcessor, "process_chunk", tracked)
+    config = ProcessorConfig(clips_dir=clips_dir, features=["zero_crossing"])
+    results = list(run_clips(tasks, config, workers=4, large_clip_bytes=threshold))
+
+    assert [result["path"] for result in results] == [task[0] for task in tasks]
+    assert any(len(running) > 1 for running in overlaps)
+    assert all(running == {large} for running in overlaps if large in running)
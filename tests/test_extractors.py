@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from benchmarking.synthetic import synthesize_clip
+from feature_extraction.analysis import AudioAnalysis
+from feature_extraction.registry import get_extractors
+
+FRAME_FEATURES = ["spectral_bandwidth", "spectral_flatness", "spectral_contrast", "chroma", "zero_crossing"]
+
+
+def test_short_lived_extractors_get_their_own_tracks():
+    audio, _ = synthesize_clip(1.0, 16000, f0=180.0)
+    shared = AudioAnalysis(audio, 16000)
+    # Every extractor is freed right away, so a later one may be allocated at the same address.
+    tracks = {name: get_extractors([name])[name].frames(shared) for name in FRAME_FEATURES}
+
+    for name in FRAME_FEATURES:
+        expected = get_extractors([name])[name].frames(AudioAnalysis(audio, 16000))
+        np.testing.assert_array_equal(tracks[name], expected, err_msg=name)
+
+
+def test_extractors_with_other_parameters_do_not_share_a_track():
+    audio, _ = synthesize_clip(1.0, 16000, f0=180.0)
+    analysis = AudioAnalysis(audio, 16000)
+    yin = get_extractors(["pitch"], {"pitch": {"backend": "yin"}})["pitch"].frames(analysis)
+    piptrack = get_extractors(["pitch"], {"pitch": {"backend": "piptrack"}})["pitch"].frames(analysis)
+
+    assert not np.array_equal(yin, piptrack)
+
+
+def test_praat_hnr_backend_rejects_a_maximum_pitch():
+    with pytest.raises(ValueError, match="maximum pitch"):
+        get_extractors(["hnr"], {"hnr": {"backend": "praat", "max_pitch": 400.0}})
+
+    audio, _ = synthesize_clip(1.0, 16000, f0=180.0)
+    features = get_extractors(["hnr"], {"hnr": {"backend": "praat"}})["hnr"].extract_from_analysis(AudioAnalysis(audio, 16000))
+    assert np.isfinite(features["hnr_mean"])
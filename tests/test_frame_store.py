@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pipeline.frame_store import FrameStore, FrameWriter, merge_frame_stores
+
+
+def clip_tracks(i: int) -> dict[str, np.ndarray]:
+    """Tracks shaped like the extractors return them: (n_frames,) or (n_values, n_frames)."""
+    rng = np.random.default_rng(i)
+    n_frames = 20 + 7 * i
+    return {"pitch": rng.normal(150.0, 20.0, n_frames), "mfcc": rng.normal(size=(13, n_frames)).astype(np.float32)}
+
+
+def write_clips(store_dir, clips: range, compression: str, resume: bool = False) -> None:
+    # Small chunks, so the clips are spread over several chunk files.
+    with FrameWriter(store_dir, compression, chunk_bytes=2000, resume=resume) as writer:
+        for i in clips:
+            writer.add(f"c{i}.mp3", "female" if i % 2 else "male", "twenties", clip_tracks(i))
+
+
+def assert_stored(store: FrameStore, i: int) -> None:
+    tracks = clip_tracks(i)
+    np.testing.assert_array_equal(store.load(f"c{i}.mp3", "pitch"), tracks["pitch"].astype(np.float32)[:, None])
+    np.testing.assert_array_equal(store.load(f"c{i}.mp3", "mfcc"), tracks["mfcc"].T)
+
+
+@pytest.mark.parametrize("compression", ["none", "zstd", "lz4"])
+def test_stored_tracks_are_loaded_as_written(tmp_path, compression):
+    write_clips(tmp_path / "frames", range(6), compression)
+
+    store = FrameStore(tmp_path / "frames")
+    assert len(store) == 6 and store.features == ["mfcc", "pitch"]
+    assert store.index["chunk"].nunique() > 1
+    for i in range(6):
+        assert_stored(store, i)
+    assert store.select(genders=["female"]) == ["c1.mp3", "c3.mp3", "c5.mp3"]
+
+    frames = dict(store.iter_frames("mfcc", ["c4.mp3", "c0.mp3", "missing.mp3"]))
+    assert list(frames) == ["c0.mp3", "c4.mp3"]
+    np.testing.assert_array_equal(frames["c4.mp3"], clip_tracks(4)["mfcc"].T)
+    assert not frames["c0.mp3"].flags.writeable
+
+
+def test_resumed_and_merged_stores_keep_the_latest_entry(tmp_path):
+    write_clips(tmp_path / "frames", range(3), "zstd")
+    # A resumed run stores c2 again, next to new chunks.
+    write_clips(tmp_path / "frames", range(2, 4), "zstd", resume=True)
+    write_clips(tmp_path / "shard", range(4, 6), "none")
+
+    store = FrameStore(tmp_path / "frames")
+    assert len(store) == 4
+    for i in range(4):
+        assert_stored(store, i)
+
+    merge_frame_stores([tmp_path / "frames", tmp_path / "shard"], tmp_path / "merged")
+    merged = FrameStore(tmp_path / "merged")
+    assert sorted(merged.index["path"]) == [f"c{i}.mp3" for i in range(6)]
+    for i in range(6):
+        assert_stored(merged, i)
@@ -0,0 +1,111 @@
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+import soundfile
+
+from benchmarking.synthetic import synthesize_clip
+from conftest import clip_tasks
+from pipeline import clip_manifest
+from pipeline.clip_manifest import ClipManifest, ClipRecord, clip_manifest_path, sources_path
+from pipeline.options import ExtractionOptions, MetadataFilter
+from pipeline.runner import extract_clips
+from pipeline.shards import merge_shards
+from pipeline.writer import feature_table_path
+
+FEATURES = ["zero_crossing"]
+real_file_hash = clip_manifest.file_hash
+
+
+def replace_clip(clips_dir: Path, name: str) -> None:
+    """Give a clip new content, with a modification time that certainly differs from the old one."""
+    stat = (clips_dir / name).stat()
+    audio, _ = synthesize_clip(1.0, 16000, f0=310.0, seed=99)
+    soundfile.write(clips_dir / name, audio, 16000)
+    os.utime(clips_dir / name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def table_paths(destination: Path) -> list[str]:
+    return sorted(pd.read_csv(feature_table_path("csv", destination, "en"))["path"])
+
+
+def test_incremental_run_only_extracts_changed_clips(clips_dir, tmp_path):
+    destination = tmp_path / "features"
+    destination.mkdir()
+    options = ExtractionOptions(features=FEATURES, incremental=True, flush_size=2)
+    tasks = clip_tasks(clips_dir)
+    assert extract_clips("en", tasks, clips_dir, destination, options) == len(tasks)
+
+    replace_clip(clips_dir, "c1.wav")
+    (clips_dir / "c4.wav").unlink()
+    tasks = clip_tasks(clips_dir)
+    assert extract_clips("en", tasks, clips_dir, destination, options) == 1
+
+    assert table_paths(destination) == [task[0] for task in tasks]
+    assert extract_clips("en", tasks, clips_dir, destination, options) == 0
+    # The corpus is only read, never written to.
+    assert not clip_manifest_path(clips_dir.parent).exists()
+
+
+def test_corpus_without_a_clip_manifest_is_only_hashed_once(clips_dir, tmp_path, monkeypatch):
+    destination = tmp_path / "features"
+    destination.mkdir()
+    options = ExtractionOptions(features=FEATURES, incremental=True)
+    tasks = clip_tasks(clips_dir)
+    extract_clips("en", tasks, clips_dir, destination, options)
+
+    hashed = []
+    monkeypatch.setattr(clip_manifest, "file_hash", lambda path: hashed.append(path.name) or real_file_hash(path))
+    replace_clip(clips_dir, "c3.wav")
+    assert extract_clips("en", tasks, clips_dir, destination, options) == 1
+    assert hashed == ["c3.wav"]
+
+
+def test_plain_run_forgets_the_sources(clips_dir, tmp_path):
+    destination = tmp_path / "features"
+    destination.mkdir()
+    tasks = clip_tasks(clips_dir)
+    extract_clips("en", tasks, clips_dir, destination, ExtractionOptions(features=FEATURES, incremental=True))
+    extract_clips("en", tasks, clips_dir, destination, ExtractionOptions(features=FEATURES))
+
+    assert not sources_path(feature_table_path("csv", destination, "en")).exists()
+    assert extract_clips("en", tasks, clips_dir, destination, ExtractionOptions(features=FEATURES, incremental=True)) == len(tasks)
+
+
+def test_incremental_run_after_merging_shards(clips_dir, tmp_path):
+    destination = tmp_path / "features"
+    destination.mkdir()
+    tasks = clip_tasks(clips_dir)
+    for index in range(2):
+        options = ExtractionOptions(features=FEATURES, incremental=True, metadata_filter=MetadataFilter(shard_index=index, shard_count=2))
+        extract_clips("en", tasks[index::2], clips_dir, destination, options)
+    assert merge_shards(destination, "en", "csv", 2) == len(tasks)
+
+    replace_clip(clips_dir, "c2.wav")
+    options = ExtractionOptions(features=FEATURES, incremental=True)
+    assert extract_clips("en", tasks, clips_dir, destination, options) == 1
+    assert table_paths(destination) == [task[0] for task in tasks]
+
+
+def test_concurrent_saves_of_a_manifest(tmp_path):
+    path = tmp_path / "clips.manifest.tsv"
+    manifests = [ClipManifest(path, {f"c{i}.wav": ClipRecord(i, f"{i:032x}", i)}) for i in range(8)]
+    errors = []
+
+    def save(manifest: ClipManifest) -> None:
+        try:
+            for _ in range(20):
+                manifest.save()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(manifest,)) for manifest in manifests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(ClipManifest.load(path)) == 1
+    assert [entry.name for entry in tmp_path.iterdir()] == [path.name]
@@ -0,0 +1,71 @@
+from collections import Counter
+
+import pytest
+
+from pipeline.metadata import iter_metadata
+from pipeline.options import MetadataFilter
+
+GENDERS = ["female", "male", "other"]
+AGES = ["twenties", "thirties"]
+
+
+@pytest.fixture
+def validated_tsv(tmp_path):
+    """validated.tsv of 120 clips in 6 uneven strata, with rows that are never selected."""
+    lines = ["path\tgender\tage\tsentence"]
+    for i in range(120):
+        gender = GENDERS[i % 7 % 3]
+        age = AGES[i % 5 % 2]
+        lines.append(f"clip_{i}.mp3\t{gender}\t{age}\tsome sentence")
+    lines += ["no_gender.mp3\t\ttwenties\tsome sentence", "clip.wav\tfemale\ttwenties\tsome sentence"]
+    path = tmp_path / "validated.tsv"
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def positions(clips) -> list[int]:
+    return [int(path[5:-4]) for path, _, _ in clips]
+
+
+def test_filters_keep_matching_clips_in_file_order(validated_tsv):
+    clips = list(iter_metadata(validated_tsv, MetadataFilter(genders=("female", "other"), ages=("twenties",)), chunk_rows=16))
+    everything = list(iter_metadata(validated_tsv))
+
+    assert len(everything) == 120
+    assert clips == [clip for clip in everything if clip[1] in ("female", "other") and clip[2] == "twenties"]
+
+
+@pytest.mark.parametrize("seed", [None, 7])
+def test_strata_are_capped_whatever_the_chunk_size(validated_tsv, seed):
+    metadata_filter = MetadataFilter(max_per_stratum=5, seed=seed)
+    clips = list(iter_metadata(validated_tsv, metadata_filter, chunk_rows=16))
+
+    assert Counter((gender, age) for _, gender, age in clips) == {(gender, age): 5 for gender in GENDERS for age in AGES}
+    assert positions(clips) == sorted(positions(clips))
+    assert list(iter_metadata(validated_tsv, metadata_filter, chunk_rows=1000)) == clips
+
+    if seed is None:
+        # Without a seed, the first clips of every stratum are taken.
+        taken: Counter = Counter()
+        firsts = []
+        for clip in iter_metadata(validated_tsv):
+            if taken[clip[1:]] < 5:
+                taken[clip[1:]] += 1
+                firsts.append(clip)
+        assert clips == firsts
+    else:
+        other_seed = list(iter_metadata(validated_tsv, MetadataFilter(max_per_stratum=5, seed=seed + 1), chunk_rows=16))
+        assert other_seed != clips
+
+
+@pytest.mark.parametrize("max_per_stratum,seed", [(None, None), (5, None), (5, 7)])
+def test_shards_split_the_unsharded_selection(validated_tsv, max_per_stratum, seed):
+    unsharded = list(iter_metadata(validated_tsv, MetadataFilter(max_per_stratum=max_per_stratum, seed=seed)))
+    shards = [
+        list(iter_metadata(validated_tsv, MetadataFilter(max_per_stratum=max_per_stratum, seed=seed, shard_index=index, shard_count=3), chunk_rows=16))
+        for index in range(3)
+    ]
+
+    assert all(shards)
+    assert sorted(clip for shard in shards for clip in shard) == sorted(unsharded)
+    assert sum(len(shard) for shard in shards) == len(unsharded)
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+import requests
+from downloader.segmented import SegmentedDownloader, create_session
+
+SEGMENT_BYTES = 64 * 1024
+BUFFER_BYTES = 8 * 1024
+
+
+@pytest.fixture
+def archive(server) -> bytes:
+    data = np.random.default_rng(0).bytes(5 * SEGMENT_BYTES + 1234)
+    server.files["/archive.tar.gz"] = data
+    return data
+
+
+def downloader() -> SegmentedDownloader:
+    return SegmentedDownloader(create_session(4), connections=4, segment_bytes=SEGMENT_BYTES, buffer_bytes=BUFFER_BYTES)
+
+
+def test_downloads_segments_with_range_requests(server, archive, tmp_path):
+    save_path = tmp_path / "archive.tar.gz"
+    downloader().download(f"{server.url}/archive.tar.gz", save_path)
+
+    assert save_path.read_bytes() == archive
+    assert not save_path.with_name("archive.tar.gz.progress").exists()
+    ranges = [header for _, header in server.requests if header != "bytes=0-0"]
+    assert len(ranges) == 6
+    assert set(ranges) == {f"bytes={start}-{min(start + SEGMENT_BYTES, len(archive)) - 1}" for start in range(0, len(archive), SEGMENT_BYTES)}
+
+
+def test_resumes_interrupted_segments(server, archive, tmp_path):
+    save_path = tmp_path / "archive.tar.gz"
+    progress_path = save_path.with_name("archive.tar.gz.progress")
+
+    # Every response is cut off before the end of its segment, so the download fails part way.
+    server.fail_after = SEGMENT_BYTES // 4
+    with pytest.raises((requests.RequestException, OSError)):
+        downloader().download(f"{server.url}/archive.tar.gz", save_path)
+    completed = json.loads(progress_path.read_text())["completed"]
+    assert 0 < sum(completed) < len(archive)
+
+    server.fail_after = None
+    server.requests.clear()
+    downloader().download(f"{server.url}/archive.tar.gz", save_path)
+
+    assert save_path.read_bytes() == archive
+    assert not progress_path.exists()
+    starts = sorted(int(header[len("bytes="):].split("-")[0]) for _, header in server.requests if header != "bytes=0-0")
+    # Segments continue from the byte where they stopped instead of from their start.
+    assert starts == sorted(index * SEGMENT_BYTES + done for index, done in enumerate(completed) if done < min(SEGMENT_BYTES, len(archive) - index * SEGMENT_BYTES))
+    assert any(start % SEGMENT_BYTES for start in starts)
+
+
+def test_falls_back_to_a_single_stream_without_range_support(server, archive, tmp_path):
+    server.ranges = False
+    save_path = tmp_path / "archive.tar.gz"
+    downloader().download(f"{server.url}/archive.tar.gz", save_path)
+
+    assert save_path.read_bytes() == archive
+    assert len(server.requests) == 1
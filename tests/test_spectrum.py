@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+
+from benchmarking.synthetic import synthesize_clip
+from feature_extraction.analysis import AudioAnalysis
+from pipeline.spectrum import BAND_EDGES_HZ, LTAS_BIN_HZ, LTAS_MAX_HZ, BandStatistics, SpectrumProfile
+
+BANDS = len(BAND_EDGES_HZ) - 1
+GRID = int(LTAS_MAX_HZ / LTAS_BIN_HZ)
+
+
+def clip_levels(i: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """Band levels and summed grid power of a clip of random length, with the top bands unavailable for some clips."""
+    rng = np.random.default_rng(i)
+    n_frames = int(rng.integers(5, 60))
+    levels_db = rng.normal(-40.0 + i, 10.0, (BANDS, n_frames))
+    ltas_power = rng.uniform(0.0, 1e-3, GRID)
+    if i % 3 == 0:
+        levels_db[-4:] = np.nan
+        ltas_power[GRID // 2:] = np.nan
+    return levels_db, ltas_power, n_frames
+
+
+def assert_statistics_equal(expected: BandStatistics, actual: BandStatistics) -> None:
+    assert actual.clips == expected.clips
+    np.testing.assert_array_equal(actual.frames, expected.frames)
+    np.testing.assert_allclose(actual.mean_db, expected.mean_db, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(actual.var_db, expected.var_db, rtol=1e-9)
+    np.testing.assert_array_equal(actual.histogram, expected.histogram)
+    np.testing.assert_allclose(actual.ltas_power, expected.ltas_power, rtol=1e-12)
+    np.testing.assert_array_equal(actual.ltas_frames, expected.ltas_frames)
+
+
+def test_merged_band_statistics_match_one_pass_over_every_frame():
+    clips = [clip_levels(i) for i in range(9)]
+    whole = BandStatistics()
+    parts = [BandStatistics() for _ in range(3)]
+    for i, clip in enumerate(clips):
+        whole.add(*clip)
+        parts[i % 3].add(*clip)
+
+    frames = np.concatenate([levels for levels, _, _ in clips], axis=1)
+    np.testing.assert_array_equal(whole.frames, (~np.isnan(frames)).sum(axis=1))
+    np.testing.assert_allclose(whole.mean_db, np.nanmean(frames, axis=1), rtol=1e-12)
+    np.testing.assert_allclose(whole.var_db, np.nanvar(frames, axis=1), rtol=1e-9)
+    assert (whole.histogram.sum(axis=1) == whole.frames).all()
+
+    # Partial statistics merge to the same result in any order, also after a round trip through JSON.
+    merged = BandStatistics()
+    for part in reversed(parts):
+        merged.merge(BandStatistics.from_dict(json.loads(json.dumps(part.to_dict()))))
+    assert_statistics_equal(whole, merged)
+
+
+def test_profiles_of_workers_merge_into_the_profile_of_one_pass():
+    analyses = []
+    for i, sr in enumerate([16000, 22050, 48000, 16000, 22050, 48000]):
+        audio, _ = synthesize_clip(0.5 + 0.1 * i, sr, f0=120.0 + 20.0 * i, seed=i)
+        analyses.append(((f"c{i}.mp3", "female" if i % 2 else "male", "twenties"), AudioAnalysis(audio, sr)))
+
+    single = SpectrumProfile()
+    for clip, analysis in analyses:
+        single.add(clip, analysis)
+
+    # Like process workers, each one drains its profile after every clip and the run merges the snapshots.
+    workers = [SpectrumProfile(), SpectrumProfile()]
+    run = SpectrumProfile()
+    for i, (clip, analysis) in enumerate(analyses):
+        workers[i % 2].add(clip, analysis)
+        run.merge(workers[i % 2].drain())
+    assert all(not worker.groups for worker in workers)
+
+    assert sorted(run.groups) == sorted(single.groups) == [("female", "twenties"), ("male", "twenties")]
+    for group, statistics in single.groups.items():
+        assert_statistics_equal(statistics, run.groups[group])
+    assert_statistics_equal(single.total(), run.total())
+    # Bands above 8 kHz are only covered by the clips above 16 kHz.
+    assert single.total().frames[-1] < single.total().frames[0]
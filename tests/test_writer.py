@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from pipeline.shards import merge_shards
+from pipeline.writer import ResultWriter, complete_path, create_writer, feature_table_path, manifest_path, read_feature_table
+
+FORMATS = ["csv", "parquet", "arrow"]
+
+
+class Killed(Exception):
+    pass
+
+
+def row(i: int, **features) -> dict:
+    return {"path": f"c{i}.mp3", "gender": "female" if i % 2 else "male", "age": "twenties", "zcr_mean": float(i), **features}
+
+
+def stored_paths(table_path, output_format: str) -> list[str]:
+    """Paths of every row in the output, committed or not."""
+    if output_format == "csv":
+        return list(pd.read_csv(table_path)["path"])
+    table = ds.dataset(str(table_path), format="parquet" if output_format == "parquet" else "ipc").to_table()
+    return sorted(table.column("path").to_pylist(), key=lambda path: int(path[1:-4]))
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_a_killed_writer_resumes_without_duplicate_rows(tmp_path, output_format, monkeypatch):
+    # The writer is killed after writing its third batch but before committing it.
+    commit = ResultWriter._commit
+    commits = []
+
+    def commit_until_killed(writer, paths):
+        if len(commits) == 2:
+            raise Killed()
+        commits.append(paths)
+        commit(writer, paths)
+
+    monkeypatch.setattr(ResultWriter, "_commit", commit_until_killed)
+    writer = create_writer(output_format, tmp_path, "en", batch_size=2)
+    with pytest.raises(Killed):
+        for i in range(6):
+            writer.write(row(i))
+    monkeypatch.undo()
+
+    table_path = feature_table_path(output_format, tmp_path, "en")
+    with open(manifest_path(table_path), "a") as manifest:
+        manifest.write("c4.mp3\nc5")
+    assert stored_paths(table_path, output_format) == [f"c{i}.mp3" for i in range(6)]
+    assert list(read_feature_table(table_path)["path"]) == [f"c{i}.mp3" for i in range(4)]
+    assert not complete_path(table_path).exists()
+
+    with create_writer(output_format, tmp_path, "en", batch_size=2, resume=True) as writer:
+        assert writer.completed == {f"c{i}.mp3" for i in range(4)}
+        for i in range(6):
+            if f"c{i}.mp3" not in writer.completed:
+                writer.write(row(i))
+        writer.mark_complete()
+
+    assert stored_paths(table_path, output_format) == [f"c{i}.mp3" for i in range(6)]
+    table = read_feature_table(table_path)
+    assert list(table["path"]) == [f"c{i}.mp3" for i in range(6)]
+    assert list(table["zcr_mean"]) == [float(i) for i in range(6)]
+    assert complete_path(table_path).exists()
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_a_run_is_complete_only_once_marked(tmp_path, output_format):
+    table_path = feature_table_path(output_format, tmp_path, "en")
+    with create_writer(output_format, tmp_path, "en") as writer:
+        writer.write(row(0))
+        writer.mark_complete()
+    assert complete_path(table_path).exists()
+
+    # A resumed run may add rows, so the table is not complete again until it finishes.
+    with create_writer(output_format, tmp_path, "en", resume=True) as writer:
+        assert not complete_path(table_path).exists()
+        writer.write(row(1))
+    assert not complete_path(table_path).exists()
+    assert list(read_feature_table(table_path)["path"]) == ["c0.mp3", "c1.mp3"]
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_columns_that_appear_later_are_kept(tmp_path, output_format):
+    with create_writer(output_format, tmp_path, "en", batch_size=2) as writer:
+        for i in range(4):
+            writer.write(row(i))
+        writer.write(row(4, error="could not decode"))
+        writer.write(row(5, mfcc_mean=np.arange(3, dtype=np.float32)))
+        writer.mark_complete()
+
+    table = read_feature_table(feature_table_path(output_format, tmp_path, "en"))
+    assert list(table["path"]) == [f"c{i}.mp3" for i in range(6)]
+    assert table["error"].isna().sum() == 5 and table["error"][4] == "could not decode"
+    mfcc = "mfcc_mean" if output_format == "csv" else "mfcc_mean_2"
+    assert table[mfcc].isna().sum() == 5 and table[mfcc][5] is not None
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_every_part_shares_the_schema(tmp_path, output_format):
+    with create_writer(output_format, tmp_path, "en", batch_size=1) as writer:
+        writer.write(row(0))
+        writer.write(row(1, error="could not decode"))
+
+    table_path = feature_table_path(output_format, tmp_path, "en")
+    if output_format == "parquet":
+        table = pd.read_parquet(table_path)
+        assert list(table.columns) == ["path", "gender", "age", "zcr_mean", "error"]
+        assert isinstance(table["gender"].dtype, pd.CategoricalDtype)
+    assert list(read_feature_table(table_path)["error"].isna()) == [True, False]
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_shards_with_other_columns_are_merged(tmp_path, output_format):
+    for index in range(2):
+        with create_writer(output_format, tmp_path, "en", batch_size=2, shard=(index, 2)) as writer:
+            for i in range(index * 3, index * 3 + 3):
+                writer.write(row(i, error="could not decode") if i == 4 else row(i))
+            writer.mark_complete()
+
+    assert merge_shards(tmp_path, "en", output_format, 2) == 6
+    table = read_feature_table(feature_table_path(output_format, tmp_path, "en"))
+    assert list(table["path"]) == [f"c{i}.mp3" for i in range(6)]
+    assert list(table["error"].notna()) == [False, False, False, False, True, False]
+    assert list(table["zcr_mean"]) == [float(i) for i in range(6)]